@@ -1,48 +1,69 @@
-import nltk
-from nltk.tokenize import sent_tokenize
-import torch
-from transformers import pipeline
-import pandas as pd
+from instrumentation import METRICS
+from model_registry import get_model, load_pretrained, ensure_nltk_resource
+
+EMOTION_MODEL = "SamLowe/roberta-base-go_emotions"
 
 
 class ReviewAnalyzer():
-    def __init__(self):
-        nltk.download('punkt_tab')
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.classifier = pipeline(task="text-classification", model="SamLowe/roberta-base-go_emotions", top_k=None, device=self.device)
+    def __init__(self, model_name=EMOTION_MODEL):
+        # Nothing heavy happens here: the classifier and the nltk punkt data
+        # are acquired on first use and shared by every analyzer in the process.
+        self.model_name = model_name
+
+    @property
+    def classifier(self):
+        return get_model(('text-classification', self.model_name), self._load_classifier)
+
+    def _load_classifier(self):
+        import torch
+        from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
+
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        tokenizer = load_pretrained(AutoTokenizer, self.model_name)
+        model = load_pretrained(AutoModelForSequenceClassification, self.model_name)
+        return pipeline(task="text-classification", model=model, tokenizer=tokenizer, top_k=None, device=device)
 
     def process_review(self, review):
+        import pandas as pd
+        from nltk.tokenize import sent_tokenize
+
+        get_model(('nltk', 'punkt_tab'), lambda: ensure_nltk_resource('punkt_tab', 'tokenizers/punkt_tab'))
         # Split and classify
         sentences = sent_tokenize(review)
         sentence_scores = []
-        for sentence in sentences:
-            # classifier returns list of dicts that have only one emotion key and corresponding score in each dict
-            results = self.classifier(sentence)[0]
-            # Convert the list of dictionaries into a single dictionary
-            dict_scores = {d['label']: d['score'] for d in results}
-            sentence_scores.append(dict_scores)
-        
+        with METRICS.stage('emotion.score'):
+            for sentence in sentences:
+                # classifier returns list of dicts that have only one emotion key and corresponding score in each dict
+                results = self.classifier(sentence)[0]
+                # Convert the list of dictionaries into a single dictionary
+                dict_scores = {d['label']: d['score'] for d in results}
+                sentence_scores.append(dict_scores)
+        METRICS.inc('items_total', stage='emotion.reviews')
+        METRICS.inc('items_total', len(sentences), stage='emotion.sentences')
+
         # Create a DataFrame from the sentence scores
         scores_df = pd.DataFrame(sentence_scores)
-        
+
         # Compute average scores for each emotion category
         average_scores = scores_df.mean(numeric_only=True, axis=0)
         return average_scores
-    
+
     def create_aggr_scoring(self, df):
+        import pandas as pd
+
         # Assumes df has "review" column containing text reviews
         emotion_averages = df["review"].apply(self.process_review)
         scored_appstore = pd.concat([df, emotion_averages], axis=1)
         scored_appstore["date"] = pd.to_datetime(scored_appstore["date"])
 
         emotion_columns = [
-            'neutral', 'approval', 'realization', 'annoyance', 'disappointment', 'optimism', 
-            'disapproval', 'admiration', 'sadness', 'confusion', 'joy', 'disgust', 'desire', 
-            'amusement', 'fear', 'excitement', 'caring', 'relief', 'love', 'surprise', 
-            'curiosity', 'gratitude', 'embarrassment', 'anger', 'nervousness', 'remorse', 
+            'neutral', 'approval', 'realization', 'annoyance', 'disappointment', 'optimism',
+            'disapproval', 'admiration', 'sadness', 'confusion', 'joy', 'disgust', 'desire',
+            'amusement', 'fear', 'excitement', 'caring', 'relief', 'love', 'surprise',
+            'curiosity', 'gratitude', 'embarrassment', 'anger', 'nervousness', 'remorse',
             'pride', 'grief'
         ]
 
         mean_emotion_scores = scored_appstore.groupby('app_id')[emotion_columns].mean().reset_index()
-        
+
         return mean_emotion_scores
@@ -21,7 +21,8 @@ CLOUDFLARE_BUCKET_NAME = os.getenv('CLOUDFLARE_BUCKET_NAME')  # R2 Bucket name
 S3_ACCESS_KEY = os.getenv('S3_ACCESS_KEY')
 S3_SECRET_KEY = os.getenv('S3_SECRET_KEY')
 
-CLOUDFLARE_BASE_URL = f"https://api.cloudflare.com/client/v4/accounts/{CLOUDFLARE_ACCOUNT_ID}/d1/database/{D1_DATABASE_ID}"
+CLOUDFLARE_API_BASE_URL = os.getenv('CLOUDFLARE_API_BASE_URL', 'https://api.cloudflare.com/client/v4')
+CLOUDFLARE_BASE_URL = f"{CLOUDFLARE_API_BASE_URL}/accounts/{CLOUDFLARE_ACCOUNT_ID}/d1/database/{D1_DATABASE_ID}"
 
 # Set up logging configuration
 logging.basicConfig(
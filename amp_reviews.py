@@ -0,0 +1,282 @@
+import asyncio
+import os
+import random
+import re
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+from fetch_token import fetch_media_api_token
+from instrumentation import METRICS
+from rate_limit import AsyncRateLimiter
+from review_store import ReviewStore, StreamingReviewCollector
+from storefronts import resolve_storefronts
+
+# amp-api endpoint behind the review list on apps.apple.com (see apicall.py)
+AMP_REVIEWS_URL = "https://amp-api.apps.apple.com/v1/catalog/{country}/apps/{app_id}/reviews"
+NEXT_OFFSET_RE = re.compile(r"offset=([0-9]+)")
+
+PAGE_SIZE = 20  # max valid is 20
+MAX_RETRIES = 5
+BASE_DELAY_SECS = 2
+REQUESTS_PER_SEC = float(os.getenv('AMP_REQUESTS_PER_SEC', '10'))
+CONCURRENCY = 16
+# Per-app cap for the daily review jobs, as the old offset loop had
+MAX_APP_REVIEWS = int(os.getenv('MAX_APP_REVIEWS', '100000'))
+OUTPUT_DIR = Path("data")
+
+HEADERS = {
+    'Accept': 'application/json',
+    'Origin': 'https://apps.apple.com',
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36',
+}
+
+
+class AmpReviewError(Exception):
+    """Raised when a review page still fails after all retries."""
+    pass
+
+
+class MediaToken:
+    """
+    Media API bearer token shared by every request of a crawl.
+
+    The token is fetched once; a 401 triggers a single refresh for all
+    concurrent requests instead of one per request.
+    """
+
+    def __init__(self, token=None):
+        self.value = token
+        self._lock = asyncio.Lock()
+
+    async def get(self):
+        if self.value is None:
+            await self.refresh(None)
+        return self.value
+
+    async def refresh(self, stale):
+        async with self._lock:
+            if self.value == stale:
+                self.value = await asyncio.to_thread(fetch_media_api_token)
+        return self.value
+
+
+def parse_amp_review(raw):
+    """Flatten one amp-api review into the app_store_scraper review shape."""
+    attributes = raw.get('attributes', {})
+    review = {
+        'id': raw.get('id'),
+        'date': attributes.get('date'),
+        'review': attributes.get('review'),
+        'rating': attributes.get('rating'),
+        'isEdited': attributes.get('isEdited'),
+        'userName': attributes.get('userName'),
+        'title': attributes.get('title'),
+    }
+    if review['date']:
+        review['date'] = datetime.fromisoformat(review['date'].replace('Z', '+00:00'))
+    if attributes.get('developerResponse'):
+        review['developerResponse'] = attributes['developerResponse']
+    return review
+
+
+def next_offset(result):
+    match = NEXT_OFFSET_RE.search(result.get('next') or '')
+    return int(match.group(1)) if match else None
+
+
+async def fetch_review_page(client, app_id, country, token, offset=0, limiter=None,
+                            lang=None, max_retries=MAX_RETRIES):
+    """
+    Fetch one page of reviews for an app in one storefront.
+
+    Returns (reviews, next offset or None). A 404 means the app has no
+    reviews in this storefront and returns an empty page. 429s, 5xx
+    responses and network errors are retried with exponential backoff;
+    every attempt first takes a slot from `limiter`.
+    """
+    app_id = str(app_id).replace('id', '')
+    params = {
+        'offset': str(offset),
+        'limit': str(PAGE_SIZE),
+        'platform': 'web',
+        'additionalPlatforms': 'appletv,ipad,iphone,mac',
+    }
+    if lang:
+        params['l'] = lang
+    url = AMP_REVIEWS_URL.format(country=country, app_id=app_id)
+    last_error = None
+    for attempt in range(max_retries):
+        if limiter is not None:
+            await limiter.acquire()
+        bearer = await token.get()
+        headers = dict(HEADERS, Authorization=f'bearer {bearer}')
+        try:
+            with METRICS.stage('amp_reviews.request'):
+                response = await client.get(url, params=params, headers=headers)
+            METRICS.record_response('amp_reviews', response.status_code)
+            if response.status_code == 404:
+                return [], None
+            if response.status_code == 401:
+                last_error = "HTTP 401"
+                await token.refresh(bearer)
+                continue
+            if response.status_code == 429 or response.status_code >= 500:
+                last_error = f"HTTP {response.status_code}"
+            else:
+                response.raise_for_status()
+                with METRICS.stage('amp_reviews.parse'):
+                    result = response.json()
+                    reviews = [parse_amp_review(raw) for raw in result.get('data', [])]
+                METRICS.inc('items_total', len(reviews), stage='amp_reviews.reviews')
+                return reviews, next_offset(result)
+        except httpx.HTTPError as e:
+            METRICS.record_response('amp_reviews', 'error')
+            last_error = repr(e)
+        METRICS.record_retry('amp_reviews')
+        await asyncio.sleep(BASE_DELAY_SECS * (2 ** attempt) + random.uniform(0, 1))
+    raise AmpReviewError(f"{app_id} ({country}): page {offset} failed after {max_retries} attempts: {last_error}")
+
+
+async def crawl_storefront(client, app_id, country, token, limiter=None, limit=None, lang=None, on_page=None):
+    """
+    Page through all reviews of an app in one storefront.
+
+    `on_page` is called with each non-empty page. Returns the review count.
+    """
+    fetched = 0
+    offset = 0
+    while offset is not None:
+        reviews, offset = await fetch_review_page(client, app_id, country, token, offset, limiter, lang)
+        if limit is not None:
+            reviews = reviews[:limit - fetched]
+            if fetched + len(reviews) >= limit:
+                offset = None
+        fetched += len(reviews)
+        if reviews and on_page:
+            on_page(reviews)
+    return fetched
+
+
+class AppStoreReviewClient:
+    """
+    Coroutine-based stand-in for app_store_scraper.AppStore.review.
+
+    One client is shared by every app crawled in an event loop: one
+    connection pool, one media token and one token bucket. At most
+    `max_in_flight` page requests are outstanding across all apps, and
+    `iter_pages` only requests the next page once the caller has taken the
+    previous one, so hundreds of apps can be crawled concurrently without
+    threads or unbounded buffering.
+
+        async with AppStoreReviewClient() as client:
+            reviews = await client.review('id284882215', 'us')
+    """
+
+    def __init__(self, max_in_flight=CONCURRENCY * 4, requests_per_sec=REQUESTS_PER_SEC, token=None):
+        self.max_in_flight = max_in_flight
+        self.limiter = AsyncRateLimiter(requests_per_sec)
+        self.token = token if isinstance(token, MediaToken) else MediaToken(token)
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._client = None
+
+    async def __aenter__(self):
+        limits = httpx.Limits(max_connections=self.max_in_flight, max_keepalive_connections=self.max_in_flight)
+        self._client = httpx.AsyncClient(limits=limits, timeout=30)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._client.aclose()
+        self._client = None
+        return False
+
+    async def iter_pages(self, app_id, country, how_many=None, lang=None):
+        """Yield review pages in the app_store_scraper shape, up to `how_many` reviews."""
+        fetched = 0
+        offset = 0
+        while offset is not None and (how_many is None or fetched < how_many):
+            async with self._in_flight:
+                reviews, offset = await fetch_review_page(self._client, app_id, country, self.token,
+                                                          offset, self.limiter, lang)
+            if how_many is not None:
+                reviews = reviews[:how_many - fetched]
+            fetched += len(reviews)
+            if reviews:
+                yield reviews
+
+    async def review(self, app_id, country, how_many=None, lang=None):
+        """Return all reviews (or the first `how_many`) of an app in one storefront."""
+        reviews = []
+        async for page in self.iter_pages(app_id, country, how_many, lang):
+            reviews.extend(page)
+        return reviews
+
+
+async def fetch_app_reviews(app_id, country, how_many=None, client=None):
+    """Fetch one app's reviews with `client`, or with a short-lived client when none is shared."""
+    if client is not None:
+        return await client.review(app_id, country, how_many)
+    async with AppStoreReviewClient() as client:
+        return await client.review(app_id, country, how_many)
+
+
+async def fan_out_storefronts(app_id, storefronts='all', requests_per_sec=REQUESTS_PER_SEC,
+                              concurrency=CONCURRENCY, limit=None, path=None, store=None, token=None):
+    """
+    Crawl one app's reviews in many storefronts concurrently.
+
+    `storefronts` is a list of country codes, a comma separated string or
+    'all'. Up to `concurrency` storefronts are crawled at a time, and all of
+    them share one token bucket of `requests_per_sec`, so the total request
+    rate stays the same however many storefronts are scheduled. Every review
+    is tagged with its storefront, merged into one Parquet file at `path`
+    and written to the review store partitioned by country.
+
+    Returns (ReviewHandle over the merged reviews, {storefront: count or None on failure}).
+    """
+    app_id = str(app_id).replace('id', '')
+    storefronts = resolve_storefronts(storefronts)
+    store = store or ReviewStore()
+    if path is None:
+        current_date = datetime.now().strftime("%Y-%m-%d")
+        path = OUTPUT_DIR / f"{current_date}_{app_id}_storefronts_reviews.parquet"
+    limiter = AsyncRateLimiter(requests_per_sec)
+    token = token if isinstance(token, MediaToken) else MediaToken(token)
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    collector = StreamingReviewCollector(path)
+
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        async def run(country):
+            rows = []
+
+            def on_page(reviews):
+                for review in reviews:
+                    review['storefront'] = country
+                    review['appid'] = app_id
+                rows.extend(reviews)
+                collector.add(reviews)
+
+            async with semaphore:
+                try:
+                    count = await crawl_storefront(client, app_id, country, token, limiter, limit, on_page=on_page)
+                    print(f"[INFO] {app_id} {country}: {count} reviews")
+                    return count
+                except AmpReviewError as e:
+                    print(f"[ERROR] {e}")
+                    return None
+                finally:
+                    if rows:
+                        await asyncio.to_thread(store.write, rows, 'ios', country, app_id)
+
+        counts = await asyncio.gather(*(run(country) for country in storefronts))
+
+    handle = collector.close()
+    return handle, dict(zip(storefronts, counts))
+
+
+if __name__ == "__main__":
+    app_id = os.getenv('app_id', '284882215')
+    storefronts = os.getenv('storefronts', 'all')
+    handle, counts = asyncio.run(fan_out_storefronts(app_id, storefronts))
+    print(f"{handle.num_rows} reviews from {sum(1 for c in counts.values() if c)} storefronts -> {handle}")
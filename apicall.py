@@ -4,6 +4,9 @@ import time
 import os
 import httpx
 from tqdm import tqdm
+from log_utils import get_logger
+
+log = get_logger('apicall')
 
 
 def load_proxies(proxy_source):
@@ -76,7 +79,7 @@ def get_token(country: str, app_name: str, app_id: str, user_agents: dict, proxy
                 if re.match(r"<meta.+web-experience-app/config/environment", tag):
                     token = re.search(r"token%22%3A%22(.+?)%22", tag).group(1)
 
-            print(f"Bearer {token}")
+            log.debug('media token fetched', app=app_id)
             return token
     except httpx.RequestError as e:
         print(f"Error on get_token:{e}")
@@ -140,19 +143,19 @@ def fetch_reviews(country: str, app_name: str, app_id: str, user_agents: dict, t
                 result = response.json()
                 reviews = result['data']
                 if len(reviews) < 20:
-                    print(f"{len(reviews)} reviews scraped. This is fewer than the expected 20.")
+                    log.debug('short review page', app=app_id, offset=offset, reviews=len(reviews))
                 break
 
             # FAILURE
            elif response.status_code != 200:
-               print(f"GET request failed. Response: {response.status_code} {response.reason}")
+               log.warning('review request failed', app=app_id, status=response.status_code)
 
                # RATE LIMITED
                if response.status_code == 429:
                    # Perform backoff using retry_count as the backoff factor
                    retry_count += 1
                    backoff_time = BASE_DELAY_SECS * retry_count
-                   print(f"Rate limited! Retrying ({retry_count}/{MAX_RETRIES}) after {backoff_time} seconds...")
+                   log.warning('rate limited', app=app_id, retry=f'{retry_count}/{MAX_RETRIES}', backoff=backoff_time)
 
                    with tqdm(total=backoff_time, unit="sec", ncols=50) as pbar:
                        for _ in range(backoff_time):
@@ -162,20 +165,20 @@ def fetch_reviews(country: str, app_name: str, app_id: str, user_agents: dict, t
 
                # NOT FOUND
                elif response.status_code == 404:
-                   print(f"{response.status_code} {response.reason}. There are no more reviews.")
+                   log.info('no more reviews', app=app_id, status=response.status_code)
                    break
         except httpx.RequestError as e:
-            print(f"Error on fetch_reviews:{e}")
+            log.error('fetch_reviews failed', app=app_id, error=e)
             break
 
     ## Final output ---------------------------------------------------------
     # Get pagination offset for next request
     if 'next' in result and result['next'] is not None:
         offset = re.search("^.+offset=([0-9]+).*$", result['next']).group(1)
-        print(f"Offset: {offset}")
+        log.debug('next offset', app=app_id, offset=offset)
     else:
         offset = None
-        print("No offset found.")
+        log.debug('last review page', app=app_id)
 
     # Append offset, number of reviews in batch, and app_id
     for rev in reviews:
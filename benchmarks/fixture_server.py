@@ -0,0 +1,204 @@
+import gzip
+import json
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+FIXTURE_DIR = Path(__file__).with_name('fixtures')
+TOKEN = 'benchmark-media-token'
+PAGE_SIZE = 20
+
+REVIEWS_PATH = re.compile(r'^/v1/catalog/(?P<country>[a-z]{2})/apps/(?P<app_id>\d+)/reviews$')
+FEED_PATH = re.compile(r'^/(?P<country>[a-z]{2})/rss/(?P<feed>\w+)/limit=(?P<limit>\d+)(?:/genre=(?P<genre>\d+))?/json$')
+SHARD_PATH = re.compile(r'^/sitemaps/apps_(?P<shard>\d+)\.xml\.gz$')
+
+
+def _recorded(name):
+    """Bytes of a recorded fixture (see record_fixtures.py), or None."""
+    path = FIXTURE_DIR / name
+    return path.read_bytes() if path.exists() else None
+
+
+def token_page():
+    recorded = _recorded('token_page.html')
+    if recorded:
+        return recorded
+    config = quote(json.dumps({'MEDIA_API': {'token': TOKEN}}))
+    return (f'<html><head><meta name="web-experience-app/config/environment" content="{config}">'
+            f'</head><body></body></html>').encode('utf-8')
+
+
+def _page_token(html):
+    """Media token embedded in a token page, the same way fetch_token reads it."""
+    match = re.search(rb'<meta name="web-experience-app/config/environment" content="(.+?)">', html)
+    if not match:
+        return TOKEN
+    config = json.loads(unquote(match.group(1).decode('utf-8')))
+    return (config.get('MEDIA_API') or {}).get('token') or TOKEN
+
+
+def _review_templates():
+    recorded = _recorded('amp_reviews.json')
+    if recorded:
+        return json.loads(recorded).get('data') or []
+    words = 'great app but the latest update keeps crashing when I open my saved plans please fix'.split()
+    return [{
+        'id': str(i),
+        'type': 'user-reviews',
+        'attributes': {
+            'date': '2024-11-01T08:00:00Z',
+            'review': ' '.join(words[i % 5:] + words[:i % 5]) + ' 😀',
+            'rating': 1 + i % 5,
+            'isEdited': False,
+            'userName': f'user {i}',
+            'title': f'Review title {i}',
+        },
+    } for i in range(PAGE_SIZE)]
+
+
+def review_page(templates, country, app_id, offset, pages):
+    """One amp-api review page; `next` points at the following page until `pages` are served."""
+    base = datetime(2024, 11, 1)
+    data = []
+    for i, template in enumerate(templates[:PAGE_SIZE]):
+        review = json.loads(json.dumps(template))
+        n = offset + i
+        review['id'] = f'{app_id}{n:07d}'
+        review['attributes']['userName'] = f"{review['attributes'].get('userName', 'user')} {n}"
+        review['attributes']['date'] = (base - timedelta(minutes=n)).strftime('%Y-%m-%dT%H:%M:%SZ')
+        data.append(review)
+    page = {'data': data}
+    if offset + PAGE_SIZE < pages * PAGE_SIZE:
+        page['next'] = f'/v1/catalog/{country}/apps/{app_id}/reviews?offset={offset + PAGE_SIZE}'
+    return json.dumps(page).encode('utf-8')
+
+
+def chart_feed(country, genre, limit):
+    recorded = _recorded('rss_feed.json')
+    if recorded:
+        return recorded
+    entries = []
+    for rank in range(limit):
+        app_id = 1000000 + (int(genre or 0) * 7 + rank * 13) % 5000
+        link = f'https://apps.apple.com/{country}/app/benchmark-app-{app_id}/id{app_id}?uo=2'
+        entries.append({
+            'im:name': {'label': f'Benchmark App {app_id}'},
+            'im:image': [{'label': f'https://is1-ssl.mzstatic.com/image/{app_id}/{size}x{size}bb.png'}
+                         for size in (53, 75, 100)],
+            'id': {'label': link, 'attributes': {'im:id': str(app_id)}},
+            'link': {'attributes': {'rel': 'alternate', 'type': 'text/html', 'href': link}},
+        })
+    return json.dumps({'feed': {'entry': entries}}).encode('utf-8')
+
+
+def sitemap_index(base_url, shards):
+    locs = ''.join(f'<sitemap><loc>{base_url}/sitemaps/apps_{i}.xml.gz</loc></sitemap>' for i in range(shards))
+    return (f'<?xml version="1.0" encoding="UTF-8"?><sitemapindex '
+            f'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{locs}</sitemapindex>').encode('utf-8')
+
+
+def sitemap_shard(shard, urls_per_shard):
+    recorded = _recorded('sitemap_shard.xml.gz')
+    if recorded:
+        return recorded
+    urls = ''.join(
+        f'<url><loc>https://apps.apple.com/us/app/app-{shard}-{i}/id{shard * urls_per_shard + i + 1}</loc>'
+        f'<lastmod>2024-11-01</lastmod></url>'
+        for i in range(urls_per_shard))
+    xml = (f'<?xml version="1.0" encoding="UTF-8"?><urlset '
+           f'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>')
+    return gzip.compress(xml.encode('utf-8'), compresslevel=6)
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    server_version = 'fixture-server'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type='application/json'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        if server.latency_ms:
+            time.sleep(server.latency_ms / 1000)
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+
+        match = REVIEWS_PATH.match(parts.path)
+        if match:
+            server.count('amp_reviews')
+            if self.headers.get('Authorization', '').lower() != f'bearer {server.token}':
+                return self._send(401, b'{"errors":[{"status":"401"}]}')
+            offset = int(query.get('offset', ['0'])[0])
+            return self._send(200, review_page(server.review_templates, match['country'], match['app_id'],
+                                               offset, server.review_pages))
+        match = FEED_PATH.match(parts.path)
+        if match:
+            server.count('rss_feed')
+            return self._send(200, chart_feed(match['country'], match['genre'], int(match['limit'])))
+        match = SHARD_PATH.match(parts.path)
+        if match:
+            server.count('sitemap_shard')
+            return self._send(200, server.shard(int(match['shard'])), 'application/x-gzip')
+        if parts.path == '/sitemaps_apps_index_app_1.xml':
+            server.count('sitemap_index')
+            return self._send(200, sitemap_index(server.base_url, server.sitemap_shards), 'application/xml')
+        if parts.path in ('/404', '/token'):
+            server.count('token_page')
+            return self._send(200, token_page(), 'text/html')
+        server.count('not_found')
+        self._send(404, b'{}')
+
+
+class FixtureServer(ThreadingHTTPServer):
+    """
+    Serves App Store responses for the benchmarks: the token page, amp-api
+    review pages, iTunes RSS chart feeds and a sitemap index with gzip
+    shards. Recorded responses in benchmarks/fixtures/ are replayed when
+    present; otherwise payloads of the same shape are generated. Requests
+    are counted per kind and can be slowed by `latency_ms`.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), review_pages=5, sitemap_shards=4, urls_per_shard=500, latency_ms=0):
+        super().__init__(address, FixtureHandler)
+        self.review_pages = review_pages
+        self.sitemap_shards = sitemap_shards
+        self.urls_per_shard = urls_per_shard
+        self.latency_ms = latency_ms
+        self.token = _page_token(token_page())
+        self.review_templates = _review_templates()
+        self.requests = {}
+        self._shards = {}
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def count(self, kind):
+        with self._lock:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+
+    def shard(self, shard):
+        if shard not in self._shards:
+            self._shards[shard] = sitemap_shard(shard, self.urls_per_shard)
+        return self._shards[shard]
+
+
+def start_fixture_server(**options):
+    server = FixtureServer(**options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
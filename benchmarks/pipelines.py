@@ -0,0 +1,210 @@
+"""
+Benchmark pipelines, one per child process (see run.py).
+
+    python benchmarks/pipelines.py <pipeline> <fixture base url> <result.json> '<options json>'
+
+The D1 savers read CLOUDFLARE_API_BASE_URL at import, so run.py points it
+at the emulator in the child's environment. Upstream endpoints are module
+constants and are patched here before the pipeline starts.
+"""
+import asyncio
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import httpx
+import numpy as np
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from instrumentation import METRICS  # noqa: E402
+
+
+class RequestTimer:
+    """Latency of every HTTP request the pipeline makes, split into upstream and d1."""
+
+    def __init__(self):
+        self.samples = {'upstream': [], 'd1': []}
+
+    def _record(self, url, started):
+        role = 'd1' if '/d1/database/' in str(url) else 'upstream'
+        self.samples[role].append(time.perf_counter() - started)
+
+    def install(self):
+        timer = self
+        async_send = httpx.AsyncClient.send
+        sync_send = httpx.Client.send
+        requests_send = requests.Session.send
+
+        async def timed_async_send(client, request, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await async_send(client, request, *args, **kwargs)
+            finally:
+                timer._record(request.url, started)
+
+        def timed_sync_send(client, request, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return sync_send(client, request, *args, **kwargs)
+            finally:
+                timer._record(request.url, started)
+
+        def timed_requests_send(session, request, **kwargs):
+            started = time.perf_counter()
+            try:
+                return requests_send(session, request, **kwargs)
+            finally:
+                timer._record(request.url, started)
+
+        httpx.AsyncClient.send = timed_async_send
+        httpx.Client.send = timed_sync_send
+        requests.Session.send = timed_requests_send
+        return self
+
+    def summary(self):
+        summary = {}
+        for role, samples in self.samples.items():
+            if not samples:
+                summary[role] = {'requests': 0}
+                continue
+            ms = np.array(samples) * 1000
+            summary[role] = {
+                'requests': len(samples),
+                'p50_ms': round(float(np.percentile(ms, 50)), 2),
+                'p90_ms': round(float(np.percentile(ms, 90)), 2),
+                'p99_ms': round(float(np.percentile(ms, 99)), 2),
+                'max_ms': round(float(ms.max()), 2),
+            }
+        return summary
+
+
+def _review_urls(apps, country='us'):
+    return [f'apps.apple.com/{country}/app/benchmark-app-{i}/id{1000000 + i}' for i in range(apps)]
+
+
+def run_reviews(base_url, workdir, apps=50, workers=32, **_):
+    """huntReviewDaily.get_review per app: token page, amp-api pages, Parquet store and D1 review inserts."""
+    # ReviewStore() in get_review reads its root from the environment at import
+    os.environ['REVIEW_STORE_DIR'] = str(Path(workdir) / 'reviews')
+    import amp_reviews
+    import fetch_token
+    from amp_reviews import AppStoreReviewClient
+    from DataRecorder import Recorder
+    from huntReviewDaily import get_review
+    from job_scheduler import JobScheduler
+    from review_sink import ReviewSink
+
+    amp_reviews.AMP_REVIEWS_URL = base_url + '/v1/catalog/{country}/apps/{app_id}/reviews'
+    fetch_token.APP_DETAILS_TOKEN_URLS = (base_url + '/404',)
+    outfile = Recorder(str(Path(workdir) / 'reviews.csv'))
+
+    async def main():
+        scheduler = JobScheduler(workers=workers, name='benchmark reviews')
+        async with AppStoreReviewClient(requests_per_sec=100000) as client, ReviewSink() as sink:
+            for rank, url in enumerate(_review_urls(apps)):
+                scheduler.submit(get_review, url, outfile, 'benchmark', client=client, sink=sink,
+                                 priority=rank, name=url)
+            await scheduler.run()
+        return sink.rows_in, sink.rows_sent, sink.rows_failed
+
+    reviews, sent, failed = asyncio.run(main())
+    outfile.record()
+    return {'items': reviews, 'rows_written': sent, 'rows_failed': failed}
+
+
+def run_sitemap(base_url, workdir, save_rows=200, **_):
+    """Sitemap index, gzip shards and app profile inserts."""
+    import get_all_app_from_sitemap as sitemap
+
+    loc_urls = sitemap.fetch_and_parse_sitemap(base_url + '/sitemaps_apps_index_app_1.xml')
+    app_data_list = []
+    for loc_url in loc_urls:
+        app_data_list.extend(sitemap.fetch_and_parse_gzip(loc_url))
+    sitemap.batch_process_in_chunks(app_data_list[:save_rows],
+                                    process_function=sitemap.batch_process_initial_app_profiles)
+    return {'items': len(app_data_list), 'shards': len(loc_urls), 'rows_written': min(save_rows, len(app_data_list))}
+
+
+def run_top100(base_url, workdir, storefronts='us,gb', genres='6014,6016,6017,6018', **_):
+    """Chart feeds, the Parquet snapshot and the compact rank tables."""
+    import chart_feeds
+    import saveTop100rank
+    from top100_snapshot import take_snapshot
+
+    chart_feeds.CHART_FEED_URL = base_url + '/{country}/rss/{feed}/limit={limit}{genre}/json'
+    rows, _ = asyncio.run(take_snapshot(storefronts=storefronts.split(','), genres=genres.split(','),
+                                        root=Path(workdir) / 'top100'))
+    saveTop100rank.insert_into_top100rank_compact(rows)
+    return {'items': len(rows), 'rows_written': len(rows)}
+
+
+def report_rows(days, charts=20, limit=100):
+    """Rank rows in the top100rank shape: `days` days of `charts` charts with `limit` ranks each."""
+    start = datetime(2024, 11, 1)
+    rows = []
+    for day in range(days):
+        update_at = (start + timedelta(days=day)).isoformat()
+        for chart in range(charts):
+            for rank in range(1, limit + 1):
+                appid = str(1000000 + (chart * 37 + rank * 13 + day * (rank % 7)) % 4000)
+                rows.append({
+                    'appid': appid, 'appname': f'benchmark-app-{appid}', 'title': f'Benchmark App {appid}',
+                    'type': ('free', 'paid')[chart % 2], 'cname': f'genre-{chart // 2}', 'cid': str(6000 + chart // 2),
+                    'platform': ('iphone', 'ipad')[chart % 4 // 2], 'country': 'us', 'rank': rank,
+                    'updateAt': update_at,
+                })
+    return rows
+
+
+def run_report(base_url, workdir, report_days=30, **_):
+    """Rank frame preparation, the report sections and the gzip report writer."""
+    from report_pipeline import load_report_module, run_report_sections
+    from report_writer import ReportWriter
+
+    rows = report_rows(report_days)
+    frame = load_report_module().prepare_frame(rows)
+    with ReportWriter(Path(workdir) / 'report.json.gz') as writer:
+        run_report_sections(frame, on_section=writer.write_section)
+    return {'items': len(rows), 'report_bytes': writer.bytes_written}
+
+
+PIPELINES = {
+    'reviews': run_reviews,
+    'sitemap': run_sitemap,
+    'top100': run_top100,
+    'report': run_report,
+}
+
+
+def run_pipeline(name, base_url, options):
+    timer = RequestTimer().install()
+    METRICS.reset()
+    with tempfile.TemporaryDirectory(prefix=f'bench-{name}-') as workdir:
+        started = time.perf_counter()
+        result = PIPELINES[name](base_url, workdir, **options)
+        seconds = time.perf_counter() - started
+    result.update({
+        'pipeline': name,
+        'seconds': round(seconds, 3),
+        'items_per_sec': round(result['items'] / seconds, 1) if seconds else None,
+        # ru_maxrss is in kilobytes on Linux
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'latency': timer.summary(),
+        'metrics': METRICS.snapshot(),
+    })
+    return result
+
+
+if __name__ == '__main__':
+    name, base_url, result_path = sys.argv[1:4]
+    options = json.loads(sys.argv[4]) if len(sys.argv) > 4 else {}
+    result = run_pipeline(name, base_url, options)
+    with open(result_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f)
@@ -0,0 +1,68 @@
+"""
+Record live App Store responses into benchmarks/fixtures/ so the fixture
+server replays real payloads instead of generated ones:
+
+    python benchmarks/record_fixtures.py --app-id 284882215 --country us
+
+Recorded files: token_page.html, amp_reviews.json (first review page),
+rss_feed.json (top free iPhone apps) and sitemap_shard.xml.gz (first shard
+of the app sitemap index).
+"""
+import argparse
+import sys
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fixture_server import FIXTURE_DIR, _page_token  # noqa: E402
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36',
+}
+TOKEN_PAGE_URL = 'https://apps.apple.com/404'
+REVIEWS_URL = 'https://amp-api.apps.apple.com/v1/catalog/{country}/apps/{app_id}/reviews'
+RSS_URL = 'https://itunes.apple.com/{country}/rss/topfreeapplications/limit=100/json'
+SITEMAP_INDEX_URL = 'https://apps.apple.com/sitemaps_apps_index_app_1.xml'
+
+
+def fetch(url, **kwargs):
+    response = requests.get(url, headers=dict(HEADERS, **kwargs.pop('headers', {})), timeout=60, **kwargs)
+    response.raise_for_status()
+    return response.content
+
+
+def save(name, content):
+    path = FIXTURE_DIR / name
+    path.write_bytes(content)
+    print(f"[INFO] Recorded {path} ({len(content)} bytes)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record App Store responses for the benchmark fixtures.')
+    parser.add_argument('--app-id', default='284882215')
+    parser.add_argument('--country', default='us')
+    args = parser.parse_args()
+    FIXTURE_DIR.mkdir(parents=True, exist_ok=True)
+
+    token_page = fetch(TOKEN_PAGE_URL)
+    save('token_page.html', token_page)
+    token = _page_token(token_page)
+
+    params = {'offset': '0', 'limit': '20', 'platform': 'web', 'additionalPlatforms': 'appletv,ipad,iphone,mac'}
+    save('amp_reviews.json', fetch(REVIEWS_URL.format(country=args.country, app_id=args.app_id), params=params,
+                                   headers={'Authorization': f'bearer {token}', 'Origin': 'https://apps.apple.com'}))
+    save('rss_feed.json', fetch(RSS_URL.format(country=args.country)))
+
+    index = ET.fromstring(fetch(SITEMAP_INDEX_URL))
+    loc = index.find('.//{http://www.sitemaps.org/schemas/sitemap/0.9}loc')
+    if loc is None:
+        print("[ERROR] No shard in the sitemap index")
+        return
+    save('sitemap_shard.xml.gz', fetch(loc.text))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+End-to-end ingest benchmark.
+
+Every pipeline runs in its own process against a local fixture server
+(App Store token page, amp-api reviews, chart feeds, sitemaps) and a local
+D1 emulator, so runs need no network or Cloudflare account and can be
+compared before and after a change:
+
+    python benchmarks/run.py
+    python benchmarks/run.py --pipelines reviews,top100 --apps 200 --d1-latency-ms 40 --error-rate 0.05
+
+Results (wall time, throughput, request latency percentiles, peak RSS and
+server-side request counts) are printed and written to
+benchmarks/results/<timestamp>.json.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+sys.path.insert(0, str(BENCH_DIR))
+
+from d1_emulator import start_emulator  # noqa: E402
+from fixture_server import start_fixture_server  # noqa: E402
+
+RESULTS_DIR = BENCH_DIR / 'results'
+PIPELINES = ['reviews', 'sitemap', 'top100', 'report']
+
+
+def child_env(d1_base_url):
+    env = dict(os.environ)
+    env.update({
+        'CLOUDFLARE_API_BASE_URL': d1_base_url,
+        'CLOUDFLARE_ACCOUNT_ID': 'benchmark',
+        'CLOUDFLARE_API_TOKEN': 'benchmark',
+        'CLOUDFLARE_D1_DATABASE_ID': 'benchmark',
+        'D1_APP_DATABASE_ID': 'benchmark',
+        'PYTHONPATH': os.pathsep.join(filter(None, [str(BENCH_DIR.parent), env.get('PYTHONPATH')])),
+    })
+    return env
+
+
+def run_one(name, args, options):
+    """Run one pipeline in a child process against fresh servers. Returns its result dict."""
+    fixtures = start_fixture_server(review_pages=args.pages, sitemap_shards=args.shards,
+                                    urls_per_shard=args.urls_per_shard, latency_ms=args.upstream_latency_ms)
+    emulator = start_emulator(latency_ms=args.d1_latency_ms, jitter_ms=args.d1_jitter_ms,
+                              error_rate=args.error_rate, seed=args.seed)
+    try:
+        with tempfile.TemporaryDirectory(prefix='bench-') as workdir:
+            result_path = Path(workdir) / 'result.json'
+            command = [sys.executable, str(BENCH_DIR / 'pipelines.py'), name, fixtures.base_url,
+                       str(result_path), json.dumps(options)]
+            started = time.perf_counter()
+            # The pipelines write logs and caches to the working directory
+            completed = subprocess.run(command, cwd=workdir, env=child_env(emulator.base_url),
+                                       stdout=subprocess.DEVNULL if args.quiet else None)
+            elapsed = time.perf_counter() - started
+            if completed.returncode != 0 or not result_path.exists():
+                return {'pipeline': name, 'error': f'exited with {completed.returncode}',
+                        'seconds': round(elapsed, 3)}
+            with open(result_path, encoding='utf-8') as f:
+                result = json.load(f)
+        result['servers'] = {
+            'upstream_requests': dict(fixtures.requests),
+            'd1_requests': emulator.requests,
+            'd1_statements': emulator.database.queries,
+            'd1_injected_errors': emulator.injected,
+        }
+        return result
+    finally:
+        fixtures.shutdown()
+        emulator.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end ingest benchmark against local fixtures.')
+    parser.add_argument('--pipelines', default=','.join(PIPELINES), help='comma separated, default all')
+    parser.add_argument('--apps', type=int, default=50, help='apps crawled by the reviews pipeline')
+    parser.add_argument('--pages', type=int, default=5, help='review pages (20 reviews each) per app')
+    parser.add_argument('--workers', type=int, default=32, help='review scheduler workers')
+    parser.add_argument('--shards', type=int, default=4, help='sitemap shards')
+    parser.add_argument('--urls-per-shard', type=int, default=500)
+    parser.add_argument('--save-rows', type=int, default=200, help='sitemap rows saved as app profiles')
+    parser.add_argument('--storefronts', default='us,gb')
+    parser.add_argument('--genres', default='6014,6016,6017,6018')
+    parser.add_argument('--report-days', type=int, default=30)
+    parser.add_argument('--upstream-latency-ms', type=float, default=0)
+    parser.add_argument('--d1-latency-ms', type=float, default=0)
+    parser.add_argument('--d1-jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of D1 requests failing with 429/5xx')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default=None, help='result file (default benchmarks/results/<timestamp>.json)')
+    parser.add_argument('--quiet', action='store_true', help='hide pipeline output')
+    args = parser.parse_args()
+
+    options = {
+        'reviews': {'apps': args.apps, 'workers': args.workers},
+        'sitemap': {'save_rows': args.save_rows},
+        'top100': {'storefronts': args.storefronts, 'genres': args.genres},
+        'report': {'report_days': args.report_days},
+    }
+    results = []
+    for name in args.pipelines.split(','):
+        name = name.strip()
+        if name not in options:
+            print(f"[ERROR] Unknown pipeline {name}, expected one of {', '.join(PIPELINES)}")
+            continue
+        print(f"[INFO] Benchmark {name}")
+        results.append(run_one(name, args, options[name]))
+
+    report = {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'cpus': os.cpu_count(),
+        'config': vars(args),
+        'results': results,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"[INFO] Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,332 @@
+import asyncio
+import codecs
+import csv
+import hashlib
+import json
+import os
+import random
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+from instrumentation import METRICS
+
+CDX_URL = "http://web.archive.org/cdx/search/cdx"
+CDX_FIELDS = ['timestamp', 'original', 'statuscode']
+PAGE_LIMIT = int(os.getenv('CDX_PAGE_LIMIT', '50000'))
+CONCURRENCY = int(os.getenv('CDX_CONCURRENCY', '4'))
+MAX_RETRIES = 5
+BASE_DELAY_SECS = 5
+# Next character after an app url prefix. CDX matches on the canonical
+# urlkey, which is lower-cased and percent-encodes anything outside printable
+# ascii, so every printable character but upper-case letters, space and '#'
+# (fragments are dropped) can follow. The bare prefix itself is fetched by an
+# extra exact-match partition.
+PREFIX_ALPHABET = ''.join(chr(c) for c in range(33, 127) if not chr(c).isupper() and chr(c) != '#')
+
+HEADERS = {
+    'Referer': 'https://web.archive.org/',
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36',
+}
+
+
+class CdxError(Exception):
+    """Raised when a CDX page still fails after all retries."""
+    pass
+
+
+class CdxLineDecoder:
+    """
+    Turn a stream of byte chunks into complete text lines.
+
+    Bytes go through an incremental UTF-8 decoder (a multi-byte character
+    split across chunks is kept for the next one) and only the unfinished
+    tail line is carried over, so each byte is decoded once.
+    """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._tail = ''
+
+    def feed(self, chunk):
+        text = self._tail + self._decoder.decode(chunk)
+        lines = text.split('\n')
+        self._tail = lines.pop()
+        return [line.rstrip('\r') for line in lines]
+
+    def close(self):
+        text = self._tail + self._decoder.decode(b'', final=True)
+        self._tail = ''
+        return [text.rstrip('\r')] if text else []
+
+
+def _date(value, end=False):
+    """YYYY, YYYYMM or YYYYMMDD (int or str) -> 8 digit date string."""
+    value = str(value)
+    if len(value) == 4:
+        return value + ('1231' if end else '0101')
+    if len(value) == 6:
+        return value + ('31' if end else '01')
+    return value[:8]
+
+
+def time_partitions(start=None, end=None):
+    """
+    Calendar-year [from, to] ranges covering start..end (inclusive dates).
+    Without a start the whole history is a single range.
+    """
+    if start is None:
+        return [(None, _date(end, end=True) if end else None)]
+    start = _date(start)
+    end = _date(end, end=True) if end else datetime.now().strftime('%Y%m%d')
+    ranges = []
+    for year in range(int(start[:4]), int(end[:4]) + 1):
+        ranges.append((max(start, f'{year}0101'), min(end, f'{year}1231')))
+    return ranges
+
+
+def prefix_partitions(prefix, split=True):
+    """
+    (url, match type) pairs covering a prefix query: the prefix itself, or
+    one sub-prefix per possible next character plus the bare prefix as an
+    exact match.
+    """
+    prefix = prefix.replace('https://', '').replace('http://', '')
+    if not split:
+        return [(prefix, 'prefix')]
+    return [(prefix, 'exact')] + [(prefix + char, 'prefix') for char in PREFIX_ALPHABET]
+
+
+def cdx_partitions(prefix, start=None, end=None, split_prefix=True):
+    """Independent (partition key, url, match type, from, to) slices of one query."""
+    partitions = []
+    for url_prefix, match_type in prefix_partitions(prefix, split_prefix):
+        name = url_prefix if match_type == 'prefix' else f"{url_prefix}[{match_type}]"
+        for date_from, date_to in time_partitions(start, end):
+            key = f"{name}|{date_from or ''}-{date_to or ''}"
+            partitions.append((key, url_prefix, match_type, date_from, date_to))
+    return partitions
+
+
+def parse_cdx_lines(lines, fields):
+    """
+    Split plain-text CDX lines into rows. With showResumeKey the rows end
+    with a blank line and the resume key. Returns (rows, resume key or None).
+    """
+    rows = []
+    resume_key = None
+    after_blank = False
+    for line in lines:
+        if not line.strip():
+            after_blank = True
+            continue
+        if after_blank:
+            resume_key = line.strip()
+            continue
+        parts = line.split(' ')
+        if len(parts) == len(fields):
+            rows.append(parts)
+    return rows, resume_key
+
+
+class CdxState:
+    """
+    Progress of a partitioned fetch, kept in `<out_dir>/state.json`:
+    per partition the last resume key, rows written, parts written and
+    whether it is finished. Written atomically after every page.
+    """
+
+    def __init__(self, out_dir):
+        self.path = Path(out_dir) / 'state.json'
+        if self.path.exists():
+            with open(self.path, encoding='utf-8') as f:
+                self.partitions = json.load(f)
+        else:
+            self.partitions = {}
+
+    def get(self, key):
+        return self.partitions.setdefault(key, {'resume_key': None, 'rows': 0, 'parts': 0, 'done': False})
+
+    def save(self):
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.partitions, f)
+        os.replace(tmp_path, self.path)
+
+
+def _part_name(key, part):
+    safe = ''.join(c if c.isalnum() or c in '-_' else '_' for c in key)
+    # Keys differing only in punctuation sanitize alike; the digest keeps them apart
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:8]
+    return f"part-{safe}-{digest}-{part:05d}.parquet"
+
+
+def write_part(path, rows, fields):
+    """Write one page of rows as Parquet: int64 timestamp, dictionary-encoded status/mime."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = {}
+    for i, field in enumerate(fields):
+        values = [row[i] for row in rows]
+        if field == 'timestamp':
+            columns[field] = pa.array([int(v) if v.isdigit() else None for v in values], pa.int64())
+        elif field in ('statuscode', 'mimetype'):
+            columns[field] = pa.array(values, pa.string()).dictionary_encode()
+        else:
+            columns[field] = pa.array(values, pa.string())
+    tmp_path = str(path) + '.tmp'
+    pq.write_table(pa.table(columns), tmp_path, compression='zstd')
+    os.replace(tmp_path, path)
+
+
+async def fetch_cdx_page(client, url_prefix, date_from, date_to, fields, resume_key=None,
+                         limit=PAGE_LIMIT, collapse='urlkey', filters=(), match_type='prefix'):
+    """
+    Stream one page (up to `limit` rows) of a prefix (or `match_type`) query.
+    Returns (rows, resume key for the next page or None when finished).
+    """
+    params = [('url', url_prefix), ('matchType', match_type), ('fl', ','.join(fields)),
+              ('limit', str(limit)), ('showResumeKey', 'true')]
+    if collapse:
+        params.append(('collapse', collapse))
+    if date_from:
+        params.append(('from', date_from))
+    if date_to:
+        params.append(('to', date_to))
+    for item in filters:
+        params.append(('filter', item))
+    if resume_key:
+        params.append(('resumeKey', resume_key))
+
+    for attempt in range(MAX_RETRIES):
+        try:
+            decoder = CdxLineDecoder()
+            lines = []
+            with METRICS.stage('cdx.page'):
+                async with client.stream('GET', CDX_URL, params=params, headers=HEADERS) as response:
+                    METRICS.record_response('wayback_cdx', response.status_code)
+                    response.raise_for_status()
+                    async for chunk in response.aiter_bytes():
+                        lines.extend(decoder.feed(chunk))
+                lines.extend(decoder.close())
+            rows, next_key = parse_cdx_lines(lines, fields)
+            METRICS.inc('items_total', len(rows), stage='cdx.rows')
+            return rows, next_key
+        except (httpx.TransportError, httpx.HTTPStatusError) as e:
+            status = e.response.status_code if isinstance(e, httpx.HTTPStatusError) else None
+            if status is None:
+                METRICS.record_response('wayback_cdx', 'error')
+            if status is not None and status not in (429, 502, 503, 504):
+                raise CdxError(f"CDX query for {url_prefix} failed with {status}") from e
+            if attempt == MAX_RETRIES - 1:
+                raise CdxError(f"CDX query for {url_prefix} failed after {MAX_RETRIES} attempts: {e}") from e
+            delay = BASE_DELAY_SECS * (2 ** attempt) + random.uniform(0, 1)
+            METRICS.record_retry('wayback_cdx')
+            print(f"[WARN] CDX {url_prefix} {date_from}-{date_to}: {e}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+async def fetch_partition(client, state, out_dir, key, url_prefix, match_type, date_from, date_to, fields,
+                          stop=None, **query):
+    """
+    Page through one partition from its saved resume key, writing a part file
+    per page. `stop()` is checked before each page; a stopped partition stays
+    unfinished so a later run resumes it.
+    """
+    progress = state.get(key)
+    while not progress['done'] and not (stop and stop()):
+        rows, resume_key = await fetch_cdx_page(client, url_prefix, date_from, date_to, fields,
+                                                progress['resume_key'], match_type=match_type, **query)
+        if rows:
+            path = Path(out_dir) / _part_name(key, progress['parts'])
+            await asyncio.to_thread(write_part, path, rows, fields)
+            progress['parts'] += 1
+            progress['rows'] += len(rows)
+        progress['resume_key'] = resume_key
+        progress['done'] = not resume_key or not rows
+        state.save()
+    return progress['rows']
+
+
+async def fetch_cdx(prefix, out_dir, start=None, end=None, fields=None, split_prefix=True,
+                    concurrency=CONCURRENCY, client=None, max_rows=None, **query):
+    """
+    Fetch every capture under a url prefix into Parquet part files.
+
+    The query is split by next prefix character (plus an exact match on the
+    prefix itself) and, when `start` is given, by calendar year; without
+    `start` each prefix covers the whole history. The
+    partitions are fetched concurrently over one client. Each page is
+    streamed, decoded incrementally and written straight to
+    `<out_dir>/part-*.parquet`, and the partition's resume key is saved to
+    `<out_dir>/state.json`, so an interrupted backfill continues where it
+    stopped. With `max_rows` no new page is requested once the partitions
+    hold that many rows (pages in flight still finish). Extra keyword
+    arguments (limit, collapse, filters) go to the CDX query. Returns
+    {partition key: rows written}.
+
+        await fetch_cdx('https://apps.apple.com/us/app/', './result/cdx/us', start=2020)
+        frame = read_cdx('./result/cdx/us')
+    """
+    if client is None:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(60, read=300)) as client:
+            return await fetch_cdx(prefix, out_dir, start, end, fields, split_prefix, concurrency, client,
+                                   max_rows, **query)
+
+    fields = fields or CDX_FIELDS
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    state = CdxState(out_dir)
+    partitions = cdx_partitions(prefix, start, end, split_prefix)
+    pending = [p for p in partitions if not state.get(p[0])['done']]
+    print(f"[INFO] CDX {prefix}: {len(partitions)} partitions, {len(pending)} left to fetch")
+    semaphore = asyncio.Semaphore(concurrency)
+
+    def stop():
+        return sum(progress['rows'] for progress in state.partitions.values()) >= max_rows
+
+    async def run(partition):
+        key, url_prefix, match_type, date_from, date_to = partition
+        async with semaphore:
+            return await fetch_partition(client, state, out_dir, key, url_prefix, match_type, date_from, date_to,
+                                         fields, stop=stop if max_rows else None, **query)
+
+    outcomes = await asyncio.gather(*(run(p) for p in pending), return_exceptions=True)
+    for partition, outcome in zip(pending, outcomes):
+        if isinstance(outcome, Exception):
+            print(f"[ERROR] CDX partition {partition[0]} stopped: {outcome}")
+    counts = {key: progress['rows'] for key, progress in state.partitions.items()}
+    print(f"[INFO] CDX {prefix}: {sum(counts.values())} rows in {out_dir}")
+    return counts
+
+
+def read_cdx(out_dir, columns=None):
+    """All part files of a fetch as one DataFrame."""
+    import pyarrow.parquet as pq
+
+    paths = sorted(Path(out_dir).glob('part-*.parquet'))
+    if not paths:
+        return None
+    return pq.ParquetDataset([str(p) for p in paths]).read(columns=columns).to_pandas()
+
+
+def write_cdx_csv(out_dir, csv_path, columns=('timestamp', 'original'), header=('timestamp', 'url')):
+    """
+    Write the part files of a fetch to one CSV, a part at a time, for readers
+    of the CSV files the serial backfill used to produce. Returns the rows written.
+    """
+    import pyarrow.parquet as pq
+
+    rows = 0
+    tmp_path = f"{csv_path}.tmp"
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for path in sorted(Path(out_dir).glob('part-*.parquet')):
+            table = pq.read_table(path, columns=list(columns))
+            writer.writerows(zip(*(table.column(name).to_pylist() for name in columns)))
+            rows += table.num_rows
+    os.replace(tmp_path, csv_path)
+    return rows
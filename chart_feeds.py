@@ -0,0 +1,184 @@
+import asyncio
+import random
+from datetime import datetime
+from urllib.parse import urlparse
+
+import httpx
+from instrumentation import METRICS
+
+# Legacy iTunes RSS generator: the only public JSON chart feed that can be
+# filtered by genre. Serves up to 200 entries; we keep the top 100 like the
+# apps.apple.com chart pages.
+CHART_FEED_URL = "https://itunes.apple.com/{country}/rss/{feed}/limit={limit}{genre}/json"
+CHART_LIMIT = 100
+CONCURRENCY = 16
+MAX_RETRIES = 3
+BASE_DELAY_SECS = 1
+
+# (platform, chart type) -> feed name
+CHART_FEEDS = {
+    ('iphone', 'free'): 'topfreeapplications',
+    ('iphone', 'paid'): 'toppaidapplications',
+    ('ipad', 'free'): 'topfreeipadapplications',
+    ('ipad', 'paid'): 'toppaidipadapplications',
+}
+PLATFORMS = ['iphone', 'ipad']
+CHART_TYPES = ['free', 'paid']
+
+# genre id -> category slug used in apps.apple.com/{country}/charts/{platform}/{slug}/{id}
+APP_GENRES = {
+    '6018': 'books-apps',
+    '6000': 'business-apps',
+    '6026': 'developer-tools-apps',
+    '6017': 'education-apps',
+    '6016': 'entertainment-apps',
+    '6015': 'finance-apps',
+    '6023': 'food-and-drink-apps',
+    '6014': 'games-apps',
+    '6027': 'graphics-and-design-apps',
+    '6013': 'health-and-fitness-apps',
+    '6012': 'lifestyle-apps',
+    '6021': 'magazines-and-newspapers-apps',
+    '6020': 'medical-apps',
+    '6011': 'music-apps',
+    '6010': 'navigation-apps',
+    '6009': 'news-apps',
+    '6008': 'photo-and-video-apps',
+    '6007': 'productivity-apps',
+    '6006': 'reference-apps',
+    '6024': 'shopping-apps',
+    '6005': 'social-networking-apps',
+    '6004': 'sports-apps',
+    '6003': 'travel-apps',
+    '6002': 'utilities-apps',
+    '6001': 'weather-apps',
+}
+GAME_GENRES = {
+    '7001': 'action-games',
+    '7002': 'adventure-games',
+    '7003': 'arcade-games',
+    '7004': 'board-games',
+    '7005': 'card-games',
+    '7006': 'casino-games',
+    '7009': 'family-games',
+    '7011': 'music-games',
+    '7012': 'puzzle-games',
+    '7013': 'racing-games',
+    '7014': 'role-playing-games',
+    '7015': 'simulation-games',
+    '7016': 'sports-games',
+    '7017': 'strategy-games',
+    '7018': 'trivia-games',
+    '7019': 'word-games',
+}
+GENRES = {**APP_GENRES, **GAME_GENRES}
+
+
+def chart_url(country, platform, genre_id):
+    """apps.apple.com chart page of a genre, the same URL the browser flow collected."""
+    return f"https://apps.apple.com/{country}/charts/{platform}/{GENRES[genre_id]}/{genre_id}"
+
+
+def parse_chart_domain(domain):
+    """'https://apps.apple.com/us/charts/iphone' -> ('us', 'iphone')"""
+    parts = urlparse(domain).path.strip('/').split('/')
+    return parts[0], parts[-1]
+
+
+def feed_url(country, platform, chart_type, genre_id=None, limit=CHART_LIMIT):
+    genre = f"/genre={genre_id}" if genre_id else ''
+    return CHART_FEED_URL.format(country=country, feed=CHART_FEEDS[(platform, chart_type)], limit=limit, genre=genre)
+
+
+def _label(entry, key):
+    return (entry.get(key) or {}).get('label')
+
+
+def parse_chart_entries(data, country, platform, chart_type, genre_id, update_at):
+    """
+    Turn one feed response into ios_top100_rank_data rows (the same fields
+    getids_from_category scraped from the chart page).
+    """
+    entries = (data.get('feed') or {}).get('entry') or []
+    if isinstance(entries, dict):  # a feed with a single entry is not wrapped in a list
+        entries = [entries]
+    rows = []
+    for rank, entry in enumerate(entries[:CHART_LIMIT], start=1):
+        link = (entry.get('link') or {}).get('attributes', {}).get('href') or _label(entry, 'id') or ''
+        link = link.split('?')[0]
+        images = entry.get('im:image') or []
+        rows.append({
+            "platform": platform,
+            "country": country,
+            "type": chart_type,
+            "cid": genre_id,
+            "cname": GENRES.get(genre_id, genre_id),
+            "appname": link.rstrip('/').split('/')[-2] if '/app/' in link else '',
+            "rank": rank,
+            "appid": f"id{entry['id']['attributes']['im:id']}",
+            "icon": images[-1]['label'] if images else None,
+            "link": link,
+            "title": _label(entry, 'im:name'),
+            "updateAt": update_at,
+        })
+    return rows
+
+
+async def fetch_chart(client, country, platform, chart_type, genre_id, update_at, max_retries=MAX_RETRIES):
+    """Fetch one chart; returns [] (and reports) when the storefront has no such chart."""
+    url = feed_url(country, platform, chart_type, genre_id)
+    for attempt in range(max_retries):
+        try:
+            with METRICS.stage('chart_feeds.request'):
+                response = await client.get(url)
+            METRICS.record_response('itunes_rss', response.status_code)
+            if response.status_code == 404:
+                return []
+            if response.status_code != 429 and response.status_code < 500:
+                response.raise_for_status()
+                with METRICS.stage('chart_feeds.parse'):
+                    rows = parse_chart_entries(response.json(), country, platform, chart_type, genre_id, update_at)
+                METRICS.inc('items_total', len(rows), stage='chart_feeds.rows')
+                return rows
+        except (httpx.HTTPError, ValueError) as e:
+            if isinstance(e, httpx.TransportError):
+                METRICS.record_response('itunes_rss', 'error')
+            print(f"[ERROR] {url}: {e}")
+        METRICS.record_retry('itunes_rss')
+        await asyncio.sleep(BASE_DELAY_SECS * (2 ** attempt) + random.uniform(0, 1))
+    print(f"[ERROR] Giving up on chart {url}")
+    return []
+
+
+async def fetch_charts(targets, genres=None, chart_types=CHART_TYPES, concurrency=CONCURRENCY, update_at=None, client=None):
+    """
+    Fetch the top charts of every (country, platform) target for every genre
+    and chart type concurrently. Returns the rows of all charts.
+    """
+    genres = list(genres or GENRES)
+    update_at = update_at or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(client, country, platform, chart_type, genre_id):
+        async with semaphore:
+            return await fetch_chart(client, country, platform, chart_type, genre_id, update_at)
+
+    async def fetch_all(client):
+        jobs = [run(client, country, platform, chart_type, genre_id)
+                for country, platform in targets
+                for chart_type in chart_types
+                for genre_id in genres]
+        return await asyncio.gather(*jobs)
+
+    if client is not None:
+        charts = await fetch_all(client)
+    else:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(limits=limits, timeout=30, follow_redirects=True) as client:
+            charts = await fetch_all(client)
+    return [row for chart in charts for row in chart]
+
+
+if __name__ == "__main__":
+    rows = asyncio.run(fetch_charts([('us', 'iphone'), ('us', 'ipad')]))
+    print(f"{len(rows)} chart rows")
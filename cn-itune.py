@@ -6,6 +6,7 @@ import json
 import time
 import openpyxl
 import os
+from review_store import ReviewStore
 
 def SearchAppId(app):
     url = "http://itunes.apple.com/search?term=" + app + "&entity=software"
@@ -24,6 +25,7 @@ def SearchAppId(app):
 
 def SaveContent(id, wb, ws):
     row = 2
+    records = []
 
     for j in range(1, 11):  # 只能爬取前十页
         url = "https://itunes.apple.com/rss/customerreviews/page=" + \
@@ -44,12 +46,22 @@ def SaveContent(id, wb, ws):
                 ws.cell(row=row, column=3, value=user_id)
                 ws.cell(row=row, column=4, value=content)
                 row = row + 1
+                records.append({
+                    'id': user_id,
+                    'userName': name,
+                    'rating': rate,
+                    'review': content,
+                    'date': i['updated']['label'],
+                })
                 print(name, rate, user_id, content)
         else:
-            return
+            break
         # 每一页爬取延迟2秒，以防过于频繁
         time.sleep(2)
 
+    if records:
+        ReviewStore().write(records, platform='ios', country='cn', appid=id)
+
 def main(appName,appid):
         app = appName
         id = appid.replace('id', '')
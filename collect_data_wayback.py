@@ -1,226 +1,91 @@
-import requests as rq
-import time
+import asyncio
 import os
 import argparse
 import sys
-from tqdm import tqdm
+from pathlib import Path
+from cdx_client import fetch_cdx, read_cdx, write_cdx_csv
+from log_utils import get_logger
 
 sys.path.insert(1, os.path.join(sys.path[0], '..'))
 
-def collect_data_wayback(website_url,
-                         output_dir,
-                         start_date,
-                         end_date,
-                         resume_key='',
-                         max_count=1000,
-                         chunk_size=100,
-                         sleep=3,
-                         retries=5):
-    if 'http://' in website_url:
-        website_url = website_url.replace('http://', '')
-    if 'https://' in website_url:
-        website_url = website_url.replace('https://', '')
+log = get_logger('collect_data_wayback')
 
-    if chunk_size > max_count:
-        raise ValueError('Chunk size needs to be smaller than max count.')
+# CDX part files per (site, date window); a rerun with the same window resumes
+WAYBACK_CDX_DIR = os.getenv('WAYBACK_CDX_DIR', './result/cdx')
 
-    unique_articles_set = set()
-    url_list = []
-    url_template = 'http://web.archive.org/cdx/search/cdx?url=https://www.{domain}&collapse=urlkey&filter=!statuscode:404&showResumeKey=true&matchType=prefix&from={start}&to={end}&limit={chunk}&output=json'
-    
-    url = url_template.format(domain=website_url, start=start_date, end=end_date, chunk=chunk_size)
-    if resume_key:
-        url += '&resumeKey=' + resume_key
-
-    its = max_count // chunk_size
-    progress_bar = tqdm(total=its)
-
-    for _ in range(its):
-        for attempt in range(retries):
-            try:
-                result = rq.get(url)
-                result.raise_for_status()
-                parse_url = result.json()
-
-                if len(parse_url) < 2:
-                    print("No more data to fetch.")
-                    progress_bar.close()
-                    return url_list
-                
-                # Update resume_key and URL for the next batch
-                new_resume_key = parse_url[-1][0] if parse_url[-1][0] != resume_key else ''
-                if not new_resume_key:
-                    print("No progress detected with resume key. Exiting loop.")
-                    progress_bar.close()
-                    return url_list
-                
-                resume_key = new_resume_key
-                for i in range(1, len(parse_url) - 1):
-                    # print('====',parse_url[i])
-                    if len(parse_url[i])<5:
-                      continue
-                    orig_url = parse_url[i][2]
-                    print('======',orig_url)
-
-                    if parse_url[i][4] != '200':
-                        continue
-                    if orig_url not in unique_articles_set:
-                        url_list.append(orig_url)
-                        unique_articles_set.add(orig_url)
-                
-                url = url_template.format(domain=website_url, start=start_date, end=end_date, chunk=chunk_size) + '&resumeKey=' + resume_key
-                time.sleep(sleep)
-                break
-            except (rq.RequestException, ValueError) as e:
-                if attempt < retries - 1:
-                    time.sleep(2 ** attempt)
-                    continue
-                else:
-                    print(f"Failed to fetch data after {retries} attempts. Error: {e}")
-                    progress_bar.close()
-                    return url_list
-        print('current url',len(url_list))
-
-        progress_bar.update(1)
-
-        # Check if the progress is complete
-        if progress_bar.n == its:
-            print("Progress completed. Returning results.")
-            progress_bar.close()
-            return url_list
-
-    progress_bar.close()
-    print('urls count', len(url_list))
-    print('Collected %s of the initial number of requested urls' % (round(len(url_list) / max_count, 2)))
-    return url_list
 
+def _site(website_url):
+    return website_url.replace('http://', '').replace('https://', '')
 
-import random
 
-# Load SOCKS5 proxies from a URL (or you can load from a file if you prefer)
-def load_proxies(url=None):
-    if url is None:
-      url='https://raw.githubusercontent.com/TheSpeedX/SOCKS-List/master/socks5.txt'
-      # https://github.com/proxifly/free-proxy-list/blob/main/proxies/all/data.txt
-    try:
-        response = rq.get(url)
-        response.raise_for_status()
-        return response.text.splitlines()
-    except rq.RequestException as e:
-        print(f"Error fetching proxy list from {url}: {e}")
-        return []
+def _window_dir(root, website_url, start_date, end_date):
+    name = ''.join(c if c.isalnum() or c in '.-_' else '-' for c in _site(website_url).strip('/'))
+    return Path(root) / name / f"{start_date or 'all'}-{end_date or 'now'}"
 
-# Function to select a random proxy
-def get_random_proxy(proxy_list):
-    return random.choice(proxy_list) if proxy_list else None
 
-sys.path.insert(1, os.path.join(sys.path[0], '..'))
+async def _fetch_window(website_url, output_dir, start_date, end_date, max_count, chunk_size, filters):
+    """Fetch (or resume) one window with cdx_client and return its rows as a DataFrame, or None."""
+    out_dir = _window_dir(output_dir, website_url, start_date, end_date)
+    await fetch_cdx('https://' + _site(website_url), out_dir, start=start_date, end=end_date,
+                    max_rows=max_count, limit=chunk_size, filters=filters)
+    rows = await asyncio.to_thread(write_cdx_csv, out_dir, out_dir / 'urls.csv')
+    log.info('wayback window fetched', site=_site(website_url), rows=rows, path=out_dir)
+    return await asyncio.to_thread(read_cdx, out_dir, ['timestamp', 'original'])
 
-def exact_url_timestamp(website_url,
-                         sleep=3,
-                         retries=5,
-                         max_count=1000,
-                         chunk_size=100,
-                         start_date=None,
-                         end_date=None,
-                        
-                         proxy_retries=3,  # Added retry limit for proxies
-                         proxies=None):  # Added proxies parameter
-    if 'http://' in website_url:
-        website_url = website_url.replace('http://', '')
-    if 'https://' in website_url:
-        website_url = website_url.replace('https://', '')
-
-
-    unique_articles_set = set()
-    items = []
-    if start_date and end_date:                
-        url_template = 'http://web.archive.org/cdx/search/cdx?url=https://www.{domain}/&collapse=urlkey&filter=statuscode:200&matchType=prefix&from={start}&to={end}&limit={chunk}&output=json'
-        url = url_template.format(domain=website_url, start=start_date, end=end_date, chunk=chunk_size)
-    else:
-        url_template = 'http://web.archive.org/cdx/search/cdx?url=https://www.{domain}&collapse=urlkey&filter=!statuscode:404&showResumeKey=true&matchType=prefix&limit={chunk}&output=json'
-        url = url_template.format(domain=website_url, chunk=chunk_size)
-
-                           # max_count=1
-    # chunk_size=1
-    its = max_count // chunk_size
-    progress_bar = tqdm(total=its)
-
-    for _ in range(its):
-        for attempt in range(retries):
-            for proxy_attempt in range(proxy_retries):  # Retry with different proxies if request fails
-                try:
-                    # Select a random proxy from the list
-                    if proxies is None:
-                        proxies=load_proxies()
-                    proxy = get_random_proxy(proxies)
-                    proxy_dict = None
-                    if 'socks5' in proxy==False:
-                        # Define the proxy for requests
-                        proxy_dict = {'http': f'socks5://{proxy}', 'https': f'socks5://{proxy}'}
-                    else:
-                        proxy_dict = {'http': f'{proxy}', 'https': f'{proxy}'}
-                      
-                    result = rq.get(url
-                                    # , proxies=proxy_dict
-                                    ,timeout=30000
-                                   )
-                    result.raise_for_status()
-                    parse_url = result.json()
-
-                    if len(parse_url) < 2:
-                        print("No more data to fetch.")
-                        progress_bar.close()
-                        return items
-                                        
-                    for i in range(1, len(parse_url) - 1):
-                        if len(parse_url[i]) < 5:
-                            continue
-                        orig_url = parse_url[i][2]
-                        indexdate = parse_url[i][1]
-                        item={}
-                      
-                        orig_url=orig_url.replace('http://','https://')
-                        print('---',orig_url)
-                      
-                        item['url']=orig_url
-                        item['timestamp']=indexdate
-                        items.append(item)
-
-                    print('===founding===', len(items))
-                      
-                    break  # Exit proxy retry loop if successful
-                except (rq.RequestException, ValueError) as e:
-                    if proxy_attempt < proxy_retries - 1:
-                        print(f"Proxy failed. Retrying with another proxy. Attempt {proxy_attempt + 1}/{proxy_retries}")
-                        continue  # Try another proxy
-                    else:
-                        print(f"Failed to fetch data after {proxy_retries} proxy attempts. Error: {e}")
-                        progress_bar.close()
-                        return items
-            print('current url index date', len(items))
-
-            progress_bar.update(1)
-
-            # Check if the progress is complete
-            if progress_bar.n == its:
-                print("Progress completed. Returning results.")
-                progress_bar.close()
-                return items
-
-    progress_bar.close()
-    print('urls count', len(items))
-    print('Collected %s of the initial number of requested urls' % (round(len(items) / max_count, 2)))
-    return items
 
+async def collect_data_wayback(website_url,
+                               output_dir,
+                               start_date,
+                               end_date,
+                               max_count=1000,
+                               chunk_size=100):
+    """
+    Unique archived urls (status 200) under `website_url` captured between
+    the dates, at most `max_count`. Pages of `chunk_size` rows are fetched
+    concurrently by cdx_client.fetch_cdx into `output_dir`, which also gets
+    a urls.csv (timestamp,url) per window.
+    """
+    if chunk_size > max_count:
+        raise ValueError('Chunk size needs to be smaller than max count.')
+    frame = await _fetch_window(website_url, output_dir, start_date, end_date, max_count, chunk_size,
+                                ['statuscode:200'])
+    if frame is None:
+        return []
+    url_list = list(dict.fromkeys(frame['original']))[:max_count]
+    log.info('collected urls', count=len(url_list), share=round(len(url_list) / max_count, 2))
+    return url_list
+
+
+async def exact_url_timestamp(website_url,
+                              max_count=1000,
+                              chunk_size=100,
+                              start_date=None,
+                              end_date=None,
+                              output_dir=WAYBACK_CDX_DIR):
+    """
+    First capture of each archived url under `website_url`, at most
+    `max_count`, as [{'url': 'https://...', 'timestamp': 'YYYYMMDDhhmmss'}].
+    With both dates only status 200 captures in that window count, otherwise
+    anything but 404 over the whole history.
+    """
+    filters = ['statuscode:200'] if start_date and end_date else ['!statuscode:404']
+    if not (start_date and end_date):
+        start_date = end_date = None
+    frame = await _fetch_window(website_url, output_dir, start_date, end_date, max_count, chunk_size, filters)
+    if frame is None:
+        return []
+    items = [{'url': url.replace('http://', 'https://'), 'timestamp': str(timestamp)}
+             for timestamp, url in zip(frame['timestamp'], frame['original'])][:max_count]
+    log.info('collected url index dates', count=len(items))
+    return items
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Download articles and images from the Wayback machine.')
     parser.add_argument('--url_domain', type=str, default='factly.in/', 
                         help='The domain to query on the Wayback Machine API. factly.in/, 211check.org/, or pesacheck.org/')
-    parser.add_argument('--file_path', type=str, default='dataset/url/factly.txt',
-                        help='Path to the file that stores the URLs')
+    parser.add_argument('--output_dir', type=str, default=WAYBACK_CDX_DIR,
+                        help='Directory for the CDX part files and urls.csv')
     parser.add_argument('--start_date', type=int, default=20190101,
                         help='Start date for the collection of URLs.')
     parser.add_argument('--end_date', type=int, default=20231231,
@@ -229,15 +94,13 @@ if __name__ == '__main__':
                         help='Maximum number of URLs to collect.')
     parser.add_argument('--chunk_size', type=int, default=4000,
                         help='Size of each chunk to query the Wayback Machine API.')
-    parser.add_argument('--sleep', type=int, default=5,
-                        help='Waiting time between two calls of the Wayback machine API.')
 
     args = parser.parse_args()
 
-    collect_data_wayback(args.url_domain,
-                         args.file_path,
-                         start_date=args.start_date,
-                         end_date=args.end_date,
-                         max_count=args.max_count,
-                         chunk_size=args.chunk_size,
-                         sleep=args.sleep)
+    urls = asyncio.run(collect_data_wayback(args.url_domain,
+                                            args.output_dir,
+                                            start_date=args.start_date,
+                                            end_date=args.end_date,
+                                            max_count=args.max_count,
+                                            chunk_size=args.chunk_size))
+    print('urls count', len(urls))
@@ -0,0 +1,122 @@
+import asyncio
+import os
+import random
+
+import httpx
+from dotenv import load_dotenv
+from instrumentation import METRICS
+
+load_dotenv()
+
+D1_DATABASE_ID = os.getenv('CLOUDFLARE_D1_DATABASE_ID')
+CLOUDFLARE_ACCOUNT_ID = os.getenv('CLOUDFLARE_ACCOUNT_ID')
+CLOUDFLARE_API_TOKEN = os.getenv('CLOUDFLARE_API_TOKEN')
+# Point at a local d1_emulator.py with e.g. http://127.0.0.1:8787/client/v4
+CLOUDFLARE_API_BASE_URL = os.getenv('CLOUDFLARE_API_BASE_URL', 'https://api.cloudflare.com/client/v4')
+
+# D1 rejects statements with more than 100 bound parameters
+D1_MAX_BOUND_PARAMS = 100
+MAX_RETRIES = 3
+BASE_DELAY_SECS = 2
+
+
+class D1Error(Exception):
+    """Raised when a D1 query still fails after all retries."""
+    pass
+
+
+def d1_base_url(database_id=None, account_id=None):
+    return (f"{CLOUDFLARE_API_BASE_URL}/accounts/{account_id or CLOUDFLARE_ACCOUNT_ID}"
+            f"/d1/database/{database_id or D1_DATABASE_ID}")
+
+
+def rows_per_statement(n_columns, max_params=D1_MAX_BOUND_PARAMS):
+    """How many rows of `n_columns` values fit into one parameter-bound statement."""
+    return max(1, max_params // n_columns)
+
+
+def build_insert(table, columns, n_rows, verb='INSERT OR IGNORE', suffix=''):
+    """Multi-row INSERT with one placeholder group per row."""
+    group = '(' + ', '.join(['?'] * len(columns)) + ')'
+    sql = f"{verb} INTO {table} ({', '.join(columns)}) VALUES {', '.join([group] * n_rows)}"
+    return f"{sql} {suffix};" if suffix else f"{sql};"
+
+
+class AsyncD1Client:
+    """
+    Async client for the D1 /query endpoint over one pooled connection.
+
+    At most `concurrency` queries are in flight at once. 429s, 5xx responses
+    and network errors are retried with backoff; a query that still fails
+    raises D1Error.
+    """
+
+    def __init__(self, database_id=None, account_id=None, api_token=None, concurrency=4):
+        self.url = f"{d1_base_url(database_id, account_id)}/query"
+        self.headers = {
+            "Authorization": f"Bearer {api_token or CLOUDFLARE_API_TOKEN}",
+            "Content-Type": "application/json",
+        }
+        self.concurrency = concurrency
+        self.requests = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._client = None
+
+    async def __aenter__(self):
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        self._client = httpx.AsyncClient(limits=limits, timeout=60)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._client.aclose()
+        self._client = None
+        return False
+
+    async def query(self, sql, params=None, retries=MAX_RETRIES):
+        """Run one statement and return the `result` list of the D1 response."""
+        payload = {"sql": sql}
+        if params:
+            payload["params"] = list(params)
+        last_error = None
+        async with self._semaphore:
+            for attempt in range(retries):
+                self.requests += 1
+                try:
+                    with METRICS.stage('d1.query'):
+                        response = await self._client.post(self.url, headers=self.headers, json=payload)
+                    METRICS.record_response('d1', response.status_code)
+                    if response.status_code == 429 or response.status_code >= 500:
+                        last_error = f"HTTP {response.status_code}"
+                    else:
+                        body = response.json()
+                        if response.status_code >= 400 or not body.get('success', False):
+                            # Bad SQL or constraint errors will not succeed on retry
+                            raise D1Error(f"D1 query failed: {body.get('errors') or response.status_code}")
+                        return body.get('result', [])
+                except (httpx.HTTPError, ValueError) as e:
+                    if isinstance(e, httpx.TransportError):
+                        METRICS.record_response('d1', 'error')
+                    last_error = repr(e)
+                METRICS.record_retry('d1')
+                await asyncio.sleep(BASE_DELAY_SECS * (2 ** attempt) + random.uniform(0, 1))
+        raise D1Error(f"D1 query failed after {retries} attempts: {last_error}")
+
+    async def insert_rows(self, table, columns, rows, verb='INSERT OR IGNORE', suffix=''):
+        """
+        Insert `rows` (sequences in `columns` order) with as few statements as
+        the parameter limit allows, sending the statements concurrently.
+        Returns the number of statements sent.
+        """
+        step = rows_per_statement(len(columns))
+        statements = []
+        for i in range(0, len(rows), step):
+            chunk = rows[i:i + step]
+            params = [value for row in chunk for value in row]
+            statements.append(self.query(build_insert(table, columns, len(chunk), verb, suffix), params))
+        try:
+            await asyncio.gather(*statements)
+        except D1Error:
+            METRICS.inc('d1_rows_total', len(rows), table=table, outcome='failed')
+            raise
+        METRICS.inc('d1_rows_total', len(rows), table=table, outcome='written')
+        return len(statements)
@@ -0,0 +1,212 @@
+import argparse
+import json
+import random
+import re
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Same limit the real API enforces (see d1_client.D1_MAX_BOUND_PARAMS)
+D1_MAX_BOUND_PARAMS = 100
+QUERY_PATH = re.compile(r'/accounts/[^/]+/d1/database/[^/]+/query$')
+
+
+class FaultConfig:
+    """
+    Latency and error injection for the emulator.
+
+    Every request waits `latency_ms` plus up to `jitter_ms`. With probability
+    `error_rate` it instead fails with one of `error_statuses` (429 or 5xx,
+    the responses the savers retry). `seed` makes a run repeatable.
+    """
+
+    def __init__(self, latency_ms=0, jitter_ms=0, error_rate=0.0, error_statuses=(429, 500, 503), seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self):
+        """(delay in seconds, injected status or None) for one request."""
+        with self._lock:
+            delay = (self.latency_ms + self._random.uniform(0, self.jitter_ms)) / 1000
+            status = None
+            if self.error_rate and self._random.random() < self.error_rate:
+                status = self._random.choice(self.error_statuses)
+        return delay, status
+
+
+class D1Database:
+    """
+    SQLite behind the D1 /query contract.
+
+    One connection is shared by all request threads and guarded by a lock,
+    which matches D1's one-writer model. Statements run in autocommit mode
+    and a failing statement leaves earlier ones of the same request applied,
+    as on D1.
+    """
+
+    def __init__(self, path=':memory:'):
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self.queries = 0
+
+    def execute(self, sql, params=None):
+        """Run `sql` (one statement with params, or several without) and return D1 result entries."""
+        params = list(params or [])
+        if len(params) > D1_MAX_BOUND_PARAMS:
+            raise sqlite3.OperationalError('too many SQL variables')
+        statements = [sql] if params else split_statements(sql)
+        results = []
+        with self._lock:
+            for statement in statements:
+                self.queries += 1
+                started = time.perf_counter()
+                before = self.connection.total_changes
+                cursor = self.connection.execute(statement, params)
+                rows = [dict(row) for row in cursor.fetchall()]
+                changes = self.connection.total_changes - before
+                results.append({
+                    'results': rows,
+                    'success': True,
+                    'meta': {
+                        'changed_db': changes > 0,
+                        'changes': changes,
+                        'duration': round((time.perf_counter() - started) * 1000, 3),
+                        'last_row_id': cursor.lastrowid or 0,
+                        'rows_read': len(rows),
+                        'rows_written': changes,
+                    },
+                })
+        return results
+
+
+def split_statements(sql):
+    """Split a script into complete statements, keeping ';' inside strings and triggers intact."""
+    statements = []
+    current = ''
+    for piece in sql.split(';'):
+        current += piece + ';'
+        if sqlite3.complete_statement(current):
+            if current.strip(' \t\r\n;'):
+                statements.append(current.strip())
+            current = ''
+    if current.strip(' \t\r\n;'):
+        statements.append(current.strip())
+    return statements
+
+
+def envelope(result=None, errors=None):
+    return {'result': result or [], 'success': not errors, 'errors': errors or [], 'messages': []}
+
+
+class D1RequestHandler(BaseHTTPRequestHandler):
+    """POST .../accounts/<account>/d1/database/<database>/query, D1 style."""
+
+    server_version = 'd1-emulator'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status, body):
+        data = json.dumps(body, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        self.server.requests += 1
+        if not QUERY_PATH.search(self.path.split('?')[0]):
+            return self._send(404, envelope(errors=[{'code': 7003, 'message': 'Could not route to ' + self.path}]))
+        token = self.server.api_token
+        if token and self.headers.get('Authorization') != f'Bearer {token}':
+            return self._send(401, envelope(errors=[{'code': 10000, 'message': 'Authentication error'}]))
+
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            sql = payload['sql']
+        except (ValueError, KeyError, TypeError):
+            return self._send(400, envelope(errors=[{'code': 7400, 'message': 'Invalid request body'}]))
+
+        delay, injected = self.server.faults.draw()
+        if delay:
+            time.sleep(delay)
+        if injected:
+            self.server.injected += 1
+            message = 'Too many requests' if injected == 429 else 'Internal error'
+            return self._send(injected, envelope(errors=[{'code': 7500 if injected != 429 else 971, 'message': message}]))
+
+        # The HTTP API calls them params; older savers send bindings
+        params = payload.get('params', payload.get('bindings'))
+        try:
+            result = self.server.database.execute(sql, params)
+        except sqlite3.Error as e:
+            return self._send(400, envelope(errors=[{'code': 7500, 'message': f'{e}: SQLITE_ERROR'}]))
+        self._send(200, envelope(result))
+
+
+class D1Emulator(ThreadingHTTPServer):
+    """
+    Local HTTP server implementing the D1 /query endpoint on SQLite.
+
+        server = D1Emulator(('127.0.0.1', 8787), db_path='d1.sqlite')
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        # CLOUDFLARE_API_BASE_URL=http://127.0.0.1:8787/client/v4
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 8787), db_path=':memory:', faults=None, api_token=None, verbose=False):
+        super().__init__(address, D1RequestHandler)
+        self.database = D1Database(db_path)
+        self.faults = faults or FaultConfig()
+        self.api_token = api_token
+        self.verbose = verbose
+        self.requests = 0
+        self.injected = 0
+
+    @property
+    def base_url(self):
+        """Value for CLOUDFLARE_API_BASE_URL."""
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/client/v4'
+
+
+def start_emulator(db_path=':memory:', port=0, **faults):
+    """Start an emulator on a background thread. Returns the server; call shutdown() to stop it."""
+    server = D1Emulator(('127.0.0.1', port), db_path, FaultConfig(**faults))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local D1 /query emulator backed by SQLite.')
+    parser.add_argument('--db', default=':memory:', help='SQLite file (default in memory)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8787)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered with 429/500/503')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--token', default=None, help='require this bearer token')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    faults = FaultConfig(args.latency_ms, args.jitter_ms, args.error_rate, seed=args.seed)
+    server = D1Emulator((args.host, args.port), args.db, faults, args.token, args.verbose)
+    print(f"D1 emulator on {server.base_url} (CLOUDFLARE_API_BASE_URL), database {args.db}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"{server.requests} requests, {server.database.queries} statements, {server.injected} injected errors")
@@ -1,21 +1,34 @@
 import httpx
-from bs4 import BeautifulSoup
+import serp_parser
 import pandas as pd
 from datetime import datetime
 import time
-import re
 import os
 import logging
 import random
 import asyncio
+import csv
+from urllib.parse import quote, urlparse
+from rate_limit import AsyncRateLimiter
+from seen_urls import SeenUrls
+
+# Combinations (site, time range, query) crawled at the same time over one client
+MONITOR_CONCURRENCY = int(os.getenv('MONITOR_CONCURRENCY', '8'))
+# Requests per second allowed to one search host, shared by all combinations
+MONITOR_HOST_RATE = float(os.getenv('MONITOR_HOST_RATE', '0.5'))
+MONITOR_HOST_BURST = int(os.getenv('MONITOR_HOST_BURST', '2'))
+MONITOR_SEEN_URLS_PATH = os.getenv('MONITOR_SEEN_URLS_PATH', './data/monitor_seen_urls.u64')
+RESULT_COLUMNS = ['title', 'url', 'game_name', 'site', 'time_range', 'query', 'timestamp']
 
 class DomainMonitor:
-    def __init__(self, sites_file="game_sites.txt"):
+    def __init__(self, sites_file="game_sites.txt", seen_urls=None):
+        self.seen_urls = seen_urls
         self.sites = self._load_sites()
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
         self.setup_logging()
+        self._host_limiters = {}
 
     def setup_logging(self):
         logging.basicConfig(
@@ -70,38 +83,10 @@ class DomainMonitor:
         return f"{base_url}?{query_string}"
 
     def extract_search_results(self, html_content):
-        soup = BeautifulSoup(html_content, 'html.parser')
-        results = []
-        for result in soup.select('div.g'):
-            try:
-                title_elem = result.select_one('h3')
-                url_elem = result.select_one('a')
-                if title_elem and url_elem:
-                    title = title_elem.get_text()
-                    url = url_elem['href']
-                    game_name = self.extract_game_name(title)
-                    results.append({
-                        'title': title,
-                        'url': url,
-                        'game_name': game_name
-                    })
-            except Exception as e:
-                self.logger.error(f"Error extracting result: {str(e)}")
-        return results
+        return serp_parser.extract_search_results(html_content)
 
     def extract_game_name(self, title):
-        patterns = [
-            r'《(.+?)》',
-            r'"(.+?)"',
-            r'【(.+?)】',
-            r'\[(.+?)\]'
-        ]
-        for pattern in patterns:
-            match = re.search(pattern, title)
-            if match:
-                return match.group(1)
-        cleaned_title = re.sub(r'(攻略|评测|资讯|下载|官网|专区|合集|手游|网游|页游|主机游戏|单机游戏)', '', title)
-        return cleaned_title.strip()
+        return serp_parser.extract_game_name(title)
 
 
     def monitor_site_new(self, site, time_range, max_pages=100, advanced_query=None):
@@ -131,14 +116,10 @@ class DomainMonitor:
                     response.raise_for_status()  # Raise HTTPStatusError for bad responses (4xx or 5xx)
 
                     if page == 0:  # Extract total result count only on the first page
-                        soup = BeautifulSoup(response.text, 'html.parser')
-                        result_stats = soup.select_one('#result-stats')
-                        if result_stats:
-                            match = re.search(r'About ([\d,]+) results', result_stats.text)
-                            if match:
-                                total_results = int(match.group(1).replace(',', ''))
-                                total_pages = min(max_pages, (total_results // 100) + 1)
-                                self.logger.info(f"Total results: {total_results}, Total pages: {total_pages}")
+                        total_results = serp_parser.extract_result_count(response.text)
+                        if total_results is not None:
+                            total_pages = min(max_pages, (total_results // 100) + 1)
+                            self.logger.info(f"Total results: {total_results}, Total pages: {total_pages}")
 
                     results = self.extract_search_results(response.text)
                     if not results:  # If no results are found for a page, assume there are no more pages
@@ -164,57 +145,132 @@ class DomainMonitor:
 
         return all_results
 
-    async def monitor_site(self, site, time_range, max_pages=100, advanced_query=None):
-        async with httpx.AsyncClient() as client:
-            all_results = []
-            for page in range(max_pages):
-                start = page * 100
-                search_url = self.build_google_advanced_search_url(advanced_query, time_range, start) if advanced_query else self.build_google_search_url(site, time_range, start)
-                self.logger.info(f"Monitoring {site} for {time_range}, page {page+1}")
-
-                try:
-                    response = await client.get(search_url, headers=self.headers)
-                    response.raise_for_status()
-                    results = self.extract_search_results(response.text)
-                    if not results:
-                        self.logger.info(f"No more results found for {site} on page {page+1}")
-                        break
+    def _host_limiter(self, url):
+        """One token bucket per search host, shared by every running combination."""
+        host = urlparse(url).netloc
+        limiter = self._host_limiters.get(host)
+        if limiter is None:
+            limiter = AsyncRateLimiter(MONITOR_HOST_RATE, MONITOR_HOST_BURST)
+            self._host_limiters[host] = limiter
+        return limiter
 
-                    all_results.extend(results)
-                    self.logger.info(f"Found {len(results)} results for {site} on page {page+1}")
-                    await asyncio.sleep(random.uniform(2, 5))
+    async def monitor_site(self, site, time_range, max_pages=100, advanced_query=None, client=None, on_results=None):
+        """
+        Page through the results of one (site, time range, query) combination.
+
+        Pages are fetched in order until one comes back empty or the result
+        count on the first page says there are no more; the pace is set by the
+        host limiter rather than a fixed sleep. `on_results(results)` is
+        called with every page as it arrives. Pass a shared `client` to reuse
+        its connections across combinations.
+        """
+        if client is None:
+            self._host_limiters = {}
+            async with httpx.AsyncClient(headers=self.headers) as client:
+                return await self.monitor_site(site, time_range, max_pages, advanced_query, client, on_results)
+
+        all_results = []
+        total_pages = max_pages  # Default to max_pages if result count cannot be determined
+        for page in range(max_pages):
+            start = page * 100
+            search_url = self.build_google_advanced_search_url(advanced_query, time_range, start) if advanced_query else self.build_google_search_url(site, time_range, start)
+            self.logger.info(f"Monitoring {site} for {time_range}, page {page+1}")
+
+            try:
+                await self._host_limiter(search_url).acquire()
+                response = await client.get(search_url, headers=self.headers)
+                response.raise_for_status()
+                if page == 0:  # Extract total result count only on the first page
+                    total_results = serp_parser.extract_result_count(response.text)
+                    if total_results is not None:
+                        total_pages = min(max_pages, (total_results // 100) + 1)
+                        self.logger.info(f"Total results: {total_results}, Total pages: {total_pages}")
 
-                except httpx.RequestError as e:
-                    self.logger.error(f"Error fetching page {page + 1} for {site}: {str(e)}")
+                results = self.extract_search_results(response.text)
+                if not results:
+                    self.logger.info(f"No more results found for {site} on page {page+1}")
                     break
-                except Exception as e:
-                    self.logger.error(f"Error processing page {page + 1} for {site}: {str(e)}")
+
+                all_results.extend(results)
+                self.logger.info(f"Found {len(results)} results for {site} on page {page+1}")
+                if on_results is not None:
+                    on_results(results)
+
+                if page + 1 >= total_pages:
+                    self.logger.info(f"Reached the last page based on total results for {site}")
                     break
-            return all_results
 
-    async def monitor_all_sites(self, time_ranges=None, advanced_queries=None):
+            except httpx.RequestError as e:
+                self.logger.error(f"Error fetching page {page + 1} for {site}: {str(e)}")
+                break
+            except Exception as e:
+                self.logger.error(f"Error processing page {page + 1} for {site}: {str(e)}")
+                break
+        return all_results
+
+    def _combinations(self, time_ranges, advanced_queries):
+        """(site, time range, query) for every site; a site may map to one query or a list."""
+        for site in self.sites:
+            queries = advanced_queries.get(site) if advanced_queries else None
+            if not isinstance(queries, (list, tuple)):
+                queries = [queries]
+            for query in queries:
+                for time_range in time_ranges:
+                    yield site, time_range, query
+
+    async def monitor_all_sites(self, time_ranges=None, advanced_queries=None, output_file=None,
+                                concurrency=MONITOR_CONCURRENCY):
+        """
+        Run every (site, time range, query) combination concurrently over one
+        shared client, at most `concurrency` at a time and paced per host.
+
+        Rows are appended to `output_file` (a timestamped CSV by default) page
+        by page as they arrive, so a long run keeps what it found so far.
+        With a `seen_urls` store only URLs new since earlier runs are written.
+        """
         if time_ranges is None:
             time_ranges = ['24h', '1w']
-        all_results = []
         if not self.sites:
             print('Please provide sites.')
             return
-        for site in self.sites:
-            for time_range in time_ranges:
-                advanced_query = advanced_queries.get(site) if advanced_queries else None
-                results = await self.monitor_site(site, time_range, advanced_query=advanced_query)
-                for result in results:
-                    result.update({
-                        'site': site,
-                        'time_range': time_range,
-                        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    })
-                all_results.extend(results)
+        output_file = output_file or f'game_monitor_results_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+        combinations = list(self._combinations(time_ranges, advanced_queries))
+        self.logger.info(f"Monitoring {len(combinations)} site/time range/query combinations, {concurrency} at a time")
+
+        all_results = []
+        semaphore = asyncio.Semaphore(concurrency)
+        self._host_limiters = {}  # limiters belong to this run's event loop
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+        with open(output_file, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS, extrasaction='ignore')
+            writer.writeheader()
+
+            async def run(client, site, time_range, query):
+                def stream(results):
+                    if self.seen_urls is not None:
+                        results = [result for result in results if self.seen_urls.add(result['url'])]
+                    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                    for result in results:
+                        result.update({'site': site, 'time_range': time_range, 'query': query, 'timestamp': timestamp})
+                    writer.writerows(results)
+                    f.flush()
+                    all_results.extend(results)
+
+                async with semaphore:
+                    await self.monitor_site(site, time_range, advanced_query=query, client=client, on_results=stream)
+
+            async with httpx.AsyncClient(headers=self.headers, limits=limits, timeout=30) as client:
+                outcomes = await asyncio.gather(*(run(client, *combination) for combination in combinations),
+                                                return_exceptions=True)
+            for combination, outcome in zip(combinations, outcomes):
+                if isinstance(outcome, Exception):
+                    self.logger.error(f"Monitoring {combination} failed: {outcome}")
+        if self.seen_urls is not None:
+            self.seen_urls.save()
 
         if all_results:
-            df = pd.DataFrame(all_results)
-            output_file = f'game_monitor_results_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-            df.to_csv(output_file, index=False, encoding='utf-8-sig')
+            df = pd.DataFrame(all_results, columns=RESULT_COLUMNS)
             self.logger.info(f"Results saved to {output_file}")
             self.display_stats(df)
             return df
@@ -231,7 +287,7 @@ class DomainMonitor:
         print(df['time_range'].value_counts())
 
 def main():
-    monitor = DomainMonitor()
+    monitor = DomainMonitor(seen_urls=SeenUrls(MONITOR_SEEN_URLS_PATH))
     expression = os.getenv('expression', 'intitle:"sprunki"').strip()
     if not expression:
         return
@@ -1,22 +1,26 @@
 import requests
-from bs4 import BeautifulSoup
+import serp_parser
 import pandas as pd
 from datetime import datetime, timedelta
 import time
-import re
 import os
 import logging
 from urllib.parse import quote, urlparse, parse_qs
 import random
 import logging
+from seen_urls import SeenUrls
+
+MONITOR_SEEN_URLS_PATH = os.getenv('MONITOR_SEEN_URLS_PATH', './data/monitor_seen_urls.u64')
 
 
 class DomainMonitor:
-    def __init__(self, sites_file="game_sites.txt"):
+    def __init__(self, sites_file="game_sites.txt", seen_urls=None):
         """
         初始化监控器
         :param sites_file: 包含游戏网站列表的文本文件
+        :param seen_urls: optional SeenUrls store; when set only URLs not seen in earlier runs are returned
         """
+        self.seen_urls = seen_urls
         self.sites = self._load_sites()
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
@@ -122,55 +126,15 @@ class DomainMonitor:
         :param html_content: 页面HTML内容
         :return: 提取的URL和标题列表
         """
-        soup = BeautifulSoup(html_content, 'html.parser')
-        results = []
-        
-        # 查找搜索结果
-        for result in soup.select('div.g'):
-            try:
-                title_elem = result.select_one('h3')
-                url_elem = result.select_one('a')
-                
-                if title_elem and url_elem:
-                    title = title_elem.get_text()
-                    url = url_elem['href']
-                    
-                    # 提取可能的游戏名称
-                    game_name = self.extract_game_name(title)
-                    
-                    # if game_name:
-                    results.append({
-                            'title': title,
-                            'url': url,
-                            'game_name': game_name
-                        })
-            except Exception as e:
-                self.logger.error(f"Error extracting result: {str(e)}")
-                
-        return results
+        return serp_parser.extract_search_results(html_content)
 
     def extract_game_name(self, title):
         """
         从标题中提取可能的游戏名称
         :param title: 页面标题
-        :return: 提取的游戏名称或None
+        :return: 提取的游戏名称
         """
-        # 这里可以根据具体网站的标题特征来优化游戏名称提取规则
-        patterns = [
-            r'《(.+?)》',  # 中文书名号
-            r'"(.+?)"',    # 英文引号
-            r'【(.+?)】',  # 中文方括号
-            r'\[(.+?)\]'   # 英文方括号
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, title)
-            if match:
-                return match.group(1)
-        
-        # 如果没有特定标记，返回清理后的标题
-        cleaned_title = re.sub(r'(攻略|评测|资讯|下载|官网|专区|合集|手游|网游|页游|主机游戏|单机游戏)', '', title)
-        return cleaned_title.strip()
+        return serp_parser.extract_game_name(title)
 
     def monitor_site(self, site, time_range, max_pages=100,advanced_query=None):
         """
@@ -208,15 +172,10 @@ class DomainMonitor:
                 response.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
 
                 if page == 0:  # Extract total result count only on the first page
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    result_stats = soup.select_one('#result-stats')
-                    print('result_stats=',result_stats)
-                    if result_stats:
-                        match = re.search(r'About ([\d,]+) results', result_stats.text)
-                        if match:
-                            total_results = int(match.group(1).replace(',', ''))
-                            total_pages = min(max_pages, (total_results // 100) + 1)
-                            self.logger.info(f"Total results: {total_results}, Total pages: {total_pages}")
+                    total_results = serp_parser.extract_result_count(response.text)
+                    if total_results is not None:
+                        total_pages = min(max_pages, (total_results // 100) + 1)
+                        self.logger.info(f"Total results: {total_results}, Total pages: {total_pages}")
 
                 results = self.extract_search_results(response.text)
                 if not results:  # If no results are found for a page, assume there are no more pages
@@ -242,6 +201,18 @@ class DomainMonitor:
 
         return all_results
     
+    def drop_seen(self, results):
+        """
+        Keep only results whose URL is new to `self.seen_urls` and mark them
+        seen, so repeated runs report each page once.
+        """
+        if self.seen_urls is None:
+            return results
+        new_results = [result for result in results if self.seen_urls.add(result['url'])]
+        self.seen_urls.save()
+        self.logger.info(f"{len(new_results)} of {len(results)} results are new")
+        return new_results
+
     def monitor_all_sites(self, time_ranges=None, advanced_queries=None):
         """
         监控所有网站
@@ -268,6 +239,8 @@ class DomainMonitor:
                     })
                  all_results.extend(results)
         
+        all_results = self.drop_seen(all_results)
+
         # 转换为DataFrame并保存
         if all_results:
             df = pd.DataFrame(all_results)
@@ -282,7 +255,7 @@ class DomainMonitor:
 def main():
     """主函数"""
     # 创建监控器实例
-    monitor = DomainMonitor()
+    monitor = DomainMonitor(seen_urls=SeenUrls(MONITOR_SEEN_URLS_PATH))
     expression=os.getenv('expression','intitle:"sprunki"')
     if expression =='':
         return
@@ -298,7 +271,7 @@ def main():
     
     # 开始监控
     results_df = monitor.monitor_all_sites(advanced_queries=advanced_queries)
-    os.mkdirs('result',exist_ok=True)
+    os.makedirs('result',exist_ok=True)
     results_df.to_csv('result/report.csv')
     # 输出统计信息
     if not results_df.empty:
@@ -1,11 +1,10 @@
 import requests
 from getbrowser import setup_chrome
 
-from bs4 import BeautifulSoup
+import serp_parser
 import pandas as pd
 from datetime import datetime, timedelta
 import time
-import re
 import os
 import logging
 from urllib.parse import quote, urlparse, parse_qs
@@ -127,55 +126,15 @@ class DomainMonitor:
         :param html_content: 页面HTML内容
         :return: 提取的URL和标题列表
         """
-        soup = BeautifulSoup(html_content, 'html.parser')
-        results = []
-        
-        # 查找搜索结果
-        for result in soup.select('div.g'):
-            try:
-                title_elem = result.select_one('h3')
-                url_elem = result.select_one('a')
-                
-                if title_elem and url_elem:
-                    title = title_elem.get_text()
-                    url = url_elem['href']
-                    
-                    # 提取可能的游戏名称
-                    game_name = self.extract_game_name(title)
-                    
-                    # if game_name:
-                    results.append({
-                            'title': title,
-                            'url': url,
-                            'game_name': game_name
-                        })
-            except Exception as e:
-                self.logger.error(f"Error extracting result: {str(e)}")
-                
-        return results
+        return serp_parser.extract_search_results(html_content)
 
     def extract_game_name(self, title):
         """
         从标题中提取可能的游戏名称
         :param title: 页面标题
-        :return: 提取的游戏名称或None
+        :return: 提取的游戏名称
         """
-        # 这里可以根据具体网站的标题特征来优化游戏名称提取规则
-        patterns = [
-            r'《(.+?)》',  # 中文书名号
-            r'"(.+?)"',    # 英文引号
-            r'【(.+?)】',  # 中文方括号
-            r'\[(.+?)\]'   # 英文方括号
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, title)
-            if match:
-                return match.group(1)
-        
-        # 如果没有特定标记，返回清理后的标题
-        cleaned_title = re.sub(r'(攻略|评测|资讯|下载|官网|专区|合集|手游|网游|页游|主机游戏|单机游戏)', '', title)
-        return cleaned_title.strip()
+        return serp_parser.extract_game_name(title)
 
     def monitor_site(self, site, time_range, max_pages=100,advanced_query=None):
         """
@@ -214,15 +173,10 @@ class DomainMonitor:
                 tab.get(search_url)              
                 html=tab.html
                 if page == 0:  # Extract total result count only on the first page
-                    soup = BeautifulSoup(html, 'html.parser')
-                    result_stats = soup.select_one('#result-stats')
-                    print('result_stats=',result_stats)
-                    if result_stats:
-                        match = re.search(r'About ([\d,]+) results', result_stats.text)
-                        if match:
-                            total_results = int(match.group(1).replace(',', ''))
-                            total_pages = min(max_pages, (total_results // 100) + 1)
-                            self.logger.info(f"Total results: {total_results}, Total pages: {total_pages}")
+                    total_results = serp_parser.extract_result_count(html)
+                    if total_results is not None:
+                        total_pages = min(max_pages, (total_results // 100) + 1)
+                        self.logger.info(f"Total results: {total_results}, Total pages: {total_pages}")
 
                 results = self.extract_search_results(html)
                 if not results:  # If no results are found for a page, assume there are no more pages
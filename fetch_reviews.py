@@ -227,6 +227,13 @@ class App_Store_Scraper:
             json.dump(self.reviews, file, default=str)
         logger.info(f"Saved reviews to {file_name}")
 
+    def save_reviews_to_store(self, store=None):
+        from review_store import ReviewStore
+
+        store = store or ReviewStore()
+        count = store.write(self.reviews, platform='ios', country=self.country, appid=self.app_id, date_column='updated')
+        logger.info(f"Saved {count} reviews to review store {store.root}")
+
     def add_to_lens(self, owner_id, lens_id):
         for block in self.reviews:
             print("block: ", block)
@@ -245,5 +252,6 @@ if __name__ == "__main__":
     pprint(scraper_instance.reviews)
     pprint(scraper_instance.reviews_count)
     scraper_instance.save_reviews_to_json('dana_reviews.json')
+    scraper_instance.save_reviews_to_store()
 
     # notability, tayasui sketches
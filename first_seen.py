@@ -0,0 +1,156 @@
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import httpx
+from cdx_client import CdxError, fetch_cdx_page
+from log_utils import get_logger
+from seen_urls import normalize_url
+
+FIRST_SEEN_CACHE = os.getenv('FIRST_SEEN_CACHE', './data/first_seen.json')
+CONCURRENCY = int(os.getenv('FIRST_SEEN_CONCURRENCY', '8'))
+GROUP_LIMIT = 1000  # urlkeys read for one shared-parent query
+NEGATIVE_TTL_DAYS = 7  # urls with no capture are asked again after this
+CDX_FILTERS = ('!statuscode:404',)
+
+log = get_logger('first_seen')
+
+
+def _match_key(url):
+    """Normalized url without scheme, so http/https captures of a page match."""
+    return normalize_url(url).split('://', 1)[-1]
+
+
+def group_urls(urls):
+    """
+    Batch urls into CDX prefix queries as {prefix: [urls]}.
+
+    Urls under the same slug directory (apps.apple.com/us/app/calculator/id1
+    and .../calculator/id2) share one query on that directory; every other
+    url is queried on its own path, which also picks up ?l= and similar
+    variants. Bare /app/id123 links are never grouped on /app/.
+    """
+    groups = {}
+    for url in urls:
+        key = _match_key(url)
+        parent, _, leaf = key.rpartition('/')
+        if parent and not parent.endswith('/app') and leaf.startswith('id'):
+            groups.setdefault(parent + '/', []).append(url)
+        else:
+            groups.setdefault(key, []).append(url)
+    return {prefix if len(members) > 1 else _match_key(members[0]): members
+            for prefix, members in groups.items()}
+
+
+class FirstSeenCache:
+    """
+    Earliest Wayback capture per url, in a JSON file.
+
+    Entries are {'ts': 'YYYYMMDDhhmmss' or None, 'checked': 'YYYYMMDD'};
+    a url without captures is only asked again after NEGATIVE_TTL_DAYS.
+    """
+
+    def __init__(self, path=FIRST_SEEN_CACHE):
+        self.path = Path(path)
+        if self.path.exists():
+            with open(self.path, encoding='utf-8') as f:
+                self.entries = json.load(f)
+        else:
+            self.entries = {}
+
+    def lookup(self, url):
+        """(hit, timestamp)."""
+        entry = self.entries.get(_match_key(url))
+        if entry is None:
+            return False, None
+        if entry['ts'] is None:
+            stale = (datetime.now() - timedelta(days=NEGATIVE_TTL_DAYS)).strftime('%Y%m%d')
+            if entry['checked'] < stale:
+                return False, None
+        return True, entry['ts']
+
+    def store(self, url, timestamp):
+        self.entries[_match_key(url)] = {'ts': timestamp, 'checked': datetime.now().strftime('%Y%m%d')}
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+
+
+async def _query_group(client, prefix, members):
+    """
+    Earliest timestamp per member url from a collapse=urlkey prefix query,
+    paged with the resume key until every member is found or the captures
+    run out, so a member past the first page is not taken as never archived.
+    """
+    limit = GROUP_LIMIT if len(members) > 1 else 100
+    wanted = {_match_key(url) for url in members}
+    earliest = {}
+    resume_key = None
+    while True:
+        rows, resume_key = await fetch_cdx_page(client, prefix, None, None, ['timestamp', 'original'],
+                                                resume_key=resume_key, limit=limit, collapse='urlkey',
+                                                filters=CDX_FILTERS)
+        for timestamp, original in rows:
+            key = _match_key(original)
+            if key not in earliest or timestamp < earliest[key]:
+                earliest[key] = timestamp
+        if not resume_key or not rows or wanted <= earliest.keys():
+            break
+    return {url: earliest.get(_match_key(url)) for url in members}
+
+
+async def resolve_first_seen(urls, cache=None, concurrency=CONCURRENCY, client=None):
+    """
+    Earliest Wayback Machine capture timestamp ('YYYYMMDDhhmmss') for each
+    url, or None when it was never archived.
+
+    Cached urls are answered locally; the rest are grouped into prefix
+    queries (see group_urls) that run concurrently over one client. Returns
+    {url: timestamp}.
+
+        first_seen = await resolve_first_seen(new_app_urls)
+    """
+    if client is None:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(30, read=120)) as client:
+            return await resolve_first_seen(urls, cache, concurrency, client)
+
+    cache = cache if cache is not None else FirstSeenCache()
+    results = {}
+    missing = []
+    for url in dict.fromkeys(urls):
+        hit, timestamp = cache.lookup(url)
+        if hit:
+            results[url] = timestamp
+        else:
+            missing.append(url)
+    groups = group_urls(missing)
+    log.debug('first seen lookup', cached=len(results), missing=len(missing), queries=len(groups))
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(prefix, members):
+        async with semaphore:
+            return await _query_group(client, prefix, members)
+
+    outcomes = await asyncio.gather(*(run(prefix, members) for prefix, members in groups.items()),
+                                    return_exceptions=True)
+    for (prefix, members), outcome in zip(groups.items(), outcomes):
+        if isinstance(outcome, (CdxError, httpx.HTTPError)):
+            print(f"[ERROR] First seen lookup for {prefix} failed: {outcome}")
+            for url in members:
+                results[url] = None
+            continue
+        if isinstance(outcome, Exception):
+            raise outcome
+        for url, timestamp in outcome.items():
+            cache.store(url, timestamp)
+            results[url] = timestamp
+    cache.save()
+    return results
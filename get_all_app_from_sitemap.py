@@ -7,6 +7,7 @@ from datetime import datetime
 from dotenv import load_dotenv
 import hashlib
 import os
+from instrumentation import METRICS
 
 from save_app_profile import *
 
@@ -17,7 +18,9 @@ D1_DATABASE_ID = os.getenv('D1_APP_DATABASE_ID')
 CLOUDFLARE_ACCOUNT_ID = os.getenv('CLOUDFLARE_ACCOUNT_ID')
 CLOUDFLARE_API_TOKEN = os.getenv('CLOUDFLARE_API_TOKEN')
 
-CLOUDFLARE_BASE_URL = f"https://api.cloudflare.com/client/v4/accounts/{CLOUDFLARE_ACCOUNT_ID}/d1/database/{D1_DATABASE_ID}"
+CLOUDFLARE_API_BASE_URL = os.getenv('CLOUDFLARE_API_BASE_URL', 'https://api.cloudflare.com/client/v4')
+CLOUDFLARE_BASE_URL = f"{CLOUDFLARE_API_BASE_URL}/accounts/{CLOUDFLARE_ACCOUNT_ID}/d1/database/{D1_DATABASE_ID}"
+SITEMAP_INDEX_URL = os.getenv('SITEMAP_INDEX_URL', 'https://apps.apple.com/sitemaps_apps_index_app_1.xml')
 
 # Set up logging configuration
 logging.basicConfig(
@@ -76,26 +79,30 @@ def fetch_and_parse_gzip(url):
     """
     try:
         logging.debug(f"Fetching GZipped sitemap from URL: {url}")
-        response = requests.get(url)
+        with METRICS.stage('sitemap.request'):
+            response = requests.get(url)
+        METRICS.record_response('apps_sitemap', response.status_code)
         response.raise_for_status()
 
-        # Decompress the GZipped content
-        with gzip.GzipFile(fileobj=BytesIO(response.content)) as f:
-            file_content = f.read().decode('utf-8')
+        with METRICS.stage('sitemap.parse'):
+            # Decompress the GZipped content
+            with gzip.GzipFile(fileobj=BytesIO(response.content)) as f:
+                file_content = f.read().decode('utf-8')
 
-        # Parse XML content from the decompressed file
-        tree = ET.ElementTree(ET.fromstring(file_content))
-        root = tree.getroot()
+            # Parse XML content from the decompressed file
+            tree = ET.ElementTree(ET.fromstring(file_content))
+            root = tree.getroot()
 
-        # Extract all <loc> and <lastmod> tags using extract_links_from_xml
-        loc_tags = extract_links_from_xml(root, tag="loc")
-        lastmod_tags = extract_links_from_xml(root, tag="lastmod")
+            # Extract all <loc> and <lastmod> tags using extract_links_from_xml
+            loc_tags = extract_links_from_xml(root, tag="loc")
+            lastmod_tags = extract_links_from_xml(root, tag="lastmod")
 
         app_data_list = [
             {"url": loc, "lastmodify": lastmod}
             for loc, lastmod in zip(loc_tags, lastmod_tags)
         ]
 
+        METRICS.inc('items_total', len(app_data_list), stage='sitemap.urls')
         logging.debug(f"Extracted {len(app_data_list)} app data entries from GZipped sitemap.")
         return app_data_list
     except requests.RequestException as e:
@@ -109,7 +116,7 @@ def process_sitemaps_and_save_profiles():
     """
     Process the sitemaps and save app profiles.
     """
-    sitemap_url = "https://apps.apple.com/sitemaps_apps_index_app_1.xml"
+    sitemap_url = SITEMAP_INDEX_URL
 
     # Step 1: Fetch and parse the main sitemap
     loc_urls = fetch_and_parse_sitemap(sitemap_url)
@@ -125,4 +132,5 @@ def process_sitemaps_and_save_profiles():
         batch_process_in_chunks(app_data_list[:2], process_function=batch_process_initial_app_profiles)
 
 # Start the process
-process_sitemaps_and_save_profiles()
+if __name__ == "__main__":
+    process_sitemaps_and_save_profiles()
@@ -3,25 +3,27 @@ import os
 import hashlib
 import concurrent.futures
 from DataRecorder import Recorder
-from getbrowser import setup_chrome
+from getbrowser import get_browser
 from dotenv import load_dotenv
 from  save_app_profile import *
 from datetime import datetime
 import json
 import time
 import random
+from log_utils import get_logger
 
 load_dotenv()
 
+log = get_logger('get_app_detail')
+
 # Constants for D1 Database
 D1_DATABASE_ID = os.getenv('CLOUDFLARE_D1_DATABASE_ID')
 CLOUDFLARE_ACCOUNT_ID = os.getenv('CLOUDFLARE_ACCOUNT_ID')
 CLOUDFLARE_API_TOKEN = os.getenv('CLOUDFLARE_API_TOKEN')
 
-CLOUDFLARE_BASE_URL = f"https://api.cloudflare.com/client/v4/accounts/{CLOUDFLARE_ACCOUNT_ID}/d1/database/{D1_DATABASE_ID}"
+CLOUDFLARE_API_BASE_URL = os.getenv('CLOUDFLARE_API_BASE_URL', 'https://api.cloudflare.com/client/v4')
+CLOUDFLARE_BASE_URL = f"{CLOUDFLARE_API_BASE_URL}/accounts/{CLOUDFLARE_ACCOUNT_ID}/d1/database/{D1_DATABASE_ID}"
 
-# Initialize Browser
-browser = setup_chrome()
 def parse_version_string(version_string):
     """
     Parses a version string with potentially missing notes.
@@ -85,9 +87,9 @@ def getinfo(url):
         try:
             time.sleep(random.uniform(1, 2))
             
-            tab = browser.new_tab()
+            tab = get_browser().new_tab()
             tab.get(url)
-            print(f'get info for {url}')
+            log.debug('get app info', url=url)
             # Extract app details
             appid = url.split('/')[-1]
             appname = url.split('/')[-2]
@@ -109,10 +111,8 @@ def getinfo(url):
                 tab.ele('.we-modal__close').click()
             # Extract additional information
             e = tab.ele('.information-list__item l-column small-12 medium-6 large-4 small-valign-top information-list__item--seller')
-            print('find detail',e.texts())
             seller = e.text
             size = e.next().text
-            print('find size',e.next().text)
             
             category = e.next(2).text
             lang = e.next(4).text
@@ -124,7 +124,6 @@ def getinfo(url):
                 if e.next(8).ele('.we-truncate__button we-truncate__button--top-offset link'):
                     e.next(8).ele('.we-truncate__button we-truncate__button--top-offset link').click()
                 priceplan = e.next(8).texts()[-1]
-                print('find priceplan',priceplan)
                 priceplan_objects=parse_price_plan(priceplan)
                 priceplan=   json.dumps(priceplan_objects)  # Convert to JSON string
 
@@ -136,28 +135,24 @@ def getinfo(url):
             if tab.ele('.we-customer-ratings__count small-hide medium-show'):
 
                 reviewcount=tab.ele('.we-customer-ratings__count small-hide medium-show').text
-            print('find rating',rating)
             if isinstance(reviewcount, str):
             
                 reviewcount=reviewcount.replace('Ratings','')
                 reviewcount=reviewcount.lower()
-            print('find reviewcount',reviewcount)
             
             if reviewcount=='':
                 reviewcount=0
             reviewcount=int(reviewcount)
             if 'm' in reviewcount:
                 reviewcount=reviewcount.replace('m','').strip()
-                print('replace m with ',reviewcount)
                
                 reviewcount=float(reviewcount)*1000000
             if 'k' in reviewcount:
                 reviewcount=reviewcount.replace('k','').strip()
-                print('replace k with ',reviewcount)
                 reviewcount=float(reviewcount)*1000
                 
             reviewcount=int(reviewcount)                
-            print('clean  rating',rating,reviewcount)
+            log.debug('app info parsed', url=url, rating=rating, reviewcount=reviewcount)
             
             # version_json=''
             # priceplan=''
@@ -186,7 +181,7 @@ def getinfo(url):
                 'website':website
             }
         except Exception as e:
-            print(f"Error fetching info for {url}: {e}")
+            log.error('failed to fetch app info', url=url, error=e)
             return None
         finally:
            if tab:
@@ -197,13 +192,13 @@ def process_url(url):
     """
     try:
         if not check_if_url_exists(url):
-             print(f'this app is new,need to scrape info {url}')
+             log.debug('new app, scraping info', url=url)
              return getinfo(url)
         else:
-            print(f"URL {url} already exists, skipping")
+            log.debug('app already saved, skipping', url=url)
             return None
     except Exception as e:
-        print(f"Error processing URL {url}: {e}")
+        log.error('failed to process app url', url=url, error=e)
         return None
 def bulk_scrape_and_save_app_urls(urls, batch_size=10):
     """
@@ -76,6 +76,17 @@ def setup_chrome():
     return Chromium(co)
 
 
+_browser = None
+
+
+def get_browser():
+    """The process-wide browser, started on first use so importing a scraper starts nothing."""
+    global _browser
+    if _browser is None:
+        _browser = setup_chrome()
+    return _browser
+
+
 def main():
     print("System Information:")
     print(f"Operating System: {platform.system()}")
@@ -1,8 +1,21 @@
+import json
+import time
+from typing import Optional
+
 import google_play_scraper
 from google_play_scraper.constants.regex import Regex
 from google_play_scraper.constants.request import Formats
 from google_play_scraper.utils.request import post
 
+MAX_RETRIES = 5
+BASE_DELAY_SECS = 2
+
+
+class PlayDataError(Exception):
+    """Raised when Google Play keeps answering with error.PlayDataError."""
+    pass
+
+
 def _fetch_review_items(
     url: str,
     app_id: str,
@@ -10,26 +23,29 @@ def _fetch_review_items(
     count: int,
     filter_score_with: Optional[int],
     pagination_token: Optional[str],
+    max_retries: int = MAX_RETRIES,
 ):
-    dom = post(
-        url,
-        Formats.Reviews.build_body(
-            app_id,
-            sort,
-            count,
-            "null" if filter_score_with is None else filter_score_with,
-            pagination_token,
-        ),
-        {"content-type": "application/x-www-form-urlencoded"},
-    )
-
-    # MOD error handling
-    if "error.PlayDataError" in dom:
-        return _fetch_review_items(url, app_id, sort, count, filter_score_with, pagination_token)
+    # MOD error handling: retry PlayDataError a bounded number of times with
+    # backoff instead of recursing until the stack overflows
+    for attempt in range(max_retries):
+        dom = post(
+            url,
+            Formats.Reviews.build_body(
+                app_id,
+                sort,
+                count,
+                "null" if filter_score_with is None else filter_score_with,
+                pagination_token,
+            ),
+            {"content-type": "application/x-www-form-urlencoded"},
+        )
+        if "error.PlayDataError" not in dom:
+            break
+        time.sleep(BASE_DELAY_SECS * (2 ** attempt))
+    else:
+        raise PlayDataError(f"PlayDataError for {app_id} after {max_retries} attempts")
     # ENDMOD
 
     match = json.loads(Regex.REVIEWS.findall(dom)[0])
 
     return json.loads(match[0][2])[0], json.loads(match[0][2])[-1][-1]
-
-
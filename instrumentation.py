@@ -0,0 +1,222 @@
+import asyncio
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+# Written at exit when set: Prometheus text for *.prom, JSON otherwise
+METRICS_PATH = os.getenv('METRICS_PATH')
+METRIC_PREFIX = 'appreview'
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _label_text(key):
+    if not key:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in key)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(key, escaped)) + '}'
+
+
+class _Stage:
+    """Context manager timing one pass through a stage."""
+
+    __slots__ = ('metrics', 'name', 'labels', 'started')
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe('stage_seconds', time.perf_counter() - self.started, stage=self.name, **self.labels)
+        return False
+
+
+class Metrics:
+    """
+    In-process counters, gauges and stage timers for one run.
+
+    Counters only go up (requests, retries, 429s, rows), gauges hold the
+    last and the highest value seen (queue depths) and timers keep count,
+    total and maximum seconds per stage. Every update is a dict operation
+    under a lock, cheap enough for per-request and per-row call sites.
+
+        with METRICS.stage('amp_reviews.request'):
+            response = await client.get(url)
+        METRICS.record_response('amp_reviews', response.status_code)
+        ...
+        METRICS.export('result/metrics.prom')
+    """
+
+    def __init__(self, prefix=METRIC_PREFIX):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.gauges = {}
+            self.timers = {}
+            self.started = time.time()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def gauge(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            current = self.gauges.get(key)
+            self.gauges[key] = (value, value if current is None else max(current[1], value))
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            timer = self.timers.get(key)
+            if timer is None:
+                self.timers[key] = [1, seconds, seconds]
+            else:
+                timer[0] += 1
+                timer[1] += seconds
+                if seconds > timer[2]:
+                    timer[2] = seconds
+
+    def stage(self, name, **labels):
+        """`with metrics.stage(name):` adds the block's wall time to stage_seconds{stage=name}."""
+        return _Stage(self, name, labels)
+
+    def timed(self, name, **labels):
+        """Decorator form of `stage` for plain and async functions."""
+        def decorator(func):
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.stage(name, **labels):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(name, **labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record_response(self, service, status):
+        """Count one HTTP attempt against `service` by status code (or 'error' for network failures)."""
+        self.inc('http_requests_total', service=service, status=status)
+        if status == 429:
+            self.inc('http_throttled_total', service=service)
+
+    def record_retry(self, service):
+        self.inc('http_retries_total', service=service)
+
+    def snapshot(self):
+        """All metrics as plain data (the JSON export)."""
+        with self._lock:
+            counters = [{'name': name, 'labels': dict(key), 'value': value}
+                        for (name, key), value in sorted(self.counters.items())]
+            gauges = [{'name': name, 'labels': dict(key), 'value': value, 'max': peak}
+                      for (name, key), (value, peak) in sorted(self.gauges.items())]
+            timers = [{'name': name, 'labels': dict(key), 'count': count, 'sum': round(total, 6),
+                       'max': round(peak, 6)}
+                      for (name, key), (count, total, peak) in sorted(self.timers.items())]
+        return {'started_at': self.started, 'elapsed': round(time.time() - self.started, 3),
+                'counters': counters, 'gauges': gauges, 'timers': timers}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self):
+        """Prometheus text exposition format: counters, gauges (plus *_max) and timers as summaries."""
+        snapshot = self.snapshot()
+        lines = []
+        typed = set()
+
+        def sample(name, kind, labels, value):
+            metric = f'{self.prefix}_{name}'
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f'# TYPE {metric} {kind}')
+            lines.append(f'{metric}{_label_text(_label_key(labels))} {value}')
+
+        for counter in snapshot['counters']:
+            sample(counter['name'], 'counter', counter['labels'], counter['value'])
+        for gauge in snapshot['gauges']:
+            sample(gauge['name'], 'gauge', gauge['labels'], gauge['value'])
+        for gauge in snapshot['gauges']:
+            sample(gauge['name'] + '_max', 'gauge', gauge['labels'], gauge['max'])
+        for timer in snapshot['timers']:
+            metric = f"{self.prefix}_{timer['name']}"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f'# TYPE {metric} summary')
+            labels = _label_text(_label_key(timer['labels']))
+            lines.append(f'{metric}_sum{labels} {timer["sum"]}')
+            lines.append(f'{metric}_count{labels} {timer["count"]}')
+        for timer in snapshot['timers']:
+            sample(timer['name'] + '_max', 'gauge', timer['labels'], timer['max'])
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path):
+        """Write the metrics to `path`: Prometheus text for .prom/.txt, JSON otherwise."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        text = self.to_prometheus() if path.suffix in ('.prom', '.txt') else self.to_json()
+        path.write_text(text, encoding='utf-8')
+        print(f"[INFO] Metrics written to {path}")
+        return path
+
+    def print_summary(self):
+        """One line per stage: calls, total and mean seconds, slowest first."""
+        timers = [t for t in self.snapshot()['timers'] if t['name'] == 'stage_seconds']
+        for timer in sorted(timers, key=lambda t: t['sum'], reverse=True):
+            labels = dict(timer['labels'])
+            name = labels.pop('stage')
+            extra = ' '.join(f'{k}={v}' for k, v in labels.items())
+            print(f"[METRICS] {name}{' ' + extra if extra else ''}: {timer['count']} calls, "
+                  f"{timer['sum']:.2f}s total, {timer['sum'] / timer['count'] * 1000:.1f}ms mean, "
+                  f"{timer['max'] * 1000:.1f}ms max")
+
+
+METRICS = Metrics()
+
+inc = METRICS.inc
+gauge = METRICS.gauge
+observe = METRICS.observe
+stage = METRICS.stage
+timed = METRICS.timed
+record_response = METRICS.record_response
+record_retry = METRICS.record_retry
+
+
+def export_metrics(path=None):
+    """Export the process metrics to `path` or METRICS_PATH; does nothing when neither is set."""
+    path = path or METRICS_PATH
+    if not path:
+        return None
+    METRICS.print_summary()
+    return METRICS.export(path)
+
+
+def _export_at_exit():
+    try:
+        export_metrics()
+    except Exception as e:
+        print(f"[ERROR] Failed to export metrics: {e}")
+
+
+if METRICS_PATH:
+    atexit.register(_export_at_exit)
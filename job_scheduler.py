@@ -0,0 +1,167 @@
+import asyncio
+import itertools
+import os
+import time
+
+from instrumentation import METRICS
+
+WORKERS = int(os.getenv('REVIEW_WORKERS', '32'))
+TASK_TIMEOUT = float(os.getenv('REVIEW_TASK_TIMEOUT', '1800'))  # seconds, 0 disables
+PROGRESS_INTERVAL = 30  # seconds between progress lines
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+TIMED_OUT = 'timed_out'
+CANCELLED = 'cancelled'
+
+
+class Job:
+    """One unit of work: a coroutine function and its arguments."""
+
+    def __init__(self, func, args, kwargs, priority, timeout, name):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.timeout = timeout
+        self.name = name
+        self.state = PENDING
+        self.result = None
+        self.error = None
+        self.elapsed = None
+        self._task = None
+        self._cancel_requested = False
+
+    def __repr__(self):
+        return f"Job({self.name!r}, priority={self.priority}, state={self.state})"
+
+    def cancel(self):
+        """Cancel the job whether it is still queued or already running."""
+        if self.state == PENDING:
+            self.state = CANCELLED
+        elif self.state == RUNNING and self._task is not None:
+            self._cancel_requested = True
+            self._task.cancel()
+
+
+class JobScheduler:
+    """
+    Priority work queue drained by a fixed pool of long-lived workers.
+
+    Jobs with the lowest `priority` value run first, ties in submission
+    order. A worker picks up the next job as soon as its current one
+    finishes, so one slow app never holds the other slots idle. Each job
+    runs under its own timeout; failures and timeouts are recorded on the
+    job and do not stop the run.
+    """
+
+    def __init__(self, workers=WORKERS, timeout=TASK_TIMEOUT, progress_interval=PROGRESS_INTERVAL, name='jobs'):
+        self.workers = max(1, workers)
+        self.timeout = timeout or None
+        self.progress_interval = progress_interval
+        self.name = name
+        self.jobs = []
+        self._queue = asyncio.PriorityQueue()
+        self._counter = itertools.count()
+        self._started = None
+
+    def submit(self, func, *args, priority=0, timeout=None, name=None, **kwargs):
+        """
+        Queue `func(*args, **kwargs)`. The coroutine is only created when a
+        worker picks the job up. Returns the Job.
+        """
+        job = Job(func, args, kwargs, priority, timeout or self.timeout, name or getattr(func, '__name__', 'job'))
+        self.jobs.append(job)
+        self._queue.put_nowait((priority, next(self._counter), job))
+        METRICS.gauge('queue_depth', self._queue.qsize(), queue=self.name)
+        return job
+
+    def cancel_all(self):
+        for job in self.jobs:
+            job.cancel()
+
+    def metrics(self):
+        counts = {state: 0 for state in (PENDING, RUNNING, DONE, FAILED, TIMED_OUT, CANCELLED)}
+        for job in self.jobs:
+            counts[job.state] += 1
+        elapsed = time.monotonic() - self._started if self._started else 0.0
+        finished = counts[DONE] + counts[FAILED] + counts[TIMED_OUT]
+        counts['total'] = len(self.jobs)
+        counts['elapsed'] = round(elapsed, 1)
+        counts['jobs_per_min'] = round(finished / elapsed * 60, 2) if elapsed else 0.0
+        return counts
+
+    def _print_progress(self):
+        m = self.metrics()
+        print(f"[PROGRESS] {self.name}: {m[DONE]} done, {m[FAILED]} failed, {m[TIMED_OUT]} timed out, "
+              f"{m[RUNNING]} running, {m[PENDING]} queued of {m['total']} in {m['elapsed']}s "
+              f"({m['jobs_per_min']} jobs/min)")
+
+    async def _run_job(self, job):
+        job.state = RUNNING
+        started = time.monotonic()
+        job._task = asyncio.ensure_future(job.func(*job.args, **job.kwargs))
+        try:
+            job.result = await asyncio.wait_for(job._task, job.timeout)
+            job.state = DONE
+        except asyncio.TimeoutError:
+            job.state = TIMED_OUT
+            print(f"[ERROR] {self.name}: {job.name} timed out after {job.timeout}s")
+        except asyncio.CancelledError:
+            if not job._cancel_requested:
+                raise
+            job.state = CANCELLED
+        except Exception as e:
+            job.state = FAILED
+            job.error = e
+            print(f"[ERROR] {self.name}: {job.name} failed: {e}")
+        finally:
+            job.elapsed = time.monotonic() - started
+            METRICS.observe('job_seconds', job.elapsed, queue=self.name, state=job.state)
+
+    async def _worker(self):
+        while True:
+            _, _, job = await self._queue.get()
+            METRICS.gauge('queue_depth', self._queue.qsize(), queue=self.name)
+            try:
+                if job.state == PENDING:
+                    await self._run_job(job)
+            finally:
+                self._queue.task_done()
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            self._print_progress()
+
+    async def run(self):
+        """Run until every queued job has finished. Returns the jobs in submission order."""
+        self._started = time.monotonic()
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        reporter = asyncio.create_task(self._report()) if self.progress_interval else None
+        try:
+            await self._queue.join()
+        except asyncio.CancelledError:
+            self.cancel_all()
+            raise
+        finally:
+            for task in workers + ([reporter] if reporter else []):
+                task.cancel()
+            await asyncio.gather(*workers, *([reporter] if reporter else []), return_exceptions=True)
+        self._print_progress()
+        return self.jobs
+
+
+async def run_jobs(func, items, workers=WORKERS, timeout=TASK_TIMEOUT, priority=None, name='jobs', **kwargs):
+    """
+    Run `func(item, **kwargs)` for every item through a JobScheduler.
+
+    `priority` is an optional function of the item (lower runs first).
+    Returns the finished jobs in item order.
+    """
+    scheduler = JobScheduler(workers=workers, timeout=timeout, name=name)
+    for item in items:
+        scheduler.submit(func, item, priority=priority(item) if priority else 0, name=str(item), **kwargs)
+    return await scheduler.run()
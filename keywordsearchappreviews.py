@@ -8,18 +8,25 @@ from datetime import datetime
 from aiohttp_socks import ProxyType, ProxyConnector, ChainProxyConnector
 from DataRecorder import Recorder
 from getbrowser import setup_chrome
-from app_store_scraper import AppStore
 import requests
 import pandas as pd
-from apicall import get_token,fetch_reviews
 from get_app_detail import *
 from saveReviewtoD1 import *
+from text_normalizer import normalize_text
+from review_store import ReviewStore
+from job_scheduler import JobScheduler
+from amp_reviews import MAX_APP_REVIEWS, AppStoreReviewClient, fetch_app_reviews
+from review_sink import ReviewSink
+from log_utils import get_logger
+
+log = get_logger('keywordsearchappreviews')
 
 # Environment Variables
 D1_DATABASE_ID = os.getenv('D1_APP_DATABASE_ID')
 CLOUDFLARE_ACCOUNT_ID = os.getenv('CLOUDFLARE_ACCOUNT_ID')
 CLOUDFLARE_API_TOKEN = os.getenv('CLOUDFLARE_API_TOKEN')
-CLOUDFLARE_BASE_URL = f"https://api.cloudflare.com/client/v4/accounts/{CLOUDFLARE_ACCOUNT_ID}/d1/database/{D1_DATABASE_ID}"
+CLOUDFLARE_API_BASE_URL = os.getenv('CLOUDFLARE_API_BASE_URL', 'https://api.cloudflare.com/client/v4')
+CLOUDFLARE_BASE_URL = f"{CLOUDFLARE_API_BASE_URL}/accounts/{CLOUDFLARE_ACCOUNT_ID}/d1/database/{D1_DATABASE_ID}"
 
 # Constants
 PROXY_URL = None
@@ -172,7 +179,7 @@ def getids_from_keyword(keyword, country):
         return []
 
 
-async def get_review(url, outfile, keyword):
+async def get_review(url, outfile, keyword, client=None, sink=None):
     """
     Asynchronously fetch reviews for the given app and save them.
     """
@@ -182,42 +189,9 @@ async def get_review(url, outfile, keyword):
         appname, country = url.split('/')[-2], url.split('/')[-4]
         app_id=url.split('/')[-1]
         
-        print('processing',appname,country,url)
-        all_reviews = []
-        how_many=None
-        app = AppStore(country=country, app_name=appname)
-        if how_many:
-            await asyncio.to_thread(app.review,
-                                how_many=how_many, 
-                                sleep=random.randint(1, 2))
-            # after a datetime object to filter older reviews
-        else:
-             await asyncio.to_thread(app.review,
-                                sleep=random.randint(1, 2))
-
-
-        all_reviews=app.reviews
-        print('manual get review')
-        if len(all_reviews)==0 or all_reviews is None:
-            user_agents = [
-    'Mozilla/5.0 (Macintosh; Intel Mac OS X 13_4) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.4 Safari/605.1.15',
-    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/113.0.0.0 Safari/537.36',
-    ]
-
-            token = get_token(country, app_name, app_id, user_agents)
-            
-            offset = '1'
-            MAX_REVIEWS = 100000+21
-            while (offset != None) and (int(offset) <= MAX_REVIEWS):
-                reviews, offset, response_code = fetch_reviews(country=country, 
-                                                       app_name=appname, 
-                                                       user_agents=user_agents, 
-                                                       app_id=app_id, 
-                                                       token=token, 
-                                                       offset=offset)
-                all_reviews.extend(reviews)
-
-        print('get aall review')
+        log.debug('processing app', app=appname, country=country, url=url)
+        all_reviews = await fetch_app_reviews(app_id, country, how_many=MAX_APP_REVIEWS, client=client)
+        log.debug('fetched reviews', app=appname, country=country, reviews=len(all_reviews))
 
         for review in all_reviews:
             reviewdate = review['date'].strftime('%Y-%m-%d-%H-%M-%S')
@@ -230,18 +204,26 @@ async def get_review(url, outfile, keyword):
                 "score": review['rating'],
                 "userName": review['userName'].strip(),
                 "date": reviewdate,
-                "review": review['review'].replace('\r', ' ').replace('\n', ' ').strip()
+                "review": normalize_text(review['review'])
             }
             items.append(item)
             outfile.add_data(item)
     except Exception as e:
-        print(f"Error fetching reviews for URL '{url}': {e}")
+        log.error('failed to fetch reviews', url=url, error=e)
             
     try:
-        insert_into_ios_review_data(items)
-        print('save aall review')
+        await asyncio.to_thread(ReviewStore().write, items, platform='ios')
+    except Exception as e:
+        log.error('failed to store reviews locally', url=url, error=e)
+
+    try:
+        if sink is not None:
+            await sink.put(items)
+        else:
+            insert_into_ios_review_data(items)
+        log.sampled('reviews saved', every=20, app=appname, country=country, reviews=len(items))
     except Exception as e:
-        print(f"Error save reviews for URL '{url}': {e}")
+        log.error('failed to save reviews', url=url, error=e)
         
 
 
@@ -268,10 +250,11 @@ async def main():
         outfile_reviews_path = f'{RESULT_FOLDER}/{keyword}-app-reviews-{current_time}.csv'
         outfile_reviews = Recorder(outfile_reviews_path)
         if downloadreview:
-            tasks = [get_review(url, outfile_reviews, keyword) for url in ids]
-            batch_size = 1
-            for i in range(0, len(tasks), batch_size):
-                await asyncio.gather(*tasks[i:i + batch_size])
+            scheduler = JobScheduler(name='keyword reviews')
+            async with AppStoreReviewClient() as client, ReviewSink() as sink:
+                for rank, url in enumerate(ids):
+                    scheduler.submit(get_review, url, outfile_reviews, keyword, client=client, sink=sink, priority=rank, name=url)
+                await scheduler.run()
 
         outfile_reviews.record()
     except Exception as e:
@@ -0,0 +1,164 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+# 'text' ([INFO] name: message key=value) or 'json' (one object per line)
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()
+LOG_FILE = os.getenv('LOG_FILE')
+LOGGER_NAMESPACE = 'appreview'
+
+_setup_lock = threading.Lock()
+_listener = None
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        fields = getattr(record, 'fields', None)
+        text = f"[{record.levelname}] {record.name.split('.', 1)[-1]}: {record.getMessage()}"
+        if fields:
+            text += ' ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        if record.exc_info:
+            text += '\n' + self.formatException(record.exc_info)
+        return text
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name.split('.', 1)[-1],
+            'msg': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(level=LOG_LEVEL, fmt=LOG_FORMAT, path=LOG_FILE):
+    """
+    Route every get_logger() logger through a QueueHandler: callers only
+    enqueue the record and a QueueListener thread formats and writes it to
+    stdout (and `path` when given). Runs once per process; later calls
+    only change the level.
+    """
+    global _listener
+    root = logging.getLogger(LOGGER_NAMESPACE)
+    root.setLevel(level)
+    with _setup_lock:
+        if _listener is not None:
+            return root
+        formatter = JsonFormatter() if fmt == 'json' else TextFormatter()
+        handlers = [logging.StreamHandler(sys.stdout)]
+        if path:
+            handlers.append(logging.FileHandler(path, encoding='utf-8'))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+        records = queue.SimpleQueue()
+        root.addHandler(logging.handlers.QueueHandler(records))
+        # The namespace has its own handler; basicConfig() in older modules stays separate
+        root.propagate = False
+        _listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=False)
+        _listener.start()
+        atexit.register(shutdown_logging)
+    return root
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+class StructuredLogger:
+    """
+    Level-gated logger with key=value fields and two ways to keep hot
+    loops quiet:
+
+        log = get_logger('huntReviewDaily')
+        log.info('reviews saved', app=app_id, count=len(items))
+        log.sampled('wayback url', every=1000, url=orig_url)     # 1 in 1000 calls
+        log.throttled('cdx progress', interval=30, lines=count)  # at most every 30s
+
+    Nothing is formatted unless the level is enabled, so disabled debug
+    calls in a loop cost one comparison.
+    """
+
+    def __init__(self, name):
+        self._logger = logging.getLogger(f'{LOGGER_NAMESPACE}.{name}')
+        self._counts = {}
+        self._last = {}
+        self._suppressed = {}
+        self._lock = threading.Lock()
+
+    def isEnabledFor(self, level):
+        return self._logger.isEnabledFor(level)
+
+    def log(self, level, msg, *args, exc_info=None, **fields):
+        if self._logger.isEnabledFor(level):
+            self._logger.log(level, msg, *args, exc_info=exc_info, extra={'fields': fields})
+
+    def debug(self, msg, *args, **fields):
+        self.log(logging.DEBUG, msg, *args, **fields)
+
+    def info(self, msg, *args, **fields):
+        self.log(logging.INFO, msg, *args, **fields)
+
+    def warning(self, msg, *args, **fields):
+        self.log(logging.WARNING, msg, *args, **fields)
+
+    def error(self, msg, *args, **fields):
+        self.log(logging.ERROR, msg, *args, **fields)
+
+    def exception(self, msg, *args, **fields):
+        self.log(logging.ERROR, msg, *args, exc_info=True, **fields)
+
+    def sampled(self, msg, *args, every=100, level=logging.INFO, key=None, **fields):
+        """Log the 1st, (every+1)th, ... call for `key` (default: the message), with the running count."""
+        if not self._logger.isEnabledFor(level):
+            return
+        key = key or msg
+        with self._lock:
+            count = self._counts.get(key, 0) + 1
+            self._counts[key] = count
+        if (count - 1) % every == 0:
+            self.log(level, msg, *args, seen=count, **fields)
+
+    def throttled(self, msg, *args, interval=10.0, level=logging.INFO, key=None, **fields):
+        """Log at most once per `interval` seconds for `key`, reporting how many calls were skipped."""
+        if not self._logger.isEnabledFor(level):
+            return
+        key = key or msg
+        now = time.monotonic()
+        with self._lock:
+            last = self._last.get(key)
+            if last is not None and now - last < interval:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return
+            self._last[key] = now
+            suppressed = self._suppressed.pop(key, 0)
+        if suppressed:
+            fields['suppressed'] = suppressed
+        self.log(level, msg, *args, **fields)
+
+
+def get_logger(name):
+    """
+    Structured logger for a module, named after its file without .py, e.g.
+    get_logger('review_sink'). Scripts run as __main__, so __name__ is not used.
+    """
+    if _listener is None:
+        setup_logging()
+    return StructuredLogger(name)
@@ -0,0 +1,116 @@
+import os
+import sys
+import subprocess
+import threading
+
+# Seconds a bare `import <module>` is allowed to take. Library modules that only
+# need text helpers must stay well under this; heavy models load on first use.
+IMPORT_TIME_BUDGET = float(os.getenv('IMPORT_TIME_BUDGET', '1.0'))
+
+# Warm objects (tokenizers, models, pipelines, nltk resources) keyed by a tuple
+# such as ('sentiment', model_name). Lives for the whole process.
+_models = {}
+_lock = threading.Lock()
+
+
+def is_model_cached(model_name):
+    """
+    Check whether a Hugging Face model is already present in the local cache,
+    without touching the network.
+    """
+    try:
+        from huggingface_hub import try_to_load_from_cache
+    except ImportError:
+        return False
+    path = try_to_load_from_cache(model_name, 'config.json')
+    return isinstance(path, str)
+
+
+def load_pretrained(loader, model_name, **kwargs):
+    """
+    Call `loader.from_pretrained`, staying offline when the model is cached.
+
+    Only a cold cache triggers a download, so repeated runs on the same runner
+    never pay the hub round trips.
+    """
+    if is_model_cached(model_name):
+        return loader.from_pretrained(model_name, local_files_only=True, **kwargs)
+    print(f"Model {model_name} not in local cache, downloading")
+    return loader.from_pretrained(model_name, **kwargs)
+
+
+def get_model(key, factory):
+    """
+    Return the warm object registered under `key`, building it with `factory()`
+    the first time it is requested.
+    """
+    model = _models.get(key)
+    if model is None:
+        with _lock:
+            model = _models.get(key)
+            if model is None:
+                model = factory()
+                _models[key] = model
+    return model
+
+
+def clear_models():
+    """Drop every warm object, e.g. to release GPU memory between jobs."""
+    with _lock:
+        _models.clear()
+
+
+def ensure_nltk_resource(resource, path):
+    """
+    Make sure an nltk resource is available, downloading it only if the local
+    nltk data directories do not already contain it.
+    """
+    import nltk
+
+    try:
+        nltk.data.find(path)
+    except LookupError:
+        nltk.download(resource, quiet=True)
+    return True
+
+
+def measure_import_time(module_name):
+    """
+    Measure the wall time of `import module_name` in a fresh interpreter, so
+    already-imported modules in this process do not hide the real cost.
+    """
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"import {module_name}; "
+        "print(time.perf_counter() - start)"
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise ImportError(f"Importing {module_name} failed:\n{result.stderr}")
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def check_import_budget(module_names, budget=IMPORT_TIME_BUDGET):
+    """
+    Measure each module's import time and report which ones exceed `budget`.
+
+    Returns a dict of module name -> seconds for the modules over budget.
+    """
+    over_budget = {}
+    for module_name in module_names:
+        seconds = measure_import_time(module_name)
+        status = 'ok' if seconds <= budget else 'OVER BUDGET'
+        print(f"import {module_name}: {seconds:.3f}s (budget {budget:.3f}s) {status}")
+        if seconds > budget:
+            over_budget[module_name] = seconds
+    return over_budget
+
+
+if __name__ == "__main__":
+    modules = sys.argv[1:] or ['sentiment', 'ReviewAnalyzer']
+    sys.exit(1 if check_import_budget(modules) else 0)
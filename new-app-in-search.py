@@ -9,20 +9,25 @@ import re
 import aiohttp
 import json
 import os
-from collect_data_wayback import collect_data_wayback,exact_url_timestamp
-from waybackpy import WaybackMachineCDXServerAPI
-import cdx_toolkit
+from collect_data_wayback import exact_url_timestamp
 from domainMonitor import DomainMonitor
 from get_app_detail import bulk_scrape_and_save_app_urls 
+from seen_urls import SeenUrls, SEEN_URLS_PATH
+from first_seen import resolve_first_seen
+from d1_client import AsyncD1Client, D1Error
+from log_utils import get_logger
 # Load environment variables
 load_dotenv()
 
+log = get_logger('new-app-in-search')
+
 D1_DATABASE_ID = os.getenv('CLOUDFLARE_D1_DATABASE_ID')
 CLOUDFLARE_ACCOUNT_ID = os.getenv('CLOUDFLARE_ACCOUNT_ID')
 CLOUDFLARE_API_TOKEN = os.getenv('CLOUDFLARE_API_TOKEN')
 
 # Constants
-CLOUDFLARE_BASE_URL = f"https://api.cloudflare.com/client/v4/accounts/{CLOUDFLARE_ACCOUNT_ID}/d1/database/{D1_DATABASE_ID}"
+CLOUDFLARE_API_BASE_URL = os.getenv('CLOUDFLARE_API_BASE_URL', 'https://api.cloudflare.com/client/v4')
+CLOUDFLARE_BASE_URL = f"{CLOUDFLARE_API_BASE_URL}/accounts/{CLOUDFLARE_ACCOUNT_ID}/d1/database/{D1_DATABASE_ID}"
 HEADERS = {
     "Authorization": f"Bearer {CLOUDFLARE_API_TOKEN}",
     "Content-Type": "application/json",
@@ -99,29 +104,34 @@ async def create_table_if_not_exists(session):
 
 
 async def get_existing_app_data():
+    """All ios_new_apps rows ([] for an empty table), or None when the query failed."""
     payload = {
         "sql": "SELECT * FROM ios_new_apps;"    }
     url = f"{CLOUDFLARE_BASE_URL}/query"
 
-    async with aiohttp.ClientSession() as session:
-        async with session.post(url, headers=HEADERS, json=payload) as response:
-            if response.status != 200:
-                print(f"Error: Received HTTP {response.status}")
-                return []
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.post(url, headers=HEADERS, json=payload) as response:
+                if response.status != 200:
+                    print(f"Error: Received HTTP {response.status}")
+                    return None
+                response_data = await response.json()
+    except aiohttp.ClientError as e:
+        print(f"[ERROR] Failed to read ios_new_apps: {e}")
+        return None
 
-            response_data = await response.json()
-            # print('quety===',response_data)
-            if not response_data.get('success'):
-                print(f"API Error: {response_data.get('errors')}")
-                return []
+    # print('quety===',response_data)
+    if not response_data.get('success'):
+        print(f"API Error: {response_data.get('errors')}")
+        return None
 
-            result = response_data.get('result')[0].get('results')
-            if not result:
-                print("No result found.")
-                return []
+    result = response_data.get('result')[0].get('results')
+    if not result:
+        print("No result found.")
+        return []
 
-            # Return all rows of data
-            return result
+    # Return all rows of data
+    return result
 
 
 # Helper: Check if there is any data in the table
@@ -147,167 +157,60 @@ async def is_table_populated(session):
         return False
 
 
-# Helper: Insert or update app data with retry and exception handling
-async def get_app_date(session, item, max_retries=3, retry_delay=5):
-    current_time = datetime.utcnow().isoformat()
-    url=item.get('url')
-    print('Try to find first index date of', url)
-    user_agent = "check huggingface app's user agent"
-    wayback_createAt = None
-    cc_createAt = None    
-
-    # try:
-        # cdx_api = WaybackMachineCDXServerAPI(url, user_agent)
-        # oldest = cdx_api.oldest()
-        # if oldest.datetime_timestamp:
-            # wayback_createAt = oldest.datetime_timestamp.isoformat()
-        # print('==WaybackMachineCDXServerAPI=', wayback_createAt)
-    # except Exception as e:
-        # print('WaybackMachineCDXServerAPI failed:', e)
-
-    current_date = datetime.now()
-    start_date = current_date - timedelta(days=365)
-    start_date = int(start_date.strftime('%Y%m%d'))
-    current_date = int(current_date.strftime('%Y%m%d'))
-    wayback_createAt=exact_url_timestamp(url)
-    # for t in ['cc','ia']:
-        # if ccisopen==False and t=='cc':
-            # continue
-        # try:
-            # cdx = cdx_toolkit.CDXFetcher(source=t)
-            # for obj in cdx.iter(url, from_ts=start_date, to=current_date,limit=1, cc_sort='ascending'):
-                # if t=='cc':
-                
-                    # cc_createAt = obj.get('timestamp')
-                # if t=='ia':
-                    # wayback_createAt = obj.get('timestamp')
-                
-        # except Exception as e:
-            # print('t failed:', e)
-    item['wayback_createAt']=wayback_createAt
-    item['cc_createAt']=cc_createAt
-async def upsert_app_data(session, item, max_retries=3, retry_delay=5):
-    current_time = datetime.utcnow().isoformat()
-
-    url=item.get('url')
-    google_indexAt=item.get('google_indexAt',None)
-    wayback_createAt=item.get('wayback_createAt',None)
-    cc_createAt=item.get('cc_createAt',None)
-    sitemap_createAt=item.get('sitemap_createAt',None)
-
-    sql = f"""
-    INSERT INTO ios_new_apps (url, google_indexAt, wayback_createAt, cc_createAt, sitemap_createAt, updateAt)
-    VALUES ('{url}',
-            {f"'{google_indexAt}'" if google_indexAt else 'NULL'},
-            {f"'{wayback_createAt}'" if wayback_createAt else 'NULL'},
-            {f"'{cc_createAt}'" if cc_createAt else 'NULL'},
-            {f"'{sitemap_createAt}'" if sitemap_createAt else 'NULL'},
-            '{current_time}')
-    ON CONFLICT (url) DO UPDATE
-    SET
-        -- update the updateAt time to current
-        updateAt = '{current_time}',
-        -- If a new google_indexAt is available use that else keep existing value
-        google_indexAt = COALESCE(ios_new_apps.google_indexAt, EXCLUDED.google_indexAt),
-        -- If a new wayback_createAt is available use that else keep existing value
-        wayback_createAt = COALESCE(ios_new_apps.wayback_createAt, EXCLUDED.wayback_createAt),
-        -- If a new cc_createAt is available use that else keep existing value
-        cc_createAt = COALESCE(ios_new_apps.cc_createAt, EXCLUDED.cc_createAt),
-        -- If a new sitemap_createAt is available use that else keep existing value
-         sitemap_createAt = COALESCE(ios_new_apps.sitemap_createAt, EXCLUDED.sitemap_createAt);
+NEW_APP_COLUMNS = ['url', 'google_indexAt', 'wayback_createAt', 'cc_createAt', 'sitemap_createAt', 'updateAt']
+# Dates already stored are kept; only missing ones are filled in
+NEW_APP_UPSERT = """ON CONFLICT (url) DO UPDATE SET
+        updateAt = excluded.updateAt,
+        google_indexAt = COALESCE(ios_new_apps.google_indexAt, excluded.google_indexAt),
+        wayback_createAt = COALESCE(ios_new_apps.wayback_createAt, excluded.wayback_createAt),
+        cc_createAt = COALESCE(ios_new_apps.cc_createAt, excluded.cc_createAt),
+        sitemap_createAt = COALESCE(ios_new_apps.sitemap_createAt, excluded.sitemap_createAt)"""
+
+
+def new_app_rows(items, current_time=None):
+    """One parameter row per url (NEW_APP_COLUMNS order); duplicates keep the first date seen."""
+    current_time = current_time or datetime.utcnow().isoformat()
+    rows = {}
+    for item in items:
+        url = item.get('url')
+        if not url:
+            continue
+        values = [str(item[c]) if item.get(c) else None for c in NEW_APP_COLUMNS[1:5]]
+        if url in rows:
+            rows[url] = [old or new for old, new in zip(rows[url], values)]
+        else:
+            rows[url] = values
+    return [[url] + values + [current_time] for url, values in rows.items()]
+
+
+async def upsert_app_data_bulk(items, client=None):
     """
+    Upsert many ios_new_apps rows with parameter-bound multi-row statements.
 
-    payload = {"sql": sql}
-    query_url = f"{CLOUDFLARE_BASE_URL}/query"
-
-    print(f"[DEBUG] SQL query: {sql}")  # Log the SQL query
-    print(f"[DEBUG] Payload: {payload}")  # Log the payload
-
-
-    for attempt in range(max_retries):
-        try:
-            async with session.post(query_url, headers=HEADERS, json=payload) as response:
-                response.raise_for_status()
-                print(f"[INFO] Data upserted for {url}.")
-                return
-        except aiohttp.ClientError as e:
-            print(f"[ERROR] Attempt {attempt + 1} failed: {e!r}")
-            if attempt < max_retries - 1:
-                 try:
-                     response_body = await response.json()
-                     print(f"[ERROR] Response body: {response_body}")
-                 except:
-                     pass
-                 print(f"[INFO] Retrying in {retry_delay} seconds...")
-
-                 await asyncio.sleep(retry_delay)
-
-        except Exception as e:
-            print(f"[ERROR] Unexpected error on attempt {attempt + 1}: {e!r}")
-            if attempt < max_retries - 1:
-                print(f"[INFO] Retrying in {retry_delay} seconds...")
-                await asyncio.sleep(retry_delay)
-    print(f"[ERROR] Failed to upsert data for {url} after {max_retries} attempts.")
-async def upsert_app_data1(session,item, max_retries=3, retry_delay=5):
-    current_time = datetime.utcnow().isoformat()
-
-    url=item.get('url')
-    google_indexAt=item.get('google_indexAt',None)
-    wayback_createAt=item.get('wayback_createAt',None)
-    cc_createAt=item.get('cc_createAt',None)
-    sitemap_createAt=item.get('sitemap_createAt',None)
-    
-    sql = f"""
-    INSERT INTO ios_new_apps (url, google_indexAt,wayback_createAt, cc_createAt, sitemap_createAt,updateAt)
-    VALUES ('{url}',  
-            {f"'{google_indexAt}'" if google_indexAt else 'NULL'}, 
-            {f"'{wayback_createAt}'" if wayback_createAt else 'NULL'}, 
-            {f"'{cc_createAt}'" if cc_createAt else 'NULL'}, 
-            {f"'{sitemap_createAt}'" if sitemap_createAt else 'NULL'}, 
-            '{current_time}')
-    ON CONFLICT (url) DO UPDATE
-    SET updateAt = '{current_time}',
-        google_indexAt = COALESCE(ios_new_apps.google_indexAt, EXCLUDED.google_indexAt),
-        wayback_createAt = COALESCE(ios_new_apps.wayback_createAt, EXCLUDED.wayback_createAt),
-        cc_createAt = COALESCE(ios_new_apps.cc_createAt, EXCLUDED.cc_createAt);
-        sitemap_createAt = COALESCE(ios_new_apps.sitemap_createAt, EXCLUDED.sitemap_createAt);
-        
+    Rows are packed up to D1's bound parameter limit per statement and the
+    statements are pipelined over one D1 session, so a thousand urls take
+    about sixty requests. Returns the number of statements sent; raises
+    D1Error when a statement still fails after retries, so callers only
+    treat the urls as stored on success.
     """
-    payload = {"sql": sql}
-    url = f"{CLOUDFLARE_BASE_URL}/query"
+    rows = new_app_rows(items)
+    if not rows:
+        return 0
+    if client is None:
+        async with AsyncD1Client() as client:
+            return await upsert_app_data_bulk(items, client)
+    statements = await client.insert_rows('ios_new_apps', NEW_APP_COLUMNS, rows, verb='INSERT', suffix=NEW_APP_UPSERT)
+    log.debug('upserted apps', apps=len(rows), statements=statements)
+    return statements
 
-    for attempt in range(max_retries):
-        try:
-            async with session.post(url, headers=HEADERS, json=payload) as response:
-                response.raise_for_status()
-                print(f"[INFO] Data upserted for {url}.")
-                return
-        except aiohttp.ClientError as e:
-            print(f"[ERROR] Attempt {attempt + 1} failed: {e}:{response.json()}")
-            if attempt < max_retries - 1:
-                print(f"[INFO] Retrying in {retry_delay} seconds...")
-                await asyncio.sleep(retry_delay)
-        except Exception as e:
-            print(f"[ERROR] Unexpected error on attempt {attempt + 1}: {e}:{response.json()}")
-            if attempt < max_retries - 1:
-                print(f"[INFO] Retrying in {retry_delay} seconds...")
-                await asyncio.sleep(retry_delay)
-    print(f"[ERROR] Failed to upsert data for {url} after {max_retries} attempts.")
 
 # Process a single app URL
 async def process_url(semaphore, session, item):
     async with semaphore:
         url=item.get("url")
-        print(f"[INFO] Processing app: {url}")
+        log.debug('processing app', url=url)
         item = await get_app_runs(session, item)
-        # get app name intitle google search count 
-        print(f"[INFO] save statics: {item}")
-        
-        if item is not None:
-            await upsert_app_data(session, item)
-async def process_new_app(semaphore, session, item):
-    async with semaphore:
-        await upsert_app_data(session, item)
+        return item
 
 # Main function
 async def main():
@@ -328,14 +231,12 @@ async def main():
             current_date = datetime.now()
             start_date = current_date - timedelta(days=730)
             file_path = 'hg.txt'
-            items=exact_url_timestamp(
+            items=await exact_url_timestamp(
                 baseUrl,
                 max_count=5000,
                 start_date=int(start_date.strftime('%Y%m%d')),
                 end_date=int(current_date.strftime('%Y%m%d')),
-                
-                chunk_size=1000,
-                sleep=5
+                chunk_size=1000
             )
             # if os.path.exists(file_path):
                 # with open(file_path, encoding='utf8') as f:
@@ -352,27 +253,23 @@ async def main():
             for item in items:
                 url=item.get('url')
                 wayback_createAt=item.get('timestamp')
-                print('--',url)
                 if '?' in url:
                     url=url.split('?')[0]
                 appname=url.replace(baseUrl,'').split('/')
                 if len(appname)<2:
-                    print('invalid url',url)
+                    log.sampled('invalid url', every=100, url=url)
                     continue
 
                 url=baseUrl+appname[0]+'/'+appname[1]
                 if url in unique_items:
-                    print('app url added before',url)
                 
                     existing_item = unique_items[url]
                     
                     existing_wayback_createAt = existing_item.get('wayback_createAt')
                     if wayback_createAt < existing_wayback_createAt:
                         existing_item['wayback_createAt'] = wayback_createAt
-                        print('new app url date is older',wayback_createAt)
 
                 else:
-                    print('add new app url ',url)
                     
                     item['url'] = url
                     item['wayback_createAt'] = wayback_createAt
@@ -380,13 +277,22 @@ async def main():
             cleanitems = list(unique_items.values())
 
             print('cleanitems',len(cleanitems))
-            await asyncio.gather(*(process_url(semaphore, session, item) for item in cleanitems))
-        appurls=[]
-        existing_apps=await get_existing_app_data()
-        print('existing apps count',len(existing_apps))
-        
-        if existing_apps!=[]:
-            appurls=[  item.get('url')   for item in existing_apps]            
+            processed = await asyncio.gather(*(process_url(semaphore, session, item) for item in cleanitems))
+            try:
+                await upsert_app_data_bulk([item for item in processed if item is not None])
+            except D1Error as e:
+                log.error('failed to upsert wayback apps', count=len(processed), error=e)
+        # URLs already in ios_new_apps, kept on disk between runs. The table is
+        # only read when the store is empty (first run or lost cache).
+        seen = SeenUrls(SEEN_URLS_PATH)
+        if len(seen) == 0:
+            existing_apps=await get_existing_app_data()
+            # A failed read leaves the store empty so the next run seeds it again
+            if existing_apps is not None:
+                print('existing apps count',len(existing_apps))
+                seen.add_many([item.get('url') for item in existing_apps if item.get('url')])
+                seen.save()
+        print('known app urls',len(seen))
         if supportsitemap:
             url_domain = 'https://apps.apple.com'
             ROOT_SITEMAP_URL = f"{url_domain}/sitemap.xml"
@@ -410,7 +316,7 @@ async def main():
                                    }
 
             results=d.monitor_all_sites(advanced_queries=advanced_queries)
-            print('==',results)
+            log.info('google search results', rows=len(results))
             print("[INFO] google search check  complete.")
             new_apps_urls=[]
             new_items=[]
@@ -418,10 +324,8 @@ async def main():
             
             if  not results.empty and results.shape[0] > 1:
                 gindex=int(datetime.now().strftime('%Y%m%d'))
-                items=[]
-                for index, row in results.iterrows():
-                    item={}
-                    url=row.get('url')
+                candidate_urls=[]
+                for url in results['url']:
                     if '?' in url:
                         url=url.split('?')[0]
                     appname=url.replace(baseUrl,'').split('/')
@@ -429,21 +333,27 @@ async def main():
                         continue
                     if '/developer/' in url:
                         continue
-                    # url=baseUrl+appname[0]+'/'+appname[1]+'/'+appname[2]
-                    if url in appurls:
-                        continue
-                    item['url']=url
-
-                    item['google_indexAt']=gindex
-                    if not url in appurls:
-                        print('check url is existing')
-                        existing_apps.append(item)
-                        new_apps_urls.append(url)
-                        new_items.append(item)
-            print('clean google search url item',len(new_apps_urls),new_apps_urls)
+                    candidate_urls.append(url)
+                for url in seen.filter_new(candidate_urls):
+                    new_apps_urls.append(url)
+                    new_items.append({'url': url, 'google_indexAt': gindex})
+            log.info('new app urls from google search', count=len(new_apps_urls))
+            log.debug('new app urls', urls=new_apps_urls)
+            # earliest Wayback capture for the whole batch at once
+            if new_items:
+                first_seen = await resolve_first_seen(new_apps_urls)
+                for item in new_items:
+                    item['wayback_createAt'] = first_seen.get(item['url'])
             
             
-            await asyncio.gather(*(process_new_app(semaphore, session, item) for item in new_items))
+            # Only urls stored in ios_new_apps are marked seen; failed ones are retried next run
+            try:
+                await upsert_app_data_bulk(new_items)
+            except D1Error as e:
+                log.error('failed to upsert new apps', count=len(new_items), error=e)
+            else:
+                seen.add_many(new_apps_urls)
+                seen.save()
         print("[INFO] url detect complete.")
         print("[INFO] update popular space count.")
         bulk_scrape_and_save_app_urls(new_apps_urls)
@@ -8,16 +8,24 @@ from aiohttp_socks import ProxyType, ProxyConnector, ChainProxyConnector
 from DataRecorder import Recorder
 import pandas as pd
 from getbrowser import setup_chrome
-from app_store_scraper import AppStore
 import requests
 import random
 from saveReviewtoD1 import *
+from text_normalizer import normalize_text
+from review_store import ReviewStore
+from job_scheduler import JobScheduler
+from amp_reviews import MAX_APP_REVIEWS, AppStoreReviewClient, fetch_app_reviews
+from review_sink import ReviewSink
+from log_utils import get_logger
+
+log = get_logger('onedeveloperappreviews')
 
 # Environment Variables
 D1_DATABASE_ID = os.getenv('D1_APP_DATABASE_ID')
 CLOUDFLARE_ACCOUNT_ID = os.getenv('CLOUDFLARE_ACCOUNT_ID')
 CLOUDFLARE_API_TOKEN = os.getenv('CLOUDFLARE_API_TOKEN')
-CLOUDFLARE_BASE_URL = f"https://api.cloudflare.com/client/v4/accounts/{CLOUDFLARE_ACCOUNT_ID}/d1/database/{D1_DATABASE_ID}"
+CLOUDFLARE_API_BASE_URL = os.getenv('CLOUDFLARE_API_BASE_URL', 'https://api.cloudflare.com/client/v4')
+CLOUDFLARE_BASE_URL = f"{CLOUDFLARE_API_BASE_URL}/accounts/{CLOUDFLARE_ACCOUNT_ID}/d1/database/{D1_DATABASE_ID}"
 
 # Constants
 PROXY_URL = None
@@ -186,7 +194,7 @@ def get_ids_from_developer_page(url):
             return []
 
     
-async def get_review(id, outfile,developer):
+async def get_review(id, outfile,developer, client=None, sink=None):
     """
     Asynchronously fetch the review for the given app and save it to the outfile.
     """
@@ -195,23 +203,14 @@ async def get_review(id, outfile,developer):
     url=id
     appname, country = url.split('/')[-2], url.split('/')[-4]
     app_id=url.split('/')[-1]
-    print('get review for url',id,appname,app_id,country)
+    log.debug('processing app', app=appname, app_id=app_id, country=country, url=url)
     items=[]
     
     try:
     
-        app = AppStore(country=country, app_name=appname)
-        how_many=None
-        if how_many:
-            await asyncio.to_thread(app.review,
-                                how_many=how_many, 
-                                sleep=random.randint(1, 2))
-        else:
-             await asyncio.to_thread(app.review,
-                                sleep=random.randint(1, 2))
-
+        all_reviews = await fetch_app_reviews(app_id, country, how_many=MAX_APP_REVIEWS, client=client)
 
-        for review in app.reviews:
+        for review in all_reviews:
             reviewdate = review['date'].strftime('%Y-%m-%d-%H-%M-%S')
         
             item={
@@ -220,7 +219,7 @@ async def get_review(id, outfile,developer):
                 "score": review['rating'],
                 "userName": review['userName'].strip(),
                             "date": reviewdate,
-                "review": review['review'].replace('\r', ' ').replace('\n', ' ').strip(),
+                "review": normalize_text(review['review']),
             "appname":appname,
             "country":country,
             "developer":developer
@@ -229,13 +228,21 @@ async def get_review(id, outfile,developer):
             outfile.add_data(item)
 
     except Exception as e:
-        print(f"Error fetching reviews for URL '{url}': {e}")
+        log.error('failed to fetch reviews', url=url, error=e)
         
     try:
-        insert_into_ios_review_data(items)
-        print('save aall review')
+        await asyncio.to_thread(ReviewStore().write, items, platform='ios')
     except Exception as e:
-        print(f"Error save reviews for URL '{url}': {e}")
+        log.error('failed to store reviews locally', url=url, error=e)
+
+    try:
+        if sink is not None:
+            await sink.put(items)
+        else:
+            insert_into_ios_review_data(items)
+        log.sampled('reviews saved', every=20, app=appname, country=country, reviews=len(items))
+    except Exception as e:
+        log.error('failed to save reviews', url=url, error=e)
 
 
 async def main():
@@ -267,18 +274,12 @@ async def main():
         outfile_reviews_path = f'{RESULT_FOLDER}/{developername}-all-app-reviews-{current_time}.csv'
         outfile_reviews = Recorder(outfile_reviews_path)
 
-        tasks = []  # List of tasks for concurrent execution
-
-            # Create tasks for each row in the DataFrame
-            
-        tasks = [get_review(url, outfile_reviews, developer) for url in ids]
-            
-        batch_size = 2
-        for i in range(0, len(tasks), batch_size):
-            await asyncio.gather(*tasks[i:i + batch_size])
-
-            # Run all review tasks concurrently
-        await asyncio.gather(*tasks)
+        # Every app is fetched exactly once by a fixed pool of workers
+        scheduler = JobScheduler(name='developer reviews')
+        async with AppStoreReviewClient() as client, ReviewSink() as sink:
+            for rank, url in enumerate(ids):
+                scheduler.submit(get_review, url, outfile_reviews, developer, client=client, sink=sink, priority=rank, name=url)
+            await scheduler.run()
 
         outfile_reviews.record()
 
@@ -0,0 +1,208 @@
+import asyncio
+import json
+import random
+import re
+from datetime import datetime
+from urllib.parse import urlencode
+
+import httpx
+from log_utils import get_logger
+from review_store import ReviewStore
+
+# Google Play's internal RPC endpoint behind the review list (the same one
+# google_play_scraper uses), paginated with continuation tokens.
+PLAY_BATCHEXECUTE_URL = "https://play.google.com/_/PlayStoreUi/data/batchexecute"
+REVIEWS_RESPONSE_RE = re.compile(r"\)]}'\n\n([\s\S]+)")
+
+log = get_logger('play_reviews')
+
+SORT_MOST_RELEVANT = 1
+SORT_NEWEST = 2
+SORT_RATING = 3
+
+PAGE_SIZE = 199  # largest page the endpoint reliably serves
+MAX_RETRIES = 5
+BASE_DELAY_SECS = 2
+FLUSH_ROWS = 5000
+
+HEADERS = {
+    'Content-Type': 'application/x-www-form-urlencoded;charset=UTF-8',
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36',
+}
+
+# Position of each field inside a raw review array
+REVIEW_FIELDS = {
+    'reviewId': [0],
+    'userName': [1, 0],
+    'userImage': [1, 1, 3, 2],
+    'content': [4],
+    'score': [2],
+    'thumbsUpCount': [6],
+    'reviewCreatedVersion': [10],
+    'at': [5, 0],
+    'replyContent': [7, 1],
+    'repliedAt': [7, 2, 0],
+    'appVersion': [10],
+}
+TIMESTAMP_FIELDS = ('at', 'repliedAt')
+
+
+class PlayReviewError(Exception):
+    """Raised when a review page still fails after all retries."""
+    pass
+
+
+def _nested(source, path):
+    try:
+        for key in path:
+            source = source[key]
+        return source
+    except (IndexError, KeyError, TypeError):
+        return None
+
+
+def parse_review(raw):
+    review = {name: _nested(raw, path) for name, path in REVIEW_FIELDS.items()}
+    for name in TIMESTAMP_FIELDS:
+        if review[name]:
+            review[name] = datetime.fromtimestamp(review[name])
+    return review
+
+
+def build_request_body(app_id, sort, count, filter_score=None, token=None):
+    inner = json.dumps([None, None, [2, sort, [count, None, token], None, [None, filter_score]], [app_id, 7]])
+    return urlencode({'f.req': json.dumps([[["UsvDTd", inner, None, "generic"]]])})
+
+
+def parse_review_page(text):
+    """Return (raw review arrays, next continuation token or None) for one response."""
+    match = REVIEWS_RESPONSE_RE.findall(text)
+    if not match:
+        return [], None
+    payload = json.loads(match[0])[0][2]
+    if not payload:
+        return [], None
+    data = json.loads(payload)
+    return data[0] or [], _nested(data, [-1, -1])
+
+
+async def fetch_review_page(client, app_id, lang='en', country='us', sort=SORT_NEWEST,
+                            count=PAGE_SIZE, filter_score=None, token=None, max_retries=MAX_RETRIES):
+    """
+    Fetch one page of reviews with bounded retries.
+
+    PlayDataError bodies, 429s, 5xx responses and network errors are retried
+    with exponential backoff up to `max_retries` times, then PlayReviewError
+    is raised.
+    """
+    params = {'hl': lang, 'gl': country}
+    body = build_request_body(app_id, sort, count, filter_score, token)
+    last_error = None
+    for attempt in range(max_retries):
+        try:
+            response = await client.post(PLAY_BATCHEXECUTE_URL, params=params, content=body, headers=HEADERS)
+            if response.status_code == 429 or response.status_code >= 500:
+                last_error = f"HTTP {response.status_code}"
+            elif "error.PlayDataError" in response.text:
+                last_error = "PlayDataError"
+            else:
+                response.raise_for_status()
+                raw_reviews, next_token = parse_review_page(response.text)
+                return [parse_review(raw) for raw in raw_reviews], next_token
+        except httpx.HTTPError as e:
+            last_error = repr(e)
+        await asyncio.sleep(BASE_DELAY_SECS * (2 ** attempt) + random.uniform(0, 1))
+    raise PlayReviewError(f"{app_id} ({lang}-{country}): page failed after {max_retries} attempts: {last_error}")
+
+
+async def harvest_app_reviews(client, app_id, lang='en', country='us', sort=SORT_NEWEST,
+                              limit=None, store=None, on_rows=None, flush_rows=FLUSH_ROWS):
+    """
+    Crawl all review pages of one app/locale and stream them to the store.
+
+    As soon as a page's continuation token is known the next page request is
+    started, so writing a page overlaps with downloading the next one.
+    Rows are flushed to the store every `flush_rows` rows; `on_rows` (if
+    given) is called with each page. Returns the number of reviews fetched.
+    """
+    store = store or ReviewStore()
+    buffer = []
+    fetched = 0
+
+    async def flush():
+        if buffer:
+            rows = buffer[:]
+            buffer.clear()
+            await asyncio.to_thread(store.write, rows, 'android', country, app_id, 'at')
+
+    def page_size():
+        return PAGE_SIZE if limit is None else max(1, min(PAGE_SIZE, limit - fetched))
+
+    next_page = asyncio.create_task(fetch_review_page(client, app_id, lang, country, sort, page_size()))
+    try:
+        while next_page is not None:
+            rows, token = await next_page
+            if limit is not None:
+                rows = rows[:limit - fetched]
+            fetched += len(rows)
+            done = not token or not rows or (limit is not None and fetched >= limit)
+            next_page = None if done else asyncio.create_task(
+                fetch_review_page(client, app_id, lang, country, sort, page_size(), token=token))
+
+            for row in rows:
+                row['lang'] = lang
+            if on_rows and rows:
+                on_rows(rows)
+            buffer.extend(rows)
+            if len(buffer) >= flush_rows:
+                await flush()
+    finally:
+        if next_page is not None and not next_page.done():
+            next_page.cancel()
+        # Keep whatever was fetched before a failure
+        await flush()
+    return fetched
+
+
+async def harvest_play_reviews(targets, concurrency=8, sort=SORT_NEWEST, limit=None, store=None, on_rows=None):
+    """
+    Harvest reviews for many (app_id, lang, country) targets concurrently.
+
+    At most `concurrency` targets are crawled at a time over one shared
+    connection pool. A failing target is reported and skipped. Returns
+    {(app_id, lang, country): review count or None on failure}.
+    """
+    store = store or ReviewStore()
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency * 2, max_keepalive_connections=concurrency * 2)
+
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        async def run(target):
+            app_id, lang, country = target
+            async with semaphore:
+                try:
+                    count = await harvest_app_reviews(client, app_id, lang, country, sort=sort,
+                                                      limit=limit, store=store, on_rows=on_rows)
+                    log.sampled('app reviews harvested', every=20, app_id=app_id, lang=lang, country=country,
+                                reviews=count)
+                    return count
+                except PlayReviewError as e:
+                    log.error('play reviews failed', error=e)
+                    return None
+                except Exception as e:
+                    # Malformed pages, store or on_rows failures only skip this target
+                    log.error('play reviews failed', app_id=app_id, lang=lang, country=country,
+                              error=f'{type(e).__name__}: {e}')
+                    return None
+
+        results = await asyncio.gather(*(run(target) for target in targets))
+    return dict(zip(targets, results))
+
+
+if __name__ == "__main__":
+    import os
+
+    apps = [a.strip() for a in os.getenv('apps', 'com.lemon.lvoverseas').split(',') if a.strip()]
+    locales = [l.strip() for l in os.getenv('locales', 'en-us').split(',') if l.strip()]
+    targets = [(app, *locale.split('-', 1)) for app in apps for locale in locales]
+    print(asyncio.run(harvest_play_reviews(targets)))
@@ -0,0 +1,251 @@
+import json
+import os
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+RANK_HISTORY_DIR = os.getenv('RANK_HISTORY_DIR', './data/rank_history')
+EPOCH = date(1970, 1, 1)
+NOT_RANKED = 0  # ranks are 1..255; 0 marks a day the app was not in the chart
+INITIAL_SERIES = 1024
+INITIAL_DAYS = 64
+
+
+def to_day(value):
+    """Days since 1970-01-01 for a date, datetime, 'YYYY-MM-DD...' text or day number."""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, datetime):
+        value = value.date()
+    if not isinstance(value, date):
+        value = datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+    return (value - EPOCH).days
+
+
+def from_day(day):
+    return EPOCH + timedelta(days=int(day))
+
+
+def chart_key(country, platform, chart_type, cid):
+    return f"{country}/{platform}/{chart_type}/{cid}"
+
+
+class RankHistory:
+    """
+    Dense daily rank vectors for every (app, chart) pair, on disk.
+
+    All vectors live in one uint8 matrix (series x days) memory-mapped from
+    `ranks.u8`, one contiguous row per (app, chart), so reading an app's
+    history touches only that row. `index.json` maps series and charts to
+    rows and stores the first day and the matrix capacity, which doubles
+    as series or days are added.
+
+        history = RankHistory()
+        history.add_day('2024-12-01', rows)
+        history.best_rank('id284882215', 'us/iphone/free/6005')
+    """
+
+    def __init__(self, root=RANK_HISTORY_DIR):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._index_path = self.root / 'index.json'
+        self._data_path = self.root / 'ranks.u8'
+        if self._index_path.exists():
+            with open(self._index_path, encoding='utf-8') as f:
+                index = json.load(f)
+        else:
+            index = {'start_day': None, 'days': 0, 'capacity': [INITIAL_SERIES, INITIAL_DAYS],
+                     'series': {}, 'charts': {}}
+        self.start_day = index['start_day']
+        self.days = index['days']
+        self.capacity = tuple(index['capacity'])
+        self.series = index['series']   # "chart|appid" -> row
+        self.charts = index['charts']   # chart -> [rows]
+        self._names = [None] * len(self.series)
+        self._apps = {}                 # appid -> [charts]
+        for name, row in self.series.items():
+            self._names[row] = name
+            key, appid = name.rsplit('|', 1)
+            self._apps.setdefault(appid, []).append(key)
+        self._ranks = self._open(self.capacity, 'r+' if self._data_path.exists() else 'w+')
+
+    def _open(self, shape, mode, path=None):
+        return np.memmap(path or self._data_path, dtype=np.uint8, mode=mode, shape=shape)
+
+    def _grow(self, rows, days):
+        if rows <= self.capacity[0] and days <= self.capacity[1]:
+            return
+        shape = (max(self.capacity[0], _next_power(rows)), max(self.capacity[1], _next_power(days)))
+        tmp_path = self._data_path.with_suffix('.tmp')
+        grown = self._open(shape, 'w+', tmp_path)
+        grown[:self.capacity[0], :self.capacity[1]] = self._ranks
+        grown.flush()
+        del grown
+        self._ranks.flush()
+        del self._ranks
+        os.replace(tmp_path, self._data_path)
+        self.capacity = shape
+        self._ranks = self._open(shape, 'r+')
+
+    def _shift_start(self, day):
+        """Move the first day back to `day`, shifting existing columns right."""
+        offset = self.start_day - day
+        self._grow(len(self.series), self.days + offset)
+        self._ranks[:, offset:offset + self.days] = self._ranks[:, :self.days].copy()
+        self._ranks[:, :offset] = NOT_RANKED
+        self.start_day = day
+        self.days += offset
+
+    def _column(self, day):
+        day = to_day(day)
+        if self.start_day is None:
+            self.start_day = day
+        elif day < self.start_day:
+            self._shift_start(day)
+        column = day - self.start_day
+        if column >= self.days:
+            self._grow(len(self.series), column + 1)
+            self.days = column + 1
+        return column
+
+    def _row(self, key, appid, create=False):
+        name = f"{key}|{appid}"
+        row = self.series.get(name)
+        if row is None and create:
+            row = len(self.series)
+            self._grow(row + 1, self.days)
+            self.series[name] = row
+            self._names.append(name)
+            self.charts.setdefault(key, []).append(row)
+            self._apps.setdefault(str(appid), []).append(key)
+        return row
+
+    def add_day(self, day, rows):
+        """
+        Record one day of chart rows (country, platform, type, cid, rank,
+        appid). Re-adding a day overwrites that day for the charts in
+        `rows` only, so one day can be loaded chart by chart.
+        """
+        column = self._column(day)
+        rows = [(chart_key(row['country'], row['platform'], row['type'], row['cid']), row) for row in rows]
+        for key in {key for key, _ in rows}:
+            key_rows = self.charts.get(key)
+            if key_rows:
+                self._ranks[key_rows, column] = NOT_RANKED
+        for key, row in rows:
+            series_row = self._row(key, row['appid'], create=True)
+            self._ranks[series_row, column] = min(int(row['rank']), 255)
+
+    def add_snapshot(self, day, root=None):
+        """Load one day from the top100_snapshot Parquet files."""
+        import pyarrow.parquet as pq
+        from top100_snapshot import SNAPSHOT_DIR
+
+        table = pq.read_table(Path(root or SNAPSHOT_DIR) / f"{day}.ranks.parquet")
+        self.add_day(day, table.to_pylist())
+
+    def save(self):
+        self._ranks.flush()
+        index = {'start_day': self.start_day, 'days': self.days, 'capacity': list(self.capacity),
+                 'series': self.series, 'charts': self.charts}
+        tmp_path = self._index_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self._index_path)
+
+    def _window(self, start, end):
+        first = 0 if start is None else max(0, to_day(start) - self.start_day)
+        last = self.days if end is None else min(self.days, to_day(end) - self.start_day + 1)
+        return first, max(first, last)
+
+    def ranks(self, appid, chart, start=None, end=None):
+        """(day numbers, ranks) of one app in one chart; rank 0 = not ranked that day."""
+        row = self._row(chart, appid)
+        if row is None or self.start_day is None:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.uint8)
+        first, last = self._window(start, end)
+        return np.arange(first, last) + self.start_day, np.array(self._ranks[row, first:last])
+
+    def history(self, appid, chart, start=None, end=None):
+        """Ranked days only, as [(date, rank)]."""
+        days, ranks = self.ranks(appid, chart, start, end)
+        ranked = ranks != NOT_RANKED
+        return [(from_day(d), int(r)) for d, r in zip(days[ranked], ranks[ranked])]
+
+    def best_rank(self, appid, chart, start=None, end=None):
+        """(best rank, first date it was reached) or None if never ranked."""
+        days, ranks = self.ranks(appid, chart, start, end)
+        ranked = np.where(ranks != NOT_RANKED, ranks.astype(np.int16), 256)
+        if not len(ranked) or ranked.min() == 256:
+            return None
+        i = int(ranked.argmin())
+        return int(ranks[i]), from_day(days[i])
+
+    def streak(self, appid, chart, max_rank=100, start=None, end=None):
+        """
+        Longest and current run of consecutive days at `max_rank` or better.
+        Returns {'longest': days, 'longest_start': date, 'current': days}.
+        """
+        days, ranks = self.ranks(appid, chart, start, end)
+        hit = (ranks != NOT_RANKED) & (ranks <= max_rank)
+        if not hit.any():
+            return {'longest': 0, 'longest_start': None, 'current': 0}
+        edges = np.diff(np.concatenate(([0], hit.astype(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        lengths = ends - starts
+        i = int(lengths.argmax())
+        current = int(lengths[-1]) if ends[-1] == len(hit) else 0
+        return {'longest': int(lengths[i]), 'longest_start': from_day(days[starts[i]]), 'current': current}
+
+    def movers(self, chart, day=None, previous=None, n=10):
+        """
+        Biggest rank changes in one chart between `previous` (default the
+        day before) and `day` (default the latest day). Only the chart's own
+        series are read. Apps entering the chart count as coming from rank
+        max+1. Returns (gainers, losers) as [(appid, old rank, new rank, change)].
+        """
+        rows = self.charts.get(chart)
+        if not rows or self.start_day is None:
+            return [], []
+        column = self.days - 1 if day is None else to_day(day) - self.start_day
+        prev_column = column - 1 if previous is None else to_day(previous) - self.start_day
+        if not (0 <= prev_column < self.days and 0 <= column < self.days):
+            return [], []
+        rows = np.asarray(rows)
+        new = self._ranks[rows, column].astype(np.int16)
+        old = self._ranks[rows, prev_column].astype(np.int16)
+        floor = int(max(new.max(), old.max())) + 1
+        change = np.where(old == NOT_RANKED, floor, old) - np.where(new == NOT_RANKED, floor, new)
+        appids = [self._names[r].rsplit('|', 1)[1] for r in rows]
+        order = np.argsort(-change, kind='stable')
+        moved = [(appids[i], int(old[i]), int(new[i]), int(change[i])) for i in order if change[i] != 0]
+        gainers = [m for m in moved if m[3] > 0][:n]
+        losers = [m for m in reversed(moved) if m[3] < 0][:n]
+        return gainers, losers
+
+    def charts_of(self, appid):
+        return list(self._apps.get(str(appid), []))
+
+
+def _next_power(n):
+    size = 1
+    while size < n:
+        size *= 2
+    return size
+
+
+if __name__ == "__main__":
+    import sys
+
+    from top100_snapshot import SNAPSHOT_DIR
+
+    history = RankHistory()
+    for path in sorted(Path(SNAPSHOT_DIR).glob('*.ranks.parquet')):
+        history.add_snapshot(path.name.split('.')[0])
+    history.save()
+    print(f"{len(history.series)} series over {history.days} days")
+    if len(sys.argv) == 3:
+        appid, chart = sys.argv[1:]
+        print(history.best_rank(appid, chart), history.streak(appid, chart, max_rank=10))
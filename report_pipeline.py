@@ -0,0 +1,143 @@
+import importlib.util
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+REPORT_MODULE_PATH = Path(__file__).with_name('top-100-report.py')
+
+# report key -> analyze_* function in top-100-report.py
+REPORT_SECTIONS = {
+    'app_performance_report': 'analyze_app_performance',
+    'market_trend_report': 'analyze_market_trends',
+    'competitive_report': 'analyze_competitive',
+    'app_attribute_report': 'analyze_app_attributes',
+    'strategic_report': 'analyze_strategic_insights',
+    'feature_report': 'analyze_feature_inspiration',
+    'event_report': 'analyze_event_driven',
+}
+
+STRING_COLUMNS = ['appid', 'type', 'cname', 'cid', 'platform', 'country']
+NUMERIC_COLUMNS = ['rank']
+DATETIME_COLUMNS = ['updateAt']
+
+
+def load_report_module():
+    """Import top-100-report.py (not importable by name because of the hyphens)."""
+    module = sys.modules.get('top_100_report')
+    if module is None:
+        spec = importlib.util.spec_from_file_location('top_100_report', REPORT_MODULE_PATH)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules['top_100_report'] = module
+        spec.loader.exec_module(module)
+    return module
+
+
+class SharedFrame:
+    """
+    A typed rank frame stored column by column in shared memory.
+
+    Only the columns the sections read are shared. String columns are
+    dictionary encoded (int32 codes in shared memory, the distinct values
+    travel with the spec), `rank` keeps its numeric dtype and `updateAt` is
+    int64 nanoseconds. Workers attach with `SharedFrame.attach`
+    and read the arrays without copying the frame through pickling.
+    """
+
+    def __init__(self, frame):
+        self._blocks = []
+        self.spec = {'length': len(frame), 'columns': {}}
+        for column in frame.columns:
+            if column in DATETIME_COLUMNS:
+                values = frame[column].to_numpy(dtype='datetime64[ns]').view(np.int64)
+                self._share(column, values, kind='datetime')
+            elif column in NUMERIC_COLUMNS:
+                values = frame[column].to_numpy()
+                if values.dtype.kind not in 'iuf':
+                    values = values.astype(np.float64)
+                self._share(column, values, kind='numeric')
+            elif column in STRING_COLUMNS:
+                codes, uniques = pd.factorize(frame[column].astype(object), use_na_sentinel=True)
+                self._share(column, codes.astype(np.int32), kind='string', categories=list(uniques))
+
+    def _share(self, column, values, kind, categories=None):
+        block = shared_memory.SharedMemory(create=True, size=max(1, values.nbytes))
+        np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[:] = values
+        self._blocks.append(block)
+        self.spec['columns'][column] = {'block': block.name, 'dtype': values.dtype.str,
+                                        'kind': kind, 'categories': categories}
+
+    @staticmethod
+    def attach(spec):
+        """Rebuild the frame in a worker. Returns (frame, blocks to close)."""
+        blocks = []
+        data = {}
+        for column, meta in spec['columns'].items():
+            block = shared_memory.SharedMemory(name=meta['block'])
+            blocks.append(block)
+            values = np.ndarray((spec['length'],), dtype=np.dtype(meta['dtype']), buffer=block.buf)
+            if meta['kind'] == 'datetime':
+                data[column] = values.view('datetime64[ns]').copy()
+            elif meta['kind'] == 'numeric':
+                data[column] = values.copy()
+            else:
+                categories = np.array(meta['categories'] + [None], dtype=object)
+                data[column] = categories[values]  # code -1 (missing) picks the trailing None
+        return pd.DataFrame(data), blocks
+
+    def close(self):
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+
+def _run_section(function_name, spec):
+    frame, blocks = SharedFrame.attach(spec)
+    try:
+        started = time.perf_counter()
+        result = getattr(load_report_module(), function_name)(frame)
+        return result, time.perf_counter() - started
+    finally:
+        del frame
+        for block in blocks:
+            block.close()
+
+
+def run_report_sections(frame, sections=None, max_workers=None, on_section=None):
+    """
+    Compute report sections from one prepared frame in a process pool.
+
+    `frame` comes from prepare_frame in top-100-report. It is placed in
+    shared memory once and every section runs in its own worker, so the
+    total time is about that of the slowest section. Returns
+    {report key: section result} in REPORT_SECTIONS order, or, when
+    `on_section(key, result)` is given, hands each section over as soon as
+    it finishes without keeping it and returns the keys in that order.
+    """
+    sections = sections or REPORT_SECTIONS
+    max_workers = max_workers or min(len(sections), os.cpu_count() or 1)
+    shared = SharedFrame(frame)
+    results = {}
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(_run_section, name, shared.spec): key for key, name in sections.items()}
+            for future in as_completed(futures):
+                key = futures[future]
+                result, elapsed = future.result()
+                print(f"[INFO] Section {key} computed in {elapsed:.2f}s")
+                if on_section is not None:
+                    on_section(key, result)
+                    results[key] = None
+                else:
+                    results[key] = result
+    finally:
+        shared.close()
+    if on_section is not None:
+        return list(results)
+    return {key: results[key] for key in sections}
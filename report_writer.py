@@ -0,0 +1,112 @@
+import gzip
+import json
+from datetime import date, datetime, timedelta
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    # NumPy arrays and scalars and non-string dict keys (e.g. int ranks) are
+    # handled natively by orjson; only the types below reach `_fallback`.
+    ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+# Indented output uses two spaces per level (the only width orjson supports)
+INDENT = 2
+
+
+def _fallback(obj):
+    """Types orjson/json cannot encode: pandas Timestamp/Timedelta/NaT and, for json, NumPy."""
+    if isinstance(obj, (datetime, date)):
+        return str(obj)
+    if isinstance(obj, timedelta):
+        return str(obj)
+    if hasattr(obj, 'tolist'):  # NumPy arrays/scalars and pandas Series without orjson
+        return obj.tolist()
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    return str(obj)
+
+
+def dumps(obj, indent=False):
+    """Serialize to JSON bytes (compact, or indented with `indent`), with orjson when it is installed."""
+    if orjson is not None:
+        option = ORJSON_OPTIONS | orjson.OPT_INDENT_2 if indent else ORJSON_OPTIONS
+        return orjson.dumps(obj, default=_fallback, option=option)
+    if indent:
+        return json.dumps(obj, default=_fallback, indent=INDENT).encode('utf-8')
+    return json.dumps(obj, default=_fallback, separators=(',', ':')).encode('utf-8')
+
+
+class ReportWriter:
+    """
+    Write a report to disk one section at a time.
+
+    The header fields are written first, then each section is serialized
+    and appended under "analysis" as soon as it is handed over, so the
+    whole report never exists as one string in memory. A path ending in
+    .gz is gzip compressed; `indent` writes the same document indented.
+
+        with ReportWriter('report.json.gz', report_type='top100rank') as writer:
+            writer.write_section('app_performance_report', section)
+    """
+
+    def __init__(self, path, compresslevel=6, indent=False, **header):
+        self.path = str(path)
+        self.indent = indent
+        if self.path.endswith('.gz'):
+            self._file = gzip.open(self.path, 'wb', compresslevel=compresslevel)
+        else:
+            self._file = open(self.path, 'wb')
+        self.sections = []
+        self.bytes_written = 0
+        self._write(b'{')
+        for key, value in header.items():
+            self._write(self._line(1) + dumps(key) + self._colon() + dumps(value) + b',')
+        self._write(self._line(1) + b'"analysis"' + self._colon() + b'{')
+
+    def _line(self, level):
+        # Newline plus indentation for `level` when indenting, nothing otherwise
+        return b'\n' + b' ' * (INDENT * level) if self.indent else b''
+
+    def _colon(self):
+        return b': ' if self.indent else b':'
+
+    def _write(self, data):
+        self._file.write(data)
+        self.bytes_written += len(data)
+
+    def write_section(self, key, value):
+        prefix = b',' if self.sections else b''
+        data = dumps(value, indent=self.indent)
+        if self.indent:
+            # Nest the section's own lines under "analysis"
+            data = data.replace(b'\n', self._line(2))
+        self._write(prefix + self._line(2) + dumps(key) + self._colon() + data)
+        self.sections.append(key)
+
+    def close(self):
+        if self._file is not None:
+            if self.indent:
+                self._write(self._line(1) + b'}' + self._line(0) + b'}\n')
+            else:
+                self._write(b'}}')
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def write_report(path, sections, indent=False, **header):
+    """Write a whole report from a dict or (key, value) pairs. Returns the bytes written."""
+    items = sections.items() if isinstance(sections, dict) else sections
+    with ReportWriter(path, indent=indent, **header) as writer:
+        for key, value in items:
+            writer.write_section(key, value)
+    return writer.bytes_written
@@ -0,0 +1,121 @@
+import asyncio
+import time
+
+from d1_client import AsyncD1Client, D1Error
+from instrumentation import METRICS
+from log_utils import get_logger
+from saveReviewtoD1 import compute_hash, create_table_if_not_exists
+
+log = get_logger('review_sink')
+
+REVIEW_TABLE = 'ios_review_data'
+REVIEW_COLUMNS = ['id', 'appid', 'appname', 'country', 'keyword', 'score', 'userName', 'date', 'review']
+FLUSH_ROWS = 500
+FLUSH_INTERVAL_SECS = 5.0
+MAX_PENDING_FLUSHES = 8
+
+
+def review_row(item):
+    """ios_review_data values for one review dict, keyed by the usual appid/userName/date hash."""
+    row = dict(item)
+    row['id'] = compute_hash(row['appid'], row['userName'], row['date'])
+    row['score'] = row.get('score') or 0.0
+    return tuple(row.get(column) for column in REVIEW_COLUMNS)
+
+
+class ReviewSink:
+    """
+    Buffered async writer for ios_review_data shared by all review coroutines.
+
+    Reviews are buffered and flushed as multi-row parameter-bound inserts
+    when `flush_rows` rows are waiting or `flush_interval` seconds have
+    passed since the last flush. Flushes run in the background; once
+    `max_pending` flushes are in flight, `put` waits, so fetchers cannot
+    outrun the database indefinitely.
+
+        async with ReviewSink() as sink:
+            await sink.put(items)
+    """
+
+    def __init__(self, client=None, flush_rows=FLUSH_ROWS, flush_interval=FLUSH_INTERVAL_SECS,
+                 max_pending=MAX_PENDING_FLUSHES):
+        self.client = client
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.rows_in = 0
+        self.rows_sent = 0
+        self.rows_failed = 0
+        self._owns_client = client is None
+        self._buffer = []
+        self._seen = set()
+        self._last_flush = time.monotonic()
+        self._pending = set()
+        self._slots = asyncio.Semaphore(max_pending)
+        self._timer = None
+
+    async def __aenter__(self):
+        if self._owns_client:
+            self.client = await AsyncD1Client().__aenter__()
+        await asyncio.to_thread(create_table_if_not_exists)
+        self._timer = asyncio.create_task(self._flush_periodically())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+        return False
+
+    async def put(self, items):
+        """Queue review dicts (appid, appname, country, keyword, score, userName, date, review)."""
+        for item in items:
+            row = review_row(item)
+            if row[0] in self._seen:
+                continue
+            self._seen.add(row[0])
+            self._buffer.append(row)
+            self.rows_in += 1
+        METRICS.gauge('queue_depth', len(self._buffer), queue='review_sink.buffer')
+        if len(self._buffer) >= self.flush_rows:
+            await self.flush()
+
+    async def flush(self):
+        """Hand the current buffer to a background insert."""
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        rows, self._buffer = self._buffer, []
+        await self._slots.acquire()
+        task = asyncio.create_task(self._send(rows))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        METRICS.gauge('queue_depth', len(self._pending), queue='review_sink.flushes')
+
+    async def _send(self, rows):
+        try:
+            statements = await self.client.insert_rows(REVIEW_TABLE, REVIEW_COLUMNS, rows)
+            self.rows_sent += len(rows)
+            log.throttled('reviews inserted', interval=30, rows=len(rows), statements=statements,
+                          total=self.rows_sent)
+        except D1Error as e:
+            self.rows_failed += len(rows)
+            log.error('failed to insert reviews', rows=len(rows), error=e)
+        finally:
+            self._slots.release()
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval / 2)
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                await self.flush()
+
+    async def close(self):
+        """Flush what is left and wait for every pending insert."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        await self.flush()
+        if self._pending:
+            await asyncio.gather(*self._pending)
+        if self._owns_client and self.client is not None:
+            await self.client.__aexit__(None, None, None)
+            self.client = None
+        log.info('review sink closed', sent=self.rows_sent, failed=self.rows_failed, reviews=self.rows_in)
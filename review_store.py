@@ -0,0 +1,538 @@
+import json
+import math
+import os
+import threading
+import uuid
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Local columnar review dataset shared by every fetcher.
+# Layout: {root}/platform=ios/country=us/appid=123/month=2024-05/part-*.parquet
+REVIEW_STORE_DIR = os.getenv('REVIEW_STORE_DIR', './data/reviews')
+PARTITION_COLUMNS = ['platform', 'country', 'appid', 'month']
+PARTITIONING = ds.partitioning(
+    pa.schema([(name, pa.string()) for name in PARTITION_COLUMNS]),
+    flavor='hive',
+)
+
+# Column types shared by every part file. Any other column is stored as text
+# (or as a timestamp when it is the write's date column) and recorded in
+# SCHEMA_FILE, so the dataset can be opened without reading part footers.
+REVIEW_FIELDS = [
+    ('id', pa.string()),
+    ('appname', pa.string()),
+    ('keyword', pa.string()),
+    ('title', pa.string()),
+    ('review', pa.string()),
+    ('content', pa.string()),
+    ('userName', pa.string()),
+    ('date', pa.timestamp('us')),
+    ('updated', pa.timestamp('us')),
+    ('at', pa.timestamp('us')),
+    ('score', pa.float64()),
+    ('rating', pa.float64()),
+    ('thumbsUpCount', pa.int64()),
+    ('isEdited', pa.bool_()),
+]
+REVIEW_SCHEMA = pa.schema(REVIEW_FIELDS)
+# Dataset discovery skips files starting with '_'
+SCHEMA_FILE = '_columns.json'
+EXTRA_TYPES = {'string': pa.string(), 'timestamp': pa.timestamp('us')}
+_schema_lock = threading.Lock()
+
+# Date formats produced by the different fetchers, tried in order
+DATE_FORMATS = ('%Y-%m-%d-%H-%M-%S', '%Y-%m-%dT%H:%M:%S%z', '%Y-%m-%dT%H:%M:%SZ', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d')
+
+
+def to_datetime(value):
+    """Parse the date representations our fetchers emit into a datetime (or None)."""
+    if value is None or isinstance(value, datetime):
+        return value
+    if hasattr(value, 'to_pydatetime'):
+        return value.to_pydatetime()
+    text = str(value).strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return None
+
+
+def _app_key(value):
+    # 'id123' (as found in store URLs) and '123' name the same app
+    text = str(value).strip() if value is not None else ''
+    return text[2:] if text.startswith('id') and text[2:].isdigit() else text
+
+
+def _month_of(value):
+    return value.strftime('%Y-%m') if value else 'unknown'
+
+
+def _partition_value(value):
+    text = str(value).strip() if value is not None else ''
+    # Partition values become directory names
+    return text.replace('/', '_').replace('=', '_') or 'unknown'
+
+
+def unify_schemas(schemas):
+    """
+    Merge part-file schemas; a field whose types cannot be promoted to a
+    common type is read back as string.
+    """
+    fields = {}
+    for schema in schemas:
+        for field in schema:
+            current = fields.get(field.name)
+            if current is None or current.type == field.type:
+                fields[field.name] = field
+                continue
+            try:
+                merged = pa.unify_schemas([pa.schema([current]), pa.schema([field])], promote_options='permissive')
+                fields[field.name] = merged.field(field.name)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                fields[field.name] = pa.field(field.name, pa.string())
+    return pa.schema(list(fields.values()))
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def coerce_value(value, type):
+    """Convert one value to `type`; None when it cannot be represented."""
+    if _is_missing(value):
+        return None
+    try:
+        if pa.types.is_string(type):
+            if isinstance(value, (dict, list)):
+                return json.dumps(value, ensure_ascii=False, default=str)
+            if isinstance(value, datetime):
+                return value.isoformat()
+            return str(value)
+        if pa.types.is_timestamp(type):
+            return to_datetime(value)
+        if pa.types.is_floating(type):
+            return float(value)
+        if pa.types.is_integer(type):
+            return int(float(value))
+        if pa.types.is_boolean(type):
+            if isinstance(value, str):
+                return value.strip().lower() in ('true', '1', 'yes')
+            return bool(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    return value
+
+
+def coerce_column(values, type):
+    """Build a `type` array from row values, converting value by value if Arrow won't."""
+    try:
+        return pa.array(values, type=type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, ValueError, OverflowError):
+        return pa.array([coerce_value(v, type) for v in values], type=type)
+
+
+def _to_records(rows):
+    if hasattr(rows, 'to_dict'):
+        return rows.to_dict(orient='records')
+    return list(rows)
+
+
+class ReviewStore:
+    """
+    Append-friendly Parquet review dataset partitioned by platform, country,
+    app id and month.
+
+    Every write adds new part files, so concurrent fetchers never rewrite each
+    other's data; `compact` later merges the small parts of a partition.
+    """
+
+    def __init__(self, root=REVIEW_STORE_DIR):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def _partition_dir(self, key):
+        parts = [f"{name}={value}" for name, value in zip(PARTITION_COLUMNS, key)]
+        return os.path.join(self.root, *parts)
+
+    def write(self, rows, platform, country=None, appid=None, date_column='date'):
+        """
+        Append review rows (list of dicts or DataFrame) to the dataset.
+
+        `country` and `appid` default to the per-row values when not given.
+        `date_column` is parsed to a timestamp and decides the month partition.
+        Returns the number of rows written.
+        """
+        groups = {}
+        for row in _to_records(rows):
+            row = dict(row)
+            if date_column in row:
+                row[date_column] = to_datetime(row[date_column])
+            key = (
+                _partition_value(platform),
+                _partition_value(country if country is not None else row.get('country')),
+                _partition_value(_app_key(appid if appid is not None else row.get('appid', row.get('app_id')))),
+                _month_of(row.get(date_column)),
+            )
+            for name in PARTITION_COLUMNS:
+                row.pop(name, None)
+            groups.setdefault(key, []).append(row)
+
+        names = {}
+        for group in groups.values():
+            for row in group:
+                names.update(dict.fromkeys(row))
+        schema = self._register_columns(
+            {name: 'timestamp' if name == date_column else 'string' for name in names})
+
+        written = 0
+        for key, group in groups.items():
+            table = self._to_table(group, schema)
+            self._write_part(key, table)
+            written += table.num_rows
+        return written
+
+    @staticmethod
+    def _to_table(records, schema):
+        names = list(dict.fromkeys(name for record in records for name in record))
+        fields = [schema.field(name) for name in names]
+        arrays = [coerce_column([record.get(field.name) for record in records], field.type) for field in fields]
+        return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+    @staticmethod
+    def _conform(table, schema):
+        # Cast a part file read back from disk to the store schema
+        arrays = []
+        fields = []
+        for name in table.column_names:
+            index = schema.get_field_index(name)
+            field = schema.field(index) if index >= 0 else pa.field(name, pa.string())
+            fields.append(field)
+            column = table.column(name)
+            if column.type != field.type:
+                try:
+                    column = column.cast(field.type)
+                except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError):
+                    column = coerce_column(column.to_pylist(), field.type)
+            arrays.append(column)
+        return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+    def _schema_path(self):
+        return os.path.join(self.root, SCHEMA_FILE)
+
+    def _load_columns(self):
+        """Extra column name -> 'string' | 'timestamp', as recorded in SCHEMA_FILE."""
+        try:
+            with open(self._schema_path(), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return self._legacy_columns()
+
+    def _legacy_columns(self):
+        # Stores written before SCHEMA_FILE existed: read the footers once
+        columns = {}
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if not name.endswith('.parquet'):
+                    continue
+                for field in pq.read_schema(os.path.join(dirpath, name)):
+                    if field.name in REVIEW_SCHEMA.names or field.name in PARTITION_COLUMNS:
+                        continue
+                    if pa.types.is_timestamp(field.type) or pa.types.is_date(field.type):
+                        columns.setdefault(field.name, 'timestamp')
+                    else:
+                        columns[field.name] = 'string'
+        self._save_columns(columns)
+        return columns
+
+    def _save_columns(self, columns):
+        path = self._schema_path()
+        tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(columns, f, indent=2, sort_keys=True)
+        os.replace(tmp, path)
+
+    def _register_columns(self, columns):
+        """Record columns not in REVIEW_SCHEMA (first type wins) and return the store schema."""
+        with _schema_lock:
+            known = self._load_columns()
+            added = {name: kind for name, kind in columns.items()
+                     if name not in known and name not in REVIEW_SCHEMA.names and name not in PARTITION_COLUMNS}
+            if added:
+                known.update(added)
+                self._save_columns(known)
+        return self._schema(known)
+
+    @staticmethod
+    def _schema(columns):
+        extra = [pa.field(name, EXTRA_TYPES[kind]) for name, kind in sorted(columns.items())]
+        return pa.schema(list(REVIEW_SCHEMA) + extra)
+
+    def schema(self):
+        """Store schema: REVIEW_SCHEMA, the recorded extra columns and the partition columns."""
+        with _schema_lock:
+            columns = self._load_columns()
+        return pa.schema(list(self._schema(columns)) + list(PARTITIONING.schema))
+
+    def _write_part(self, key, table, prefix='part'):
+        directory = self._partition_dir(key)
+        os.makedirs(directory, exist_ok=True)
+        name = f"{prefix}-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}.parquet"
+        path = os.path.join(directory, name)
+        pq.write_table(table, path, compression='zstd')
+        return path
+
+    def partitions(self):
+        """List partition keys (platform, country, appid, month) present on disk."""
+        keys = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            if any(f.endswith('.parquet') for f in filenames):
+                rel = os.path.relpath(dirpath, self.root).split(os.sep)
+                if len(rel) == len(PARTITION_COLUMNS):
+                    keys.append(tuple(part.split('=', 1)[1] for part in rel))
+        return keys
+
+    def compact(self, min_files=2, dedupe_on='id', **partition_filter):
+        """
+        Merge the part files of each partition into a single file.
+
+        Only partitions matching `partition_filter` (e.g. appid='123') with at
+        least `min_files` parts are rewritten. Rows sharing the same
+        `dedupe_on` value are kept once. Returns the number of partitions
+        compacted.
+        """
+        compacted = 0
+        for key in self.partitions():
+            values = dict(zip(PARTITION_COLUMNS, key))
+            if any(values.get(name) != str(value) for name, value in partition_filter.items()):
+                continue
+            directory = self._partition_dir(key)
+            files = sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.endswith('.parquet'))
+            if len(files) < min_files:
+                continue
+            schema = self.schema()
+            table = pa.concat_tables(
+                [self._conform(pq.read_table(f), schema) for f in files],
+                promote_options='permissive',
+            )
+            if dedupe_on and dedupe_on in table.column_names:
+                table = self._dedupe(table, dedupe_on)
+            # Write the merged file first so a crash never loses data
+            self._write_part(key, table, prefix='compacted')
+            for f in files:
+                os.remove(f)
+            compacted += 1
+        return compacted
+
+    @staticmethod
+    def _dedupe(table, column):
+        ids = table.column(column).to_pylist()
+        seen = set()
+        keep = []
+        for index, value in enumerate(ids):
+            if value in seen:
+                continue
+            seen.add(value)
+            keep.append(index)
+        return table.take(pa.array(keep, type=pa.int64()))
+
+    def dataset(self):
+        """Open the store as a pyarrow dataset with the store schema; part files are cast while scanning."""
+        return ds.dataset(self.root, format='parquet', partitioning=PARTITIONING, schema=self.schema())
+
+    def read(self, columns=None, filters=None):
+        """
+        Read a pyarrow Table with column projection and predicate pushdown.
+
+        `filters` is either a pyarrow.compute expression or a dict of
+        column -> value / list of values; partition columns in it prune
+        whole directories before any file is opened.
+        """
+        return self.dataset().to_table(columns=columns, filter=build_filter(filters))
+
+    def to_pandas(self, columns=None, filters=None):
+        return self.read(columns=columns, filters=filters).to_pandas()
+
+
+def build_filter(filters):
+    """Turn a {column: value or [values]} dict into a dataset filter expression."""
+    if filters is None or isinstance(filters, pc.Expression):
+        return filters
+    expression = None
+    for name, value in filters.items():
+        if name in PARTITION_COLUMNS:
+            normalize = _app_key if name == 'appid' else str
+            value = [normalize(v) for v in value] if isinstance(value, (list, tuple, set)) else normalize(value)
+        if isinstance(value, (list, tuple, set)):
+            condition = ds.field(name).isin(list(value))
+        else:
+            condition = ds.field(name) == value
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def flatten_record(record, prefix=''):
+    """Flatten nested dicts with dotted keys, the way pd.json_normalize names columns."""
+    flat = {}
+    for key, value in record.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten_record(value, prefix=f"{name}."))
+        else:
+            flat[name] = value
+    return flat
+
+
+class StreamingReviewCollector:
+    """
+    Accumulate page records in per-column buffers and flush them to Parquet
+    row groups once `row_group_size` rows are buffered.
+
+    Memory stays bounded by one row group no matter how many pages an app
+    has. `close()` returns a ReviewHandle over what was written. If a later
+    page brings new columns or incompatible types, the collector starts a new
+    segment file rather than rewriting earlier ones.
+    """
+
+    def __init__(self, path, row_group_size=10000, flatten=True):
+        self.path = str(path)
+        self.row_group_size = row_group_size
+        self.flatten = flatten
+        self.num_rows = 0
+        self._columns = {}
+        self._buffered = 0
+        self._writer = None
+        self._segments = []
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self):
+        # Rows seen so far, written or still buffered
+        return self.num_rows + self._buffered
+
+    def add(self, records):
+        """Buffer a page of records (dicts); flushes whenever a row group fills up."""
+        for record in records:
+            if self.flatten:
+                record = flatten_record(record)
+            for key in record.keys() - self._columns.keys():
+                self._columns[key] = [None] * self._buffered
+            for key, column in self._columns.items():
+                column.append(record.get(key))
+            self._buffered += 1
+            if self._buffered >= self.row_group_size:
+                self.flush()
+
+    def flush(self):
+        if not self._buffered:
+            return
+        table = self._build_table()
+        if self._writer is not None:
+            conformed = self._conform(table, self._writer.schema)
+            if conformed is None:
+                self._close_writer()
+            else:
+                table = conformed
+        if self._writer is None:
+            self._open_writer(table.schema)
+        self._writer.write_table(table)
+        self.num_rows += table.num_rows
+        self._columns = {key: [] for key in self._columns}
+        self._buffered = 0
+
+    def _build_table(self):
+        arrays = {}
+        for key, values in self._columns.items():
+            try:
+                arrays[key] = pa.array(values)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+                # Mixed types within one column: keep them as text
+                arrays[key] = pa.array([None if v is None else str(v) for v in values], type=pa.string())
+        return pa.table(arrays)
+
+    @staticmethod
+    def _conform(table, schema):
+        # Fit a row group to the schema of the open file, or None if it can't
+        if set(table.column_names) - set(schema.names):
+            return None
+        arrays = []
+        for field in schema:
+            if field.name in table.column_names:
+                column = table.column(field.name)
+                if column.type != field.type:
+                    try:
+                        column = column.cast(field.type)
+                    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                        return None
+                arrays.append(column)
+            else:
+                arrays.append(pa.nulls(table.num_rows, type=field.type))
+        return pa.Table.from_arrays(arrays, schema=schema)
+
+    def _open_writer(self, schema):
+        path = self.path
+        if self._segments:
+            root, ext = os.path.splitext(self.path)
+            path = f"{root}-{len(self._segments):04d}{ext or '.parquet'}"
+        self._writer = pq.ParquetWriter(path, schema, compression='zstd')
+        self._segments.append(path)
+
+    def _close_writer(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def close(self):
+        """Flush what is left and return a lazy handle over the written file(s)."""
+        self.flush()
+        self._close_writer()
+        return ReviewHandle(self._segments)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+        self._close_writer()
+
+
+class ReviewHandle:
+    """Lazy reference to collected reviews on disk; nothing is loaded until asked."""
+
+    def __init__(self, paths):
+        self.paths = list(paths)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(paths={self.paths!r}, num_rows={self.num_rows})"
+
+    @property
+    def num_rows(self):
+        return sum(pq.ParquetFile(path).metadata.num_rows for path in self.paths)
+
+    def dataset(self):
+        schemas = [pq.read_schema(path) for path in self.paths]
+        schema = unify_schemas(schemas)
+        return ds.dataset(self.paths, format='parquet', schema=schema)
+
+    def to_table(self, columns=None, filters=None):
+        return self.dataset().to_table(columns=columns, filter=build_filter(filters))
+
+    def to_pandas(self, columns=None, filters=None):
+        return self.to_table(columns=columns, filters=filters).to_pandas()
+
+    def iter_batches(self, batch_size=10000, columns=None):
+        """Yield pandas DataFrames of at most `batch_size` rows."""
+        if not self.paths:
+            return
+        for batch in self.dataset().to_batches(columns=columns, batch_size=batch_size):
+            if batch.num_rows:
+                yield batch.to_pandas()
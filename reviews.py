@@ -1,4 +1,4 @@
-from google_play_scraper import Sort, reviews_all
+import asyncio
 from app_store_scraper import AppStore
 from google_play_scraper import app
 import csv
@@ -10,26 +10,35 @@ from urllib.parse import urlencode, quote_plus,quote
 # from apicall import get_token,fetch_reviews
 from fetch_token import fetch_media_api_token
 from fetch_reviews import App_Store_Scraper
+from text_normalizer import normalize_text
+from review_store import ReviewStore, StreamingReviewCollector
+from play_reviews import harvest_play_reviews, SORT_MOST_RELEVANT
+from log_utils import get_logger
 RESULT_FOLDER = "./result"
 OUTPUT_DIR = Path("data")
 os.makedirs(RESULT_FOLDER, exist_ok=True)
 
-googlerows = []
+log = get_logger('reviews')
+
 def play_store_scraper(package,country='us',lang='en'):
+    """
+    Harvest all Google Play reviews of one app into the review store and a CSV.
+
+    Pages are appended to the CSV as they arrive, so nothing accumulates in a
+    module-level list between calls.
+    """
+    csv_path = f"./{RESULT_FOLDER}/"+package+'-'+lang+'-'+country+'-'+"google-app-review.csv"
+    if os.path.exists(csv_path):
+        os.remove(csv_path)
+
+    def append_csv(rows):
+        pd.DataFrame(rows).to_csv(csv_path, mode='a', header=not os.path.exists(csv_path), index=False, encoding='utf-8')
+
     try:
-        results = reviews_all(package,sleep_milliseconds=0,lang='en',country=country,sort=Sort.MOST_RELEVANT)
-    
-    
-        # Adds the fields to the CSV
-        for x, item in enumerate(results):
-            googlerows.append(item)
-    
-        
-    
-        df = pd.DataFrame(googlerows)
-        df.to_csv(f"./{RESULT_FOLDER}/"+package+'-'+lang+'-'+country+'-'+"google-app-review.csv", index=False,encoding = 'utf-8'
-    )
-    except:
+        counts = asyncio.run(harvest_play_reviews([(package, lang, country)], sort=SORT_MOST_RELEVANT, on_rows=append_csv))
+        return counts.get((package, lang, country))
+    except Exception as e:
+        print(f"Failed to harvest Google Play reviews for {package}: {e}")
         return None
 applerows = []
 import random
@@ -90,8 +99,7 @@ def fetch_reviews(country: str,
     ## Define request headers and params ------------------------------------
     landing_url = f'https://apps.apple.com/{country}/app/{app_name}/id{app_id}'
     request_url = f'https://amp-api.apps.apple.com/v1/catalog/{country}/apps/{app_id}/reviews'
-    print('landing_url',landing_url)
-    print('request_url',request_url)
+    log.debug('fetching review page', landing_url=landing_url, request_url=request_url, offset=offset)
                       
     MAX_RETURN_LIMIT = '20'
 
@@ -165,10 +173,10 @@ def fetch_reviews(country: str,
     if 'next' in result and result.get('next') is not None:
         offset_pattern = re.compile(r"^.+offset=([0-9]+).*$")
         offset = re.search(offset_pattern, result.get('next')).group(1)
-        print(f"Offset: {offset}")
+        log.debug('next review page', app_id=app_id, offset=offset)
     else:
         offset = None
-        print("No offset found.")
+        log.debug('no more review pages', app_id=app_id)
 
     # Append offset, number of reviews in batch, and app_id
     for rev in reviews:
@@ -184,9 +192,20 @@ def fetch_multiple_reviews(country: str,
                            app_name: str,
                            app_id: str,
                            user_agents: list,
-                           token: str
-                           ) -> pd.DataFrame:
-    data = pd.DataFrame()
+                           token: str,
+                           path=None,
+                           row_group_size: int = 10000
+                           ):
+    """
+    Crawl every review page of an app into a Parquet file.
+
+    Pages go into a StreamingReviewCollector, which keeps at most one row
+    group in memory. The return value is a lazy ReviewHandle, not a DataFrame.
+    """
+    if path is None:
+        current_date = datetime.datetime.now().strftime("%Y_%m_%d_%H_%M_%S")
+        path = OUTPUT_DIR / f"{current_date}_{app_id}_{country}_reviews.parquet"
+    collector = StreamingReviewCollector(path, row_group_size=row_group_size)
     offset = '1'
     while offset is not None:
         reviews, offset, _ = fetch_reviews(country=country,
@@ -196,10 +215,25 @@ def fetch_multiple_reviews(country: str,
                                            token=token,
                                            offset=offset
                                            )
-        data = pd.concat([data, pd.json_normalize(reviews)])
-        print(f"Data shape: {data.shape}")
+        collector.add(reviews)
+        log.sampled('review rows collected', every=50, key=f'rows {app_id}', app_id=app_id, rows=len(collector))
+
+    return collector.close()
+
 
-    return data
+# Flattened amp-api review columns (see StreamingReviewCollector), in CSV order
+REVIEW_COLUMNS = [
+    'id', 'type', 'attributes.date', 'attributes.review', 'attributes.rating', 'attributes.isEdited',
+    'attributes.userName', 'attributes.title', 'attributes.developerResponse.id',
+    'attributes.developerResponse.body', 'attributes.developerResponse.modified', 'app_id', 'app_name',
+]
+
+
+def csv_columns(columns_naming, columns_to_drop):
+    """Fixed CSV header: REVIEW_COLUMNS (renamed) minus dropped columns, plus any other renamed targets."""
+    columns = [columns_naming.get(c, c) for c in REVIEW_COLUMNS if c not in columns_to_drop]
+    columns += [c for c in columns_naming.values() if c not in columns]
+    return columns
 
 
 def start_fetching(app_list,
@@ -208,9 +242,14 @@ def start_fetching(app_list,
                    columns_naming,
                    columns_to_drop
                    ):
-    df = pd.DataFrame()
+    store = ReviewStore()
 
     current_date = datetime.datetime.now().strftime("%Y_%m_%d_%H_%M_%S")
+    master_path = f"../data/{current_date}_all_reviews.csv"
+    master_header = True
+    # Every batch is written with the same columns in the same order, so
+    # batches missing a column (e.g. no developer responses) stay aligned
+    columns = csv_columns(columns_naming, columns_to_drop)
 
     for app in app_list:
         app_name = app.get("app_name")
@@ -220,22 +259,27 @@ def start_fetching(app_list,
                           app_name=app_name,
                           app_id=app.get("app_id"),
                           user_agents=user_agents)
-        df_app_reviews = fetch_multiple_reviews(country=country,
-                                                app_name=app_name,
-                                                app_id=app.get("app_id"),
-                                                user_agents=user_agents,
-                                                token=token)
-
-        df_app_reviews = df_app_reviews.drop(columns=columns_to_drop, errors='ignore')
-        df_app_reviews = df_app_reviews.rename(columns=columns_naming, errors='ignore')
+        handle = fetch_multiple_reviews(country=country,
+                                        app_name=app_name,
+                                        app_id=app.get("app_id"),
+                                        user_agents=user_agents,
+                                        token=token)
+
+        # Stream the app's reviews batch by batch into its CSV, the master CSV
+        # and the review store instead of concatenating frames in memory
         path = f"../data/{current_date}_{app_name}_reviews.csv"
-        df_app_reviews.to_csv(path, index=False, sep=";", encoding="utf-8")
+        app_header = True
+        for df_app_reviews in handle.iter_batches():
+            df_app_reviews = df_app_reviews.drop(columns=columns_to_drop, errors='ignore')
+            df_app_reviews = df_app_reviews.rename(columns=columns_naming, errors='ignore')
+            df_csv = df_app_reviews.reindex(columns=columns)
+            df_csv.to_csv(path, index=False, sep=";", encoding="utf-8", mode='w' if app_header else 'a', header=app_header)
+            df_csv.to_csv(master_path, index=False, sep=";", encoding="utf-8", mode='w' if master_header else 'a', header=master_header)
+            app_header = master_header = False
+            store.write(df_app_reviews, platform='ios', country=country, appid=app.get("app_id"),
+                        date_column=columns_naming.get('attributes.date', 'attributes.date'))
         print(f"Saved '{app_name}' data to '{path}'.")
 
-        df = pd.concat([df, df_app_reviews])
-
-    master_path = f"../data/{current_date}_all_reviews.csv"
-    df.to_csv(master_path, index=False, sep=";", encoding="utf-8")
     print(f"Saved all apps data to '{master_path}'.")
 def start_app_store_scraper(url,country='us',lang='en'):
     appname, country = url.split('/')[-2], url.split('/')[-4]
@@ -268,12 +312,13 @@ def start_app_store_scraper(url,country='us',lang='en'):
         data={}
         data['score']= review['rating']
         data['userName']= review['userName']
-        data['review']= review['review'].replace('\r',' ').replace('\n',' ')
+        data['review']= normalize_text(review['review'])
         
         applerows.append(data)
     df = pd.DataFrame(applerows)
     df.to_csv(f"./{RESULT_FOLDER}/"+app_name+'-'+country+'-'+"apple-app-review.csv", index=False,encoding = 'utf-8'
 )
+    ReviewStore().write(all_reviews, platform='ios', country=country, appid=app_id)
 
     # return "https://itunes.apple.com/%s/rss/customerreviews/id=%s/sortBy=mostRecent/json" % (country_code, app_id)    
 
@@ -1,18 +1,24 @@
 import requests
 import os
 import time
-import hashlib
+from datetime import datetime
 from dotenv import load_dotenv
+from d1_client import D1_MAX_BOUND_PARAMS
+from instrumentation import METRICS
+from log_utils import get_logger
 
 # Load environment variables
 load_dotenv()
 
+log = get_logger('saveTop100rank')
+
 D1_DATABASE_ID = os.getenv('CLOUDFLARE_D1_DATABASE_ID')
 CLOUDFLARE_ACCOUNT_ID = os.getenv('CLOUDFLARE_ACCOUNT_ID')
 CLOUDFLARE_API_TOKEN = os.getenv('CLOUDFLARE_API_TOKEN')
 
 # Constants
-CLOUDFLARE_BASE_URL = f"https://api.cloudflare.com/client/v4/accounts/{CLOUDFLARE_ACCOUNT_ID}/d1/database/{D1_DATABASE_ID}"
+CLOUDFLARE_API_BASE_URL = os.getenv('CLOUDFLARE_API_BASE_URL', 'https://api.cloudflare.com/client/v4')
+CLOUDFLARE_BASE_URL = f"{CLOUDFLARE_API_BASE_URL}/accounts/{CLOUDFLARE_ACCOUNT_ID}/d1/database/{D1_DATABASE_ID}"
 
 # Escape special characters for safe SQL insertion
 def escape_sql(value):
@@ -20,21 +26,21 @@ def escape_sql(value):
         return value.replace("'", "''")
     return value
 
-# Compute a hash for a row to avoid duplicates
-def compute_row_hash(row):
-    hash_input = f"{row['cid']}{row['rank']}{row['updateAt']}"
-    return hashlib.sha256(hash_input.encode('utf-8')).hexdigest()
-
 # Retry mechanism for API requests
 def send_request_with_retries(url, headers, payload, retries=3, delay=2):
     for attempt in range(retries):
         try:
-            response = requests.post(url, headers=headers, json=payload)
+            with METRICS.stage('d1.query'):
+                response = requests.post(url, headers=headers, json=payload)
+            METRICS.record_response('d1', response.status_code)
             response.raise_for_status()
             return response
         except requests.RequestException as e:
+            if e.response is None:
+                METRICS.record_response('d1', 'error')
             print(f"[ERROR] Attempt {attempt + 1} failed: {e}")
             if attempt < retries - 1:
+                METRICS.record_retry('d1')
                 print(f"[INFO] Retrying in {delay} seconds...")
                 time.sleep(delay)
             else:
@@ -102,14 +108,215 @@ def insert_into_top100rank(data, batch_size=50):
         except requests.RequestException as e:
             print(f"[ERROR] Failed to insert batch {i // batch_size + 1}: {e}")
 
+# Compact layout: every app and every chart is stored once, each daily rank
+# is four small integers. ios_top100_rank_view rebuilds the old wide rows.
+COMPACT_SCHEMA_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS rank_app (
+        app_key INTEGER PRIMARY KEY,
+        appid TEXT NOT NULL UNIQUE,
+        appname TEXT,
+        title TEXT,
+        icon TEXT,
+        link TEXT
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rank_chart (
+        chart_id INTEGER PRIMARY KEY,
+        platform TEXT NOT NULL,
+        country TEXT NOT NULL,
+        type TEXT NOT NULL,
+        cid TEXT NOT NULL,
+        cname TEXT,
+        UNIQUE (platform, country, type, cid)
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rank_fact (
+        day INTEGER NOT NULL,
+        chart_id INTEGER NOT NULL,
+        rank INTEGER NOT NULL,
+        app_key INTEGER NOT NULL,
+        PRIMARY KEY (chart_id, day, rank)
+    ) WITHOUT ROWID;
+    """,
+    "CREATE INDEX IF NOT EXISTS rank_fact_app_day ON rank_fact (app_key, day);",
+    # Date-window reads (the weekly/monthly report) seek on day
+    "CREATE INDEX IF NOT EXISTS rank_fact_day ON rank_fact (day);",
+    # Recreated so databases with the older view (no day column) pick it up
+    "DROP VIEW IF EXISTS ios_top100_rank_view;",
+    # Filter on day (indexed) rather than the computed updateAt text
+    """
+    CREATE VIEW ios_top100_rank_view AS
+    SELECT c.platform, c.type, c.cid, c.cname, f.rank, a.appid, a.appname, a.icon, a.link, a.title,
+           strftime('%Y-%m-%dT%H:%M:%S', f.day * 86400, 'unixepoch') AS updateAt, c.country, f.day
+    FROM rank_fact f
+    JOIN rank_chart c ON c.chart_id = f.chart_id
+    JOIN rank_app a ON a.app_key = f.app_key;
+    """,
+]
+
+# Legacy updateAt text -> days since 1970-01-01
+LEGACY_DAY_SQL = "CAST(julianday(substr(updateAt, 1, 10)) - 2440587.5 AS INTEGER)"
+
+MIGRATION_SQL = [
+    """
+    INSERT INTO rank_app (appid, appname, title, icon, link)
+    SELECT appid, appname, title, icon, link FROM ios_top100_rank_data
+    WHERE appid IS NOT NULL
+    GROUP BY appid
+    ON CONFLICT (appid) DO NOTHING;
+    """,
+    """
+    INSERT INTO rank_chart (platform, country, type, cid, cname)
+    SELECT platform, country, type, cid, MAX(cname) FROM ios_top100_rank_data
+    WHERE platform IS NOT NULL AND country IS NOT NULL AND type IS NOT NULL AND cid IS NOT NULL
+    GROUP BY platform, country, type, cid
+    ON CONFLICT (platform, country, type, cid) DO NOTHING;
+    """,
+    f"""
+    INSERT OR REPLACE INTO rank_fact (day, chart_id, rank, app_key)
+    SELECT {LEGACY_DAY_SQL}, c.chart_id, CAST(d.rank AS INTEGER), a.app_key
+    FROM ios_top100_rank_data d
+    JOIN rank_chart c ON c.platform = d.platform AND c.country = d.country AND c.type = d.type AND c.cid = d.cid
+    JOIN rank_app a ON a.appid = d.appid
+    WHERE d.updateAt IS NOT NULL AND d.rank IS NOT NULL;
+    """,
+]
+
+FACTS_PER_STATEMENT = 1000
+
+
+def _d1_query(sql, params=None):
+    url = f"{CLOUDFLARE_BASE_URL}/query"
+    headers = {
+        "Authorization": f"Bearer {CLOUDFLARE_API_TOKEN}",
+        "Content-Type": "application/json"
+    }
+    payload = {"sql": sql}
+    if params:
+        payload["params"] = params
+    response = send_request_with_retries(url, headers, payload)
+    result = response.json().get('result') or [{}]
+    return result[0].get('results') or []
+
+
+def create_compact_tables():
+    for sql in COMPACT_SCHEMA_SQL:
+        _d1_query(sql)
+    print("[INFO] Compact rank tables checked/created successfully.")
+
+
+def migrate_top100rank_to_compact():
+    """
+    Copy ios_top100_rank_data into rank_app/rank_chart/rank_fact.
+
+    Safe to re-run: dimensions are inserted once and facts are keyed by
+    (chart, day, rank). The legacy table is left in place; drop it once
+    every reader uses ios_top100_rank_view.
+    """
+    create_compact_tables()
+    for sql in MIGRATION_SQL:
+        _d1_query(sql)
+    count = _d1_query("SELECT COUNT(*) AS n FROM rank_fact;")
+    print(f"[INFO] Migration done, rank_fact holds {count[0]['n'] if count else 0} rows.")
+
+
+def day_number(update_at):
+    """Days since 1970-01-01 of an updateAt value ('YYYY-MM-DD...' text or datetime)."""
+    day = datetime.strptime(str(update_at)[:10], '%Y-%m-%d')
+    return (day - datetime(1970, 1, 1)).days
+
+
+def _upsert_rows(sql_prefix, columns, rows, suffix):
+    """Parameter-bound multi-row upsert sized to D1's bound parameter limit."""
+    step = max(1, D1_MAX_BOUND_PARAMS // len(columns))
+    group = '(' + ', '.join(['?'] * len(columns)) + ')'
+    for i in range(0, len(rows), step):
+        chunk = rows[i:i + step]
+        sql = f"{sql_prefix} ({', '.join(columns)}) VALUES {', '.join([group] * len(chunk))} {suffix};"
+        _d1_query(sql, [value for row in chunk for value in row])
+
+
+def _app_keys(appids):
+    keys = {}
+    for i in range(0, len(appids), D1_MAX_BOUND_PARAMS):
+        chunk = appids[i:i + D1_MAX_BOUND_PARAMS]
+        placeholders = ', '.join(['?'] * len(chunk))
+        for row in _d1_query(f"SELECT app_key, appid FROM rank_app WHERE appid IN ({placeholders});", chunk):
+            keys[row['appid']] = row['app_key']
+    return keys
+
+
+def _chart_ids():
+    rows = _d1_query("SELECT chart_id, platform, country, type, cid FROM rank_chart;")
+    return {(r['platform'], r['country'], r['type'], r['cid']): r['chart_id'] for r in rows}
+
+
+def insert_into_top100rank_compact(data):
+    """
+    Store chart rows in the compact layout.
+
+    App and chart dimensions are upserted with bound parameters (app
+    metadata is refreshed to the latest values), then the daily ranks go
+    in as integer-only multi-row statements. A re-run on the same day
+    replaces that day's ranks.
+    """
+    create_compact_tables()
+    if not data:
+        print("[INFO] No rank rows to insert.")
+        return
+
+    apps = {}
+    charts = {}
+    for row in data:
+        apps[row['appid']] = (row['appid'], row.get('appname'), row.get('title'), row.get('icon'), row.get('link'))
+        charts[(row['platform'], row['country'], row['type'], str(row['cid']))] = row.get('cname')
+
+    _upsert_rows("INSERT INTO rank_app", ['appid', 'appname', 'title', 'icon', 'link'], list(apps.values()),
+                 "ON CONFLICT (appid) DO UPDATE SET appname = excluded.appname, title = excluded.title, "
+                 "icon = excluded.icon, link = excluded.link")
+    _upsert_rows("INSERT INTO rank_chart", ['platform', 'country', 'type', 'cid', 'cname'],
+                 [key + (cname,) for key, cname in charts.items()],
+                 "ON CONFLICT (platform, country, type, cid) DO NOTHING")
+
+    app_keys = _app_keys(list(apps))
+    chart_ids = _chart_ids()
+    facts = []
+    for row in data:
+        chart_id = chart_ids.get((row['platform'], row['country'], row['type'], str(row['cid'])))
+        app_key = app_keys.get(row['appid'])
+        if chart_id is None or app_key is None:
+            continue
+        facts.append(f"({day_number(row['updateAt'])}, {int(chart_id)}, {int(row['rank'])}, {int(app_key)})")
+
+    # Only integers we produced ourselves, so they can go into the SQL text
+    # and a statement is not limited to 25 rows by the parameter cap
+    for i in range(0, len(facts), FACTS_PER_STATEMENT):
+        chunk = facts[i:i + FACTS_PER_STATEMENT]
+        try:
+            _d1_query(f"INSERT OR REPLACE INTO rank_fact (day, chart_id, rank, app_key) VALUES {', '.join(chunk)};")
+            METRICS.inc('d1_rows_total', len(chunk), table='rank_fact', outcome='written')
+            log.debug('rank batch inserted', batch=i // FACTS_PER_STATEMENT + 1, rows=len(chunk))
+        except requests.RequestException as e:
+            METRICS.inc('d1_rows_total', len(chunk), table='rank_fact', outcome='failed')
+            print(f"[ERROR] Failed to insert rank batch {i // FACTS_PER_STATEMENT + 1}: {e}")
+    log.info('rank facts inserted', rows=len(facts), statements=-(-len(facts) // FACTS_PER_STATEMENT))
+
+
 # Process and insert the data
 def process_ios_top100_rank_data_and_insert(data):
-    for row in data:
-        row['row_hash'] = compute_row_hash(row)
-    insert_into_top100rank(data)
+    insert_into_top100rank_compact(data)
 
 # Example usage
 if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] == ['migrate']:
+        migrate_top100rank_to_compact()
+        sys.exit(0)
+
     # Example data
     sample_data = [
         {
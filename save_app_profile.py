@@ -4,15 +4,20 @@ import hashlib
 import logging
 from dotenv import load_dotenv
 from datetime import datetime
+from instrumentation import METRICS
+from log_utils import get_logger
 
 load_dotenv()
 
+log = get_logger('save_app_profile')
+
 # Constants for D1 Database
 D1_DATABASE_ID = os.getenv("CLOUDFLARE_D1_DATABASE_ID")
 CLOUDFLARE_ACCOUNT_ID = os.getenv('CLOUDFLARE_ACCOUNT_ID')
 CLOUDFLARE_API_TOKEN = os.getenv('CLOUDFLARE_API_TOKEN')
 
-CLOUDFLARE_BASE_URL = f"https://api.cloudflare.com/client/v4/accounts/{CLOUDFLARE_ACCOUNT_ID}/d1/database/{D1_DATABASE_ID}"
+CLOUDFLARE_API_BASE_URL = os.getenv('CLOUDFLARE_API_BASE_URL', 'https://api.cloudflare.com/client/v4')
+CLOUDFLARE_BASE_URL = f"{CLOUDFLARE_API_BASE_URL}/accounts/{CLOUDFLARE_ACCOUNT_ID}/d1/database/{D1_DATABASE_ID}"
 
 # Set up logging configuration
 logging.basicConfig(
@@ -101,10 +106,11 @@ def check_if_url_exists(url_to_check):
         "sql": sql_query
     }
 
-    print('start to check record exist',sql_query)
     try:
         with httpx.Client() as client:
-             response = client.post(query_url, headers=headers, json=payload)
+             with METRICS.stage('d1.query'):
+                 response = client.post(query_url, headers=headers, json=payload)
+             METRICS.record_response('d1', response.status_code)
              response.raise_for_status()
              result = response.json()
              if result and result['result']:
@@ -112,7 +118,7 @@ def check_if_url_exists(url_to_check):
                  if 'results' in first_result and first_result['results']:
                      key_value = list(first_result['results'][0].keys())[0]
                      count=first_result['results'][0][key_value]
-                     print('check record value',count,type(count))
+                     log.debug('url exists check', url=url_to_check, count=count)
                      if int(count)>=1:
                          return True
                  
@@ -178,16 +184,19 @@ def save_initial_app_profile(app_data):
     payload = {
         "sql": sql_query
     }
-    print("Payload:", payload)
-    print("Headers:",headers)
     try:
          with httpx.Client() as client:
-            response = client.post(query_url, headers=headers, json=payload)
+            with METRICS.stage('d1.query'):
+                response = client.post(query_url, headers=headers, json=payload)
+            METRICS.record_response('d1', response.status_code)
             response.raise_for_status()
+            METRICS.inc('d1_rows_total', table='ios_app_profiles', outcome='written')
             logging.info(f"Saved basic app profile for {app_data['appname']} ({app_data['appid']}).")
     except httpx.RequestError as e:
+        METRICS.inc('d1_rows_total', table='ios_app_profiles', outcome='failed')
         logging.error(f"Failed to save basic app profile: {e}\n{response.json()}\n {payload}")
     except Exception as e:
+        METRICS.inc('d1_rows_total', table='ios_app_profiles', outcome='failed')
         logging.error(f"Failed to save basic app profile: {e}\n{response.json()}\n {payload}")
         
 
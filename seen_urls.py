@@ -0,0 +1,128 @@
+import hashlib
+import os
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit
+
+import numpy as np
+
+SEEN_URLS_PATH = os.getenv('SEEN_URLS_PATH', './data/seen_urls.u64')
+INITIAL_SLOTS = 1 << 16
+MAX_LOAD = 0.5
+EMPTY = 0
+
+
+def normalize_url(url):
+    """
+    Canonical form used for seen checks: lower-case scheme and host, no
+    query string or fragment, no trailing slash. Two links to the same app
+    page (tracking parameters, ?l=en, #reviews) normalize to the same text.
+    """
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower() or 'https', parts.netloc.lower(), path, '', ''))
+
+
+def url_key(url):
+    """64-bit key of a normalized URL; 0 is reserved for empty slots."""
+    digest = hashlib.blake2b(normalize_url(url).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') or 1
+
+
+class SeenUrls:
+    """
+    Persistent set of URLs already discovered, as an on-disk hash table.
+
+    Each URL is normalized and hashed to a 64-bit key stored in an
+    open-addressing table (linear probing) memory-mapped from `path`, so
+    membership costs a probe or two regardless of how many URLs are known
+    and nothing has to be loaded up front. The table doubles when it is
+    half full.
+
+        seen = SeenUrls()
+        new_urls = seen.filter_new(urls)
+        ...
+        seen.add_many(new_urls)
+        seen.save()
+    """
+
+    def __init__(self, path=SEEN_URLS_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists() and self.path.stat().st_size:
+            slots = self.path.stat().st_size // 8
+            self._table = np.memmap(self.path, dtype=np.uint64, mode='r+', shape=(slots,))
+            self.count = int(np.count_nonzero(self._table))
+        else:
+            self._table = np.memmap(self.path, dtype=np.uint64, mode='w+', shape=(INITIAL_SLOTS,))
+            self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def _slot(self, key):
+        """Slot holding `key`, or the empty slot where it would go."""
+        mask = len(self._table) - 1
+        slot = key & mask
+        while True:
+            value = int(self._table[slot])
+            if value == EMPTY or value == key:
+                return slot, value == key
+            slot = (slot + 1) & mask
+
+    def _insert(self, key):
+        slot, found = self._slot(key)
+        if found:
+            return False
+        self._table[slot] = key
+        self.count += 1
+        return True
+
+    def _grow(self):
+        keys = self._table[self._table != EMPTY].copy()
+        slots = len(self._table) * 2
+        self._table.flush()
+        del self._table
+        tmp_path = self.path.with_suffix('.tmp')
+        self._table = np.memmap(tmp_path, dtype=np.uint64, mode='w+', shape=(slots,))
+        self.count = 0
+        for key in keys.tolist():
+            self._insert(key)
+        self._table.flush()
+        del self._table
+        os.replace(tmp_path, self.path)
+        self._table = np.memmap(self.path, dtype=np.uint64, mode='r+', shape=(slots,))
+
+    def __contains__(self, url):
+        return self._slot(url_key(url))[1]
+
+    def add(self, url):
+        """Mark `url` seen. Returns True if it was new."""
+        if self.count + 1 > len(self._table) * MAX_LOAD:
+            self._grow()
+        return self._insert(url_key(url))
+
+    def add_many(self, urls):
+        """Mark every URL seen. Returns the ones that were new, in order."""
+        return [url for url in urls if self.add(url)]
+
+    def filter_new(self, urls):
+        """URLs not seen yet (first occurrence of each), without marking them."""
+        keys = set()
+        new = []
+        for url in urls:
+            key = url_key(url)
+            if key in keys or self._slot(key)[1]:
+                continue
+            keys.add(key)
+            new.append(url)
+        return new
+
+    def save(self):
+        self._table.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.save()
+        return False
@@ -1,88 +1,109 @@
 import os
-import re
 from datetime import datetime
-from app_store_scraper import AppStore
-import pandas as pd
-from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
+from instrumentation import METRICS
+from model_registry import get_model, load_pretrained
+from text_normalizer import normalize_text, normalize_series
+
+MODEL_NAME = "distilbert-base-uncased-finetuned-sst-2-english"
+
 
 # Function to clean the review text
 def clean_text(text):
-    # Replace newline characters and strip leading/trailing whitespace
-    text = text.replace("\n", " ").strip()
+    # Fold whitespace/control characters and drop emojis in one pass,
+    # keeping non-ASCII letters so CJK reviews survive cleaning
+    return normalize_text(text, strip_emoji=True)
+
 
-    # Remove non-ASCII characters and emojis
-    text = re.sub(r'[^\x00-\x7F]+', ' ', text)
+def get_sentiment_model(model_name=MODEL_NAME):
+    """
+    Return the (tokenizer, model) pair for sentiment scoring.
 
-    # Replace multiple spaces with a single space
-    text = re.sub(r'\s+', ' ', text)
+    transformers is only imported and the weights only loaded on the first call;
+    later calls reuse the warm pair from the model registry.
+    """
+    def load():
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
 
-    return text
+        tokenizer = load_pretrained(AutoTokenizer, model_name)
+        model = load_pretrained(AutoModelForSequenceClassification, model_name)
+        model.eval()
+        return tokenizer, model
+
+    return get_model(('sentiment', model_name), load)
 
-# Initialize the transformers pipeline for sentiment analysis with truncation and padding
-model_name = "distilbert-base-uncased-finetuned-sst-2-english"
-tokenizer = AutoTokenizer.from_pretrained(model_name)
-model = AutoModelForSequenceClassification.from_pretrained(model_name)
-sentiment_pipeline = pipeline("sentiment-analysis", model=model, tokenizer=tokenizer)
 
 # Define a function to analyze sentiment with explicit truncation and padding
 def analyze_sentiment(text):
     # Ensure text is a string
     if isinstance(text, str):
-        # Tokenize with truncation and padding, ensuring max_length is 512
-        inputs = tokenizer(text, truncation=True, padding='max_length', max_length=512, return_tensors="pt")
-        
-        # Pass the inputs to the model and get the output
-        outputs = model(**inputs)
-        
+        import torch
+
+        tokenizer, model = get_sentiment_model()
+        with METRICS.stage('sentiment.score'):
+            # Tokenize with truncation and padding, ensuring max_length is 512
+            inputs = tokenizer(text, truncation=True, padding='max_length', max_length=512, return_tensors="pt")
+
+            # Pass the inputs to the model and get the output
+            with torch.no_grad():
+                outputs = model(**inputs)
+        METRICS.inc('items_total', stage='sentiment.reviews')
+
         # Extract sentiment
         scores = outputs.logits.softmax(dim=1)
         score = scores.max().item()
         label = 'POSITIVE' if scores.argmax().item() == 1 else 'NEGATIVE'
-        
+
         return score, label
     else:
         return 0, 'Neutral'
 
 
-# Fetch reviews from Apple App Store
-app_name = 'eureka-forbes-aquaguard'
-store_reviews = AppStore(country="in", app_name=app_name, app_id='1463742085')
-store_reviews.review(how_many=5000)
+def main(app_name='eureka-forbes-aquaguard', app_id='1463742085', country='in', how_many=5000):
+    import pandas as pd
+    from app_store_scraper import AppStore
+
+    # Fetch reviews from Apple App Store
+    store_reviews = AppStore(country=country, app_name=app_name, app_id=app_id)
+    store_reviews.review(how_many=how_many)
+
+    # Convert reviews to DataFrame
+    df = pd.DataFrame(store_reviews.reviews)
+
+    # Select necessary columns and rename them
+    mydata = df[['date', 'rating', 'review']]
+    mydata.columns = ['date', 'app_rating', 'review']
 
-# Convert reviews to DataFrame
-df = pd.DataFrame(store_reviews.reviews)
+    # Add a new column 'year' by extracting it from the 'date' column
+    mydata['year'] = pd.to_datetime(mydata['date']).dt.year
 
-# Select necessary columns and rename them
-mydata = df[['date', 'rating', 'review']]
-mydata.columns = ['date', 'app_rating', 'review']
+    # Reorder columns to place 'year' as the first column
+    mydata = mydata[['year', 'date', 'app_rating', 'review']]
 
-# Add a new column 'year' by extracting it from the 'date' column
-mydata['year'] = pd.to_datetime(mydata['date']).dt.year
+    # Format the date from "DD/MM/YY HH:MM" to "DD/MM/YY"
+    mydata['date'] = pd.to_datetime(mydata['date']).dt.strftime('%d/%m/%y')
 
-# Reorder columns to place 'year' as the first column
-mydata = mydata[['year', 'date', 'app_rating', 'review']]
+    # Clean the review text
+    mydata['cleaned_review'] = normalize_series(mydata['review'], strip_emoji=True)
 
-# Format the date from "DD/MM/YY HH:MM" to "DD/MM/YY"
-mydata['date'] = pd.to_datetime(mydata['date']).dt.strftime('%d/%m/%y')
+    # Apply sentiment analysis using the transformers pipeline
+    mydata[['sentiment', 'sentiment_category']] = mydata['cleaned_review'].apply(lambda x: pd.Series(analyze_sentiment(x)))
 
-# Clean the review text
-mydata['cleaned_review'] = mydata['review'].apply(clean_text)
+    # Get the current date and time
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
-# Apply sentiment analysis using the transformers pipeline
-mydata[['sentiment', 'sentiment_category']] = mydata['cleaned_review'].apply(lambda x: pd.Series(analyze_sentiment(x)))
+    # Save the reviews with sentiment analysis to a separate CSV file
+    sentiment_reviews_file_path = os.path.join(os.getcwd(), f'apple_store_reviews_with_sentiment_transformers_{timestamp}.csv')
 
-# Get the current date and time
-timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    mydata.to_csv(sentiment_reviews_file_path, index=False)
+    print(f'Reviews with sentiment analysis saved to {sentiment_reviews_file_path}')
 
-# Save the reviews with sentiment analysis to a separate CSV file
-sentiment_reviews_file_path = os.path.join(os.getcwd(), f'apple_store_reviews_with_sentiment_transformers_{timestamp}.csv')
+    # Display the first 5 and last 5 reviews after sentiment analysis
+    print("First 5 Reviews After Sentiment Analysis:")
+    print(mydata.head(5).to_string(index=False))
 
-mydata.to_csv(sentiment_reviews_file_path, index=False)
-print(f'Reviews with sentiment analysis saved to {sentiment_reviews_file_path}')
+    print("Last 5 Reviews After Sentiment Analysis:")
+    print(mydata.tail(5).to_string(index=False))
 
-# Display the first 5 and last 5 reviews after sentiment analysis
-print("First 5 Reviews After Sentiment Analysis:")
-print(mydata.head(5).to_string(index=False))
 
-print("Last 5 Reviews After Sentiment Analysis:")
-print(mydata.tail(5).to_string(index=False))
+if __name__ == "__main__":
+    main()
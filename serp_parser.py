@@ -0,0 +1,102 @@
+import re
+
+from instrumentation import METRICS
+
+try:
+    from selectolax.parser import HTMLParser
+except ImportError:
+    HTMLParser = None
+
+if HTMLParser is None:
+    from lxml import etree, html as lxml_html
+
+    # Compiled once; no cssselect needed
+    RESULT_XPATH = etree.XPath("//div[contains(concat(' ', normalize-space(@class), ' '), ' g ')]")
+    TITLE_XPATH = etree.XPath("(.//h3)[1]")
+    LINK_XPATH = etree.XPath("(.//a)[1]")
+    STATS_XPATH = etree.XPath("//*[@id='result-stats']")
+
+RESULT_SELECTOR = 'div.g'
+TITLE_SELECTOR = 'h3'
+LINK_SELECTOR = 'a'
+STATS_SELECTOR = '#result-stats'
+
+# The four title markers, tried as one zero-width scan so every start
+# position is checked once. Group order is the marker priority:
+# 《》, "", 【】, [].
+GAME_NAME_PATTERN = re.compile(r'(?=《(.+?)》|"(.+?)"|【(.+?)】|\[(.+?)\])')
+TITLE_NOISE_PATTERN = re.compile(r'(攻略|评测|资讯|下载|官网|专区|合集|手游|网游|页游|主机游戏|单机游戏)')
+RESULT_COUNT_PATTERN = re.compile(r'About ([\d,]+) results')
+
+
+def extract_game_name(title):
+    """
+    Game name from a search result title: the text inside the first 《》,
+    "", 【】 or [] pair (in that priority), else the title without common
+    guide/download words.
+    """
+    best = None
+    for match in GAME_NAME_PATTERN.finditer(title):
+        group = match.lastindex
+        if group == 1:
+            return match.group(1)
+        if best is None or group < best.lastindex:
+            best = match
+    if best is not None:
+        return best.group(best.lastindex)
+    return TITLE_NOISE_PATTERN.sub('', title).strip()
+
+
+def _result_items(html_content):
+    """(title, href) for every Google result block that has both."""
+    if HTMLParser is not None:
+        for node in HTMLParser(html_content).css(RESULT_SELECTOR):
+            title_node = node.css_first(TITLE_SELECTOR)
+            link_node = node.css_first(LINK_SELECTOR)
+            if title_node is None or link_node is None:
+                continue
+            href = link_node.attributes.get('href')
+            if href is not None:
+                yield title_node.text(deep=True), href
+    else:
+        for node in RESULT_XPATH(lxml_html.fromstring(html_content)):
+            titles = TITLE_XPATH(node)
+            links = LINK_XPATH(node)
+            if not titles or not links:
+                continue
+            href = links[0].get('href')
+            if href is not None:
+                yield ''.join(titles[0].itertext()), href
+
+
+def extract_search_results(html_content):
+    """
+    Results of a Google search page as [{'title', 'url', 'game_name'}].
+
+    Uses selectolax when it is installed and lxml otherwise; both are far
+    cheaper than BeautifulSoup's html.parser on 100-result pages.
+    """
+    if not html_content or not html_content.strip():
+        return []
+    with METRICS.stage('serp.parse'):
+        results = [{'title': title, 'url': url, 'game_name': extract_game_name(title)}
+                   for title, url in _result_items(html_content)]
+    METRICS.inc('items_total', len(results), stage='serp.results')
+    return results
+
+
+def extract_result_count(html_content):
+    """Total hits from the '#result-stats' line ("About 1,234 results"), or None."""
+    if not html_content or not html_content.strip():
+        return None
+    with METRICS.stage('serp.result_count'):
+        if HTMLParser is not None:
+            node = HTMLParser(html_content).css_first(STATS_SELECTOR)
+            text = node.text(deep=True) if node is not None else None
+        else:
+            nodes = STATS_XPATH(lxml_html.fromstring(html_content))
+            text = ''.join(nodes[0].itertext()) if nodes else None
+    if not text:
+        return None
+    match = RESULT_COUNT_PATTERN.search(text)
+    return int(match.group(1).replace(',', '')) if match else None
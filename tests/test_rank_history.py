@@ -0,0 +1,48 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rank_history import RankHistory  # noqa: E402
+
+US = 'us/iphone/free/6014'
+GB = 'gb/iphone/free/6014'
+
+
+def chart_rows(country, ranks):
+    return [{'country': country, 'platform': 'iphone', 'type': 'free', 'cid': '6014', 'rank': rank, 'appid': appid}
+            for appid, rank in ranks.items()]
+
+
+def test_charts_added_separately_on_one_day_are_kept(tmp_path):
+    history = RankHistory(tmp_path)
+    history.add_day('2024-12-01', chart_rows('us', {'a': 1, 'b': 2}))
+    history.add_day('2024-12-01', chart_rows('gb', {'a': 3}))
+
+    assert history.best_rank('a', US)[0] == 1
+    assert history.best_rank('b', US)[0] == 2
+    assert history.best_rank('a', GB)[0] == 3
+
+
+def test_re_adding_a_chart_overwrites_only_that_chart(tmp_path):
+    history = RankHistory(tmp_path)
+    history.add_day('2024-12-01', chart_rows('us', {'a': 1, 'b': 2}))
+    history.add_day('2024-12-01', chart_rows('gb', {'a': 3}))
+    history.add_day('2024-12-01', chart_rows('us', {'b': 1}))
+
+    assert history.best_rank('a', US) is None
+    assert history.best_rank('b', US)[0] == 1
+    assert history.best_rank('a', GB)[0] == 3
+
+
+def test_charts_of_survives_reload(tmp_path):
+    history = RankHistory(tmp_path)
+    history.add_day('2024-12-01', chart_rows('us', {'a': 1, 'b': 2}))
+    history.add_day('2024-12-02', chart_rows('gb', {'a': 3}))
+    history.save()
+
+    reloaded = RankHistory(tmp_path)
+    assert sorted(reloaded.charts_of('a')) == [GB, US]
+    assert reloaded.charts_of('b') == [US]
+    assert reloaded.charts_of('missing') == []
+    assert reloaded.history('a', GB)[0][1] == 3
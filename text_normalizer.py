@@ -0,0 +1,103 @@
+import re
+
+# Code point ranges folded into a single space: ASCII/C1 control characters
+# (which include \t \r \n), unicode spaces such as the CJK full-width space,
+# zero-width spaces and bidi marks. ZWNJ/ZWJ are kept because scripts like
+# Persian and emoji sequences depend on them.
+WHITESPACE_AND_CONTROL_RANGES = [
+    (0x00, 0x20),
+    (0x7F, 0xA0),
+    (0x1680, 0x1680),
+    (0x2000, 0x200B),
+    (0x200E, 0x200F),
+    (0x2028, 0x202F),
+    (0x205F, 0x2064),
+    (0x3000, 0x3000),
+    (0xFEFF, 0xFEFF),
+]
+
+# Pictographs, dingbats, flags, variation selectors and the joiner that glues
+# emoji sequences together. Only removed when strip_emoji=True.
+EMOJI_RANGES = [
+    (0x200D, 0x200D),
+    (0x2300, 0x23FF),
+    (0x2600, 0x27BF),
+    (0x2B00, 0x2BFF),
+    (0xFE0E, 0xFE0F),
+    (0x1F000, 0x1FAFF),
+    (0xE0020, 0xE007F),
+]
+
+
+def _char_class(ranges, escape):
+    parts = []
+    for lo, hi in ranges:
+        parts.append(escape(lo) if lo == hi else f"{escape(lo)}-{escape(hi)}")
+    return '[' + ''.join(parts) + ']+'
+
+
+def _python_escape(code_point):
+    return f"\\U{code_point:08x}"
+
+
+def _re2_escape(code_point):
+    return f"\\x{{{code_point:x}}}"
+
+
+def _ranges(strip_emoji):
+    return WHITESPACE_AND_CONTROL_RANGES + (EMOJI_RANGES if strip_emoji else [])
+
+
+# Compiled once at import; every review goes through one of these.
+_PATTERNS = {
+    strip_emoji: re.compile(_char_class(_ranges(strip_emoji), _python_escape))
+    for strip_emoji in (False, True)
+}
+# Same classes in RE2 syntax for pyarrow.compute.
+_RE2_PATTERNS = {
+    strip_emoji: _char_class(_ranges(strip_emoji), _re2_escape)
+    for strip_emoji in (False, True)
+}
+
+
+def normalize_text(text, strip_emoji=False):
+    """
+    Clean one review in a single regex pass.
+
+    Runs of whitespace, control characters and invisible spacing characters
+    become one space, and emoji are removed when `strip_emoji` is set.
+    Non-ASCII text such as CJK reviews is left as is. Non-string values are
+    returned unchanged.
+    """
+    if not isinstance(text, str):
+        return text
+    return _PATTERNS[strip_emoji].sub(' ', text).strip()
+
+
+def normalize_series(series, strip_emoji=False):
+    """
+    Vectorized normalize_text for a whole pandas column.
+
+    Arrow-backed string columns are cleaned with pyarrow.compute kernels
+    without creating Python objects. Other columns use the pandas string
+    accessor with the same compiled pattern.
+    """
+    import pandas as pd
+
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        pa = None
+
+    if pa is not None and _is_arrow_backed(series):
+        array = pa.array(series)
+        array = pc.replace_substring_regex(array, _RE2_PATTERNS[strip_emoji], ' ')
+        array = pc.utf8_trim(array, ' ')
+        return pd.Series(array.to_pandas(types_mapper=pd.ArrowDtype), index=series.index, name=series.name).astype(series.dtype)
+    return series.str.replace(_PATTERNS[strip_emoji], ' ', regex=True).str.strip()
+
+
+def _is_arrow_backed(series):
+    dtype = series.dtype
+    return getattr(dtype, 'storage', None) == 'pyarrow' or type(dtype).__name__ == 'ArrowDtype'
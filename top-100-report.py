@@ -8,6 +8,9 @@ from datetime import datetime, timedelta
 import json
 import pandas as pd
 import sqlite3
+from report_pipeline import REPORT_SECTIONS, run_report_sections
+from report_writer import ReportWriter, dumps
+from saveTop100rank import day_number
 
 # Setup basic logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -19,9 +22,14 @@ D1_DATABASE_ID = os.getenv('CLOUDFLARE_D1_DATABASE_ID')
 CLOUDFLARE_ACCOUNT_ID = os.getenv('CLOUDFLARE_ACCOUNT_ID')
 CLOUDFLARE_API_TOKEN = os.getenv('CLOUDFLARE_API_TOKEN')
 RESULT_FOLDER = os.getenv('RESULT_FOLDER')
+# The weekly report is written to RESULT_FOLDER/my_data.json, indented.
+# Set REPORT_GZIP=1 for my_data.json.gz and REPORT_COMPACT=1 for compact JSON.
+REPORT_GZIP = os.getenv('REPORT_GZIP', '').lower() in ('1', 'true', 'yes')
+REPORT_COMPACT = os.getenv('REPORT_COMPACT', '').lower() in ('1', 'true', 'yes')
 
 # Constants
-CLOUDFLARE_BASE_URL = f"https://api.cloudflare.com/client/v4/accounts/{CLOUDFLARE_ACCOUNT_ID}/d1/database/{D1_DATABASE_ID}"
+CLOUDFLARE_API_BASE_URL = os.getenv('CLOUDFLARE_API_BASE_URL', 'https://api.cloudflare.com/client/v4')
+CLOUDFLARE_BASE_URL = f"{CLOUDFLARE_API_BASE_URL}/accounts/{CLOUDFLARE_ACCOUNT_ID}/d1/database/{D1_DATABASE_ID}"
 
 # Escape special characters for safe SQL insertion
 def escape_sql(value):
@@ -95,14 +103,19 @@ def fetch_reviews_from_d1(start_date=None, end_date=None):
 def fetch_data_from_d1(start_date=None, end_date=None):
     """Fetches data from D1 based on the given time frame."""
 
-    sql_query = "SELECT * FROM ios_top100_rank_data"
+    # Wide rows rebuilt from the compact rank tables (see saveTop100rank)
+    sql_query = "SELECT * FROM ios_top100_rank_view"
+    params = []
 
+    # Whole days, so the first day of the window is included
     if start_date and end_date:
-        sql_query += f" WHERE updateAt >= '{start_date}' AND updateAt <= '{end_date}'"
+        sql_query += " WHERE day BETWEEN ? AND ?"
+        params = [day_number(start_date), day_number(end_date)]
     elif start_date:
-        sql_query += f" WHERE updateAt >= '{start_date}'"
+        sql_query += " WHERE day >= ?"
+        params = [day_number(start_date)]
 
-    payload = {"sql": sql_query}
+    payload = {"sql": sql_query, "params": params}
     url = f"{CLOUDFLARE_BASE_URL}/query"
     headers = {
         "Authorization": f"Bearer {CLOUDFLARE_API_TOKEN}",
@@ -147,15 +160,31 @@ def get_start_and_end_date(timeframe, custom_date=None):
             return None, None
     return None, None
 
+def prepare_frame(data):
+    """
+    Build the typed rank frame once: updateAt as datetime, rank as number.
+    Every analyze_* function accepts this frame in place of the raw rows.
+    """
+    df = pd.DataFrame(data)
+    if 'updateAt' in df:
+        df['updateAt'] = pd.to_datetime(df['updateAt'], format='ISO8601')
+    if 'rank' in df:
+        df['rank'] = pd.to_numeric(df['rank'], errors='coerce')
+    return df
+
+def _as_frame(data):
+    return data if isinstance(data, pd.DataFrame) else prepare_frame(data)
+
+def _is_empty(data):
+    return data is None or len(data) == 0
+
 def analyze_app_performance(data):
     """Analyzes app performance and trends."""
-    if not data:
+    if _is_empty(data):
       logging.warning("No data available to analyze app performance.")
       return {}
 
-    df = pd.DataFrame(data)
-    df['updateAt'] = pd.to_datetime(df['updateAt'])
-    df['rank'] = pd.to_numeric(df['rank'], errors='coerce')
+    df = _as_frame(data)
 
     analysis = {}
     # --- Start App Performance Analysis ---
@@ -239,13 +268,11 @@ def analyze_app_performance(data):
 
 def analyze_market_trends(data):
   """Analyzes market trends and category performance."""
-  if not data:
+  if _is_empty(data):
      logging.warning("No data available to analyze market trends.")
      return {}
 
-  df = pd.DataFrame(data)
-  df['updateAt'] = pd.to_datetime(df['updateAt'])
-  df['rank'] = pd.to_numeric(df['rank'], errors='coerce')
+  df = _as_frame(data)
   analysis = {}
     # --- Start Market Trends Analysis ---
   #9 Category Trend
@@ -302,9 +329,11 @@ def analyze_market_trends(data):
   df_new_app_count['first_day_in_top100'] = df_new_app_count.groupby('appid')['updateAt'].transform('min')
   new_app_count = df_new_app_count.groupby('type').agg(
         new_entrants_count=pd.NamedAgg(column='appid', aggfunc='nunique'),
-        distribution_rank=pd.NamedAgg(column='rank', aggfunc=lambda x: list(x)),
        average_time_in_top100 = pd.NamedAgg(column = 'first_day_in_top100', aggfunc = lambda x: (x.max() - x.min()) if x.size > 1 else 0)
   ).to_dict('index')
+  # Rank distributions stay NumPy arrays; the report writer serializes them natively
+  for app_type, ranks in df_new_app_count.groupby('type')['rank']:
+      new_app_count[app_type]['distribution_rank'] = ranks.to_numpy()
   analysis['new_app_count'] = new_app_count
 
   #16 Top Ranking App Count
@@ -318,24 +347,22 @@ def analyze_market_trends(data):
     top_20_count = pd.NamedAgg(column = 'is_top20', aggfunc = 'sum'),
     top_50_count = pd.NamedAgg(column = 'is_top50', aggfunc = 'sum'),
     top_100_count = pd.NamedAgg(column = 'is_top100', aggfunc = 'sum'),
-    distribution_top_10= pd.NamedAgg(column = 'rank', aggfunc = lambda x: list(x[x<=10])),
-      distribution_top_20= pd.NamedAgg(column = 'rank', aggfunc = lambda x: list(x[x<=20])),
-      distribution_top_50= pd.NamedAgg(column = 'rank', aggfunc = lambda x: list(x[x<=50])),
-      distribution_top_100= pd.NamedAgg(column = 'rank', aggfunc = lambda x: list(x[x<=100])),
      ).to_dict('index')
+  for app_type, ranks in df_top_ranking_app_count.groupby('type')['rank']:
+      ranks = ranks.to_numpy()
+      for top in (10, 20, 50, 100):
+          top_ranking_app_count[app_type][f'distribution_top_{top}'] = ranks[ranks <= top]
 
   analysis['top_ranking_app_count'] = top_ranking_app_count
   return analysis
 
 def analyze_competitive(data):
    """Analyzes the competitive landscape."""
-   if not data:
+   if _is_empty(data):
         logging.warning("No data available to analyze competitive landscape.")
         return {}
 
-   df = pd.DataFrame(data)
-   df['updateAt'] = pd.to_datetime(df['updateAt'])
-   df['rank'] = pd.to_numeric(df['rank'], errors='coerce')
+   df = _as_frame(data)
    analysis = {}
 
    #--- Start Competitive Analysis ---
@@ -405,11 +432,10 @@ def analyze_competitive(data):
 
 def analyze_app_attributes(data):
     """Analyzes app attributes and their correlations with rankings."""
-    if not data:
+    if _is_empty(data):
         logging.warning("No data available to analyze app attributes.")
         return {}
-    df = pd.DataFrame(data)
-    df['rank'] = pd.to_numeric(df['rank'], errors='coerce')
+    df = _as_frame(data)
     analysis = {}
 
     #23. Keyword and Themes
@@ -434,12 +460,10 @@ def analyze_app_attributes(data):
 
 def analyze_strategic_insights(data):
     """Analyzes strategic and business insights."""
-    if not data:
+    if _is_empty(data):
         logging.warning("No data available to analyze strategic insights.")
         return {}
-    df = pd.DataFrame(data)
-    df['updateAt'] = pd.to_datetime(df['updateAt'])
-    df['rank'] = pd.to_numeric(df['rank'], errors='coerce')
+    df = _as_frame(data)
     analysis = {}
     # 27 Day of Week Performance
     df_day_of_week = df.copy()
@@ -488,7 +512,7 @@ def analyze_strategic_insights(data):
 
 def analyze_feature_inspiration(data):
    """Analyzes features for inspiration from top apps."""
-   if not data:
+   if _is_empty(data):
       logging.warning("No data available to analyze features for inspiration.")
       return {}
    #Place holder since the current data doesnt have feature/UI elements
@@ -501,7 +525,7 @@ def analyze_feature_inspiration(data):
 
 def analyze_event_driven(data):
     """Analyzes rank correlation with events"""
-    if not data:
+    if _is_empty(data):
         logging.warning("No data available to analyze correlation with events.")
         return {}
     # Place holder, requires additional data, skipped
@@ -512,7 +536,7 @@ def analyze_event_driven(data):
 
 def analyze_external_correlation(data, start_date=None, end_date=None):
     """Analyzes app performance against external data"""
-    if not data:
+    if _is_empty(data):
         logging.warning("No data available to analyze correlation with external factor")
         return {}
 
@@ -545,7 +569,7 @@ def default_serializer(obj):
      return str(obj)
   return obj
 
-def generate_report(analysis, timeframe="all", custom_date=None):
+def generate_report(analysis, timeframe="all", custom_date=None, indent=True):
     """Generates a report based on the analysis."""
     report = {
     "report_type": "top100rank",
@@ -554,8 +578,8 @@ def generate_report(analysis, timeframe="all", custom_date=None):
     "analysis": analysis
     }
 
-    report_json = json.dumps(report, indent=4, default=default_serializer)
-    logging.info(f"Report:\n{report_json}")
+    report_json = dumps(report, indent=indent).decode('utf-8')
+    logging.info(f"Report generated: {len(analysis)} sections, {len(report_json)} bytes")
     return report_json
 
 def write_json_to_file(data, filename):
@@ -575,25 +599,33 @@ def write_json_to_file(data, filename):
 
 
 
-def process_report(timeframe="all", custom_date=None):
+def process_report(timeframe="all", custom_date=None, max_workers=None, output_path=None, indent=True):
+    """
+    Build the top-100 report. With `output_path` each section is streamed to
+    that file (gzip compressed for .gz) as soon as it is computed and the
+    path is returned; otherwise the report JSON string is returned. The JSON
+    is indented unless `indent` is False.
+    """
     start_date, end_date = get_start_and_end_date(timeframe, custom_date)
     data = fetch_data_from_d1(start_date, end_date)
 
-    if not data:
+    if _is_empty(data):
         return None
     
     # review_data = fetch_reviews_from_d1(start_date, end_date)
     print('fetch data',len(data),data[:5])
-    report = {}
-    report['app_performance_report'] = analyze_app_performance(data)
-    report['market_trend_report'] = analyze_market_trends(data)
-    report['competitive_report'] = analyze_competitive(data)
-    report['app_attribute_report'] = analyze_app_attributes(data)
-    report['strategic_report'] = analyze_strategic_insights(data)
-    report['feature_report'] = analyze_feature_inspiration(data)
-    report['event_report'] = analyze_event_driven(data)
+    # Parse and type the rows once, then compute the independent sections in
+    # parallel worker processes that read the frame from shared memory
+    frame = prepare_frame(data)
+    if output_path:
+        with ReportWriter(output_path, indent=indent, report_type="top100rank", timeframe=timeframe,
+                          custom_range=custom_date) as writer:
+            run_report_sections(frame, REPORT_SECTIONS, max_workers, on_section=writer.write_section)
+        logging.info(f"Report written to {output_path}: {len(writer.sections)} sections, {writer.bytes_written} bytes")
+        return output_path
+    report = run_report_sections(frame, REPORT_SECTIONS, max_workers)
     # report['external_report'] = analyze_external_correlation(data, start_date, end_date)
-    report = generate_report(report, timeframe, custom_date)
+    report = generate_report(report, timeframe, custom_date, indent=indent)
     return report
 
 # Example usage
@@ -764,16 +796,14 @@ if __name__ == "__main__":
     logging.info("Generating reports...")
     
     # Generate report for last week
-    report_last_week = process_report(timeframe="last week")
-    print('report data',report_last_week)
+    output_file = "my_data.json.gz" if REPORT_GZIP else "my_data.json"
+    os.makedirs(RESULT_FOLDER, exist_ok=True)
+    report_last_week = process_report(timeframe="last week", output_path=os.path.join(RESULT_FOLDER, output_file),
+                                      indent=not REPORT_COMPACT)
     if report_last_week:
       logging.info(f"Report for last week generated")
     else:
       logging.info("No report was generated for last week")
-    output_file = "my_data.json"
-    os.makedirs(RESULT_FOLDER, exist_ok=True)
-    
-    write_json_to_file(report_last_week, os.path.join(RESULT_FOLDER,output_file))
 
     # Generate report for last month
     # report_last_month = process_report(timeframe="last month")
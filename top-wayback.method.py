@@ -14,13 +14,19 @@ import asyncio
 from aiohttp_socks import ProxyType, ProxyConnector, ChainProxyConnector
 from DataRecorder import Recorder
 import pandas as pd
+from storefronts import resolve_storefronts
+from cdx_client import CdxLineDecoder, fetch_cdx, write_cdx_csv
+from log_utils import get_logger
+
+log = get_logger('top-wayback.method')
 
 # Constants
 PROXY_URL = None
-DOMAIN_LIST = [
-  'https://apps.apple.com/us/app/'
-#   , 'https://apps.apple.com/us/charts/ipad'
-]
+# App url prefixes per storefront, from WAYBACK_STOREFRONTS ('all' or comma separated, default us)
+DOMAIN_LIST = [f'https://apps.apple.com/{country}/app/' for country in resolve_storefronts(os.getenv('WAYBACK_STOREFRONTS', 'us'))]
+# Backfill window (YYYY, YYYYMM or YYYYMMDD); unset means the full capture history
+WAYBACK_START = os.getenv('WAYBACK_START') or None
+WAYBACK_END = os.getenv('WAYBACK_END') or None
 
 # File Paths
 RESULT_FOLDER = "./result"
@@ -40,7 +46,7 @@ def process_line(csv_file, lines):
                 data = {'timestamp': timestamp, 'url': original_url}
                 csv_file.add_data(data)
         except Exception as e:
-            print(f"Failed to process line: {line}, Error: {e}")
+            log.throttled('failed to process line', interval=10, line=line, error=e)
 
 
 async def get_urls_from_archive(domain, start, end):
@@ -56,7 +62,7 @@ async def get_urls_from_archive(domain, start, end):
     if not os.path.exists(csv_filepath):
         csv_file.add_data(fieldnames)
 
-    query_url = f"http://web.archive.org/cdx/search/cdx?url={domain}/&fl=timestamp,original"
+    query_url = f"http://web.archive.org/cdx/search/cdx?url={domain.rstrip('/')}/&fl=timestamp,original"
     # filter = f"&statuscode=200&from={start}&to={end}" if end else f"&statuscode=200&from={start}"
     query_url += "&collapse=urlkey"
     query_url=query_url+'&matchType=prefix'
@@ -76,23 +82,14 @@ async def get_urls_from_archive(domain, start, end):
                     return
 
                 count = 0
-                buffer = bytearray()
-                while True:
-                    chunk = await resp.content.read(1024)
-                    if not chunk:
-                        if buffer:
-                            process_line(csv_file, [buffer.decode('utf-8', 'replace')])
-                        break
-                    buffer.extend(chunk)
-                    raw = buffer.decode('utf-8', 'replace')
-                    lines = raw.splitlines(True)
-
-                    for line in lines[:-1]:
-                        process_line(csv_file, [line])
-                    buffer = bytearray(lines[-1], 'utf-8')
-
+                decoder = CdxLineDecoder()
+                async for chunk in resp.content.iter_chunked(64 * 1024):
+                    lines = decoder.feed(chunk)
+                    process_line(csv_file, lines)
                     count += len(lines)
-                    print(f"Processed {count} lines so far...")
+                    log.throttled('cdx lines processed', interval=30, domain=domainname, lines=count)
+                process_line(csv_file, decoder.close())
+                log.info('cdx lines processed', domain=domainname, lines=count)
 
     except Exception as e:
         print(f"Error fetching data: {e}")
@@ -145,22 +142,20 @@ def extract_urls(domain):
                 out_file.add_data(url)
         out_file.record()
 
-async def main():
+async def main(start=WAYBACK_START, end=WAYBACK_END):
     """Main entry point to handle asynchronous execution."""
-    start_year = 2024
-    end_year = 2024
-
-    # Generate pairs of consecutive years
-    year_pairs = [(start_year + i, start_year + i + 1) for i in range(end_year - start_year)] if start_year != end_year else [(start_year, None)]
-    
-    tasks = []
+    # Each storefront is split into prefix (x year, when a start is set)
+    # partitions fetched in parallel; progress is kept in
+    # result/cdx/<domain>/state.json so a rerun resumes instead of starting
+    # over. The Parquet parts are the primary output; result/total-apps-<domain>.csv
+    # (timestamp,url) is still written from them for existing readers.
     for domain in DOMAIN_LIST:
-        for pair in year_pairs:
-            print(f"Adding domain {domain} to tasks")
-            task = asyncio.create_task(fetch_urls_for_domain(domain, pair[0], pair[1]))
-            tasks.append(task)
-
-    await asyncio.gather(*tasks)
+        domainname = domain.replace("https://", "").replace('/', '-')
+        print(f"Backfilling {domain}")
+        cdx_dir = f'{RESULT_FOLDER}/cdx/{domainname}'
+        await fetch_cdx(domain, cdx_dir, start=start, end=end)
+        rows = write_cdx_csv(cdx_dir, f'{RESULT_FOLDER}/total-apps-{domainname}.csv')
+        log.info('csv written', domain=domainname, rows=rows)
     print('post processing urls')
     # for domain in DOMAIN_LIST:
         # extract_urls(domain)
@@ -0,0 +1,135 @@
+import asyncio
+import os
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+from chart_feeds import CHART_TYPES, GENRES, PLATFORMS, fetch_charts
+from storefronts import resolve_storefronts
+
+SNAPSHOT_DIR = Path(os.getenv('TOP100_SNAPSHOT_DIR', './data/top100'))
+CONCURRENCY = 32
+
+RANK_COLUMNS = ['country', 'platform', 'type', 'cid', 'rank', 'appid']
+APP_COLUMNS = ['appid', 'appname', 'title', 'icon', 'link']
+
+
+def _env_list(name, default):
+    value = os.getenv(name)
+    if not value:
+        return list(default)
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def snapshot_config():
+    """
+    Snapshot dimensions from the environment:
+    TOP100_STOREFRONTS ('all' or comma separated country codes, default us),
+    TOP100_PLATFORMS (iphone,ipad), TOP100_CHART_TYPES (free,paid) and
+    TOP100_GENRES (genre ids, default every genre).
+    """
+    return {
+        'storefronts': resolve_storefronts(os.getenv('TOP100_STOREFRONTS', 'us')),
+        'platforms': _env_list('TOP100_PLATFORMS', PLATFORMS),
+        'chart_types': _env_list('TOP100_CHART_TYPES', CHART_TYPES),
+        'genres': _env_list('TOP100_GENRES', GENRES),
+    }
+
+
+def chart_domains(storefronts=None, platforms=None):
+    """apps.apple.com chart roots (the old DOMAIN_LIST) for storefronts x platforms."""
+    config = snapshot_config()
+    return [f'https://apps.apple.com/{country}/charts/{platform}'
+            for country in storefronts or config['storefronts']
+            for platform in platforms or config['platforms']]
+
+
+def split_snapshot(rows):
+    """
+    Split chart rows into narrow rank rows and one metadata record per app.
+
+    The same app shows up in many charts and storefronts; its name, title,
+    icon and link are kept once (first seen wins).
+    """
+    apps = {}
+    ranks = []
+    for row in rows:
+        ranks.append({column: row[column] for column in RANK_COLUMNS})
+        if row['appid'] not in apps:
+            apps[row['appid']] = {column: row.get(column) for column in APP_COLUMNS}
+    return ranks, list(apps.values())
+
+
+def write_snapshot(rows, day=None, root=SNAPSHOT_DIR):
+    """
+    Write one day's snapshot as <day>.ranks.parquet and <day>.apps.parquet.
+
+    Ranks are stored with dictionary-encoded dimension columns and small
+    integer ranks, sorted so each chart is contiguous. Returns the two paths.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    day = day or datetime.now().strftime('%Y-%m-%d')
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    ranks, apps = split_snapshot(rows)
+    ranks.sort(key=lambda r: (r['country'], r['platform'], r['type'], r['cid'], r['rank']))
+
+    rank_table = pa.table({
+        'country': pa.array([r['country'] for r in ranks], pa.string()).dictionary_encode(),
+        'platform': pa.array([r['platform'] for r in ranks], pa.string()).dictionary_encode(),
+        'type': pa.array([r['type'] for r in ranks], pa.string()).dictionary_encode(),
+        'cid': pa.array([r['cid'] for r in ranks], pa.string()).dictionary_encode(),
+        'rank': pa.array([int(r['rank']) for r in ranks], pa.uint8()),
+        'appid': pa.array([r['appid'] for r in ranks], pa.string()).dictionary_encode(),
+    })
+    app_table = pa.Table.from_pylist(apps, schema=pa.schema([(c, pa.string()) for c in APP_COLUMNS]))
+
+    ranks_path = root / f"{day}.ranks.parquet"
+    apps_path = root / f"{day}.apps.parquet"
+    pq.write_table(rank_table, ranks_path, compression='zstd')
+    pq.write_table(app_table, apps_path, compression='zstd')
+    return ranks_path, apps_path
+
+
+def read_snapshot(day, root=SNAPSHOT_DIR):
+    """Join a day's ranks back to full chart rows as a DataFrame."""
+    import pyarrow.parquet as pq
+
+    root = Path(root)
+    ranks = pq.read_table(root / f"{day}.ranks.parquet").to_pandas()
+    apps = pq.read_table(root / f"{day}.apps.parquet").to_pandas()
+    for column in ['country', 'platform', 'type', 'cid', 'appid']:
+        ranks[column] = ranks[column].astype(str)
+    return ranks.merge(apps, on='appid', how='left')
+
+
+async def take_snapshot(storefronts=None, platforms=None, chart_types=None, genres=None,
+                        concurrency=CONCURRENCY, day=None, root=SNAPSHOT_DIR, targets=None):
+    """
+    Fetch every storefront x platform x chart type x genre chart over one
+    pooled session and write the day's snapshot. Explicit (country, platform)
+    `targets` replace the storefront x platform product.
+
+    Returns (chart rows, (ranks path, apps path)).
+    """
+    config = snapshot_config()
+    storefronts = resolve_storefronts(storefronts) if storefronts else config['storefronts']
+    platforms = platforms or config['platforms']
+    chart_types = chart_types or config['chart_types']
+    genres = genres or config['genres']
+    targets = targets or [(country, platform) for country in storefronts for platform in platforms]
+    print(f"[INFO] Snapshot of {len(targets)} storefront/platform pairs x {len(chart_types)} charts x {len(genres)} genres")
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30, follow_redirects=True) as client:
+        rows = await fetch_charts(targets, genres, chart_types, concurrency, client=client)
+
+    paths = await asyncio.to_thread(write_snapshot, rows, day, root)
+    print(f"[INFO] {len(rows)} chart rows, {len({r['appid'] for r in rows})} apps -> {paths[0]}")
+    return rows, paths
+
+
+if __name__ == "__main__":
+    asyncio.run(take_snapshot())